@@ -4,6 +4,9 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
 from django.utils.translation import gettext_lazy as _
 
+from library_project.changelist import EstimatedCountPaginator
+from library_project.replicas import ReplicaChangeListMixin
+
 from .models import LibraryUser
 
 
@@ -61,13 +64,22 @@ class LibraryUserChangeForm(forms.ModelForm):
 
 
 @admin.register(LibraryUser)
-class LibraryUserAdmin(UserAdmin):
+class LibraryUserAdmin(ReplicaChangeListMixin, UserAdmin):
     add_form = LibraryUserCreationForm
     form = LibraryUserChangeForm
     model = LibraryUser
     list_display = ["library_card_number", "first_name", "last_name", "email", "is_staff"]
     ordering = ["library_card_number"]
-    search_fields = ["library_card_number", "first_name", "last_name", "email"]
+    # Exact and prefix lookups only, served by the primary key and the UPPER() pattern indexes.
+    search_fields = [
+        "library_card_number__exact",
+        "first_name__istartswith",
+        "last_name__istartswith",
+        "email__istartswith",
+    ]
+    search_help_text = "Exact library card number, or the beginning of a first name, last name or email."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     filter_horizontal = ["groups", "user_permissions"]
 
     fieldsets = (
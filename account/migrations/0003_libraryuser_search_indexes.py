@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:08
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0002_add_sample_users"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="libraryuser",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("first_name"),
+                    name="text_pattern_ops",
+                ),
+                name="user_first_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="libraryuser",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("last_name"),
+                    name="text_pattern_ops",
+                ),
+                name="user_last_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="libraryuser",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("email"),
+                    name="text_pattern_ops",
+                ),
+                name="user_email_upper_idx",
+            ),
+        ),
+    ]
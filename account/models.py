@@ -1,7 +1,9 @@
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 card_validator = RegexValidator(r"^\d{6}$", "The library card number must contain exactly six digits.")
@@ -66,6 +68,12 @@ class LibraryUser(AbstractBaseUser, PermissionsMixin):
 
     class Meta:
         ordering = ["library_card_number"]
+        indexes = [
+            # Match the UPPER(...) LIKE 'PREFIX%' SQL of istartswith (the admin search).
+            models.Index(OpClass(Upper("first_name"), name="text_pattern_ops"), name="user_first_name_upper_idx"),
+            models.Index(OpClass(Upper("last_name"), name="text_pattern_ops"), name="user_last_name_upper_idx"),
+            models.Index(OpClass(Upper("email"), name="text_pattern_ops"), name="user_email_upper_idx"),
+        ]
 
     def __str__(self):
         return self.library_card_number
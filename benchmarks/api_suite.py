@@ -0,0 +1,283 @@
+"""Reproducible benchmark of the book API endpoints.
+
+The suite creates a throwaway test database (like ``manage.py test``), seeds ``--books`` books
+and ``--users`` library users with ``bulk_create``, then replays a weighted traffic mix of the
+requests from ``Library_API.postman_collection.json`` (list, create, borrow, return, delete)
+plus filtered listing and search through Django's in-process test client. For every endpoint
+it reports throughput, mean/p50/p95/p99 latency and database queries per request, and writes
+the results as JSON so runs on different commits can be compared::
+
+    python benchmarks/api_suite.py --books 100000 --users 2000 --requests 5000 --output after.json
+    python benchmarks/api_suite.py --books 100000 --users 2000 --requests 5000 --compare before.json
+
+Latencies exclude network and HTTP parsing; use ``list_latency.py`` against a running server
+for end-to-end numbers. The database connection comes from the usual ``POSTGRES_*`` variables.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY_ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    setup_databases,
+    teardown_databases,
+)
+
+from catalog.models import Book  # noqa: E402
+
+MIXES = {
+    "read_heavy": {"list": 50, "filter": 15, "search": 15, "borrow": 9, "return": 8, "create": 2, "delete": 1},
+    "circulation": {"list": 20, "filter": 10, "search": 10, "borrow": 30, "return": 28, "create": 1, "delete": 1},
+    "write_heavy": {"list": 10, "filter": 5, "search": 5, "borrow": 25, "return": 25, "create": 20, "delete": 10},
+}
+WORDS = ["Pan", "Tadeusz", "Lalka", "Quo", "Vadis", "Solaris", "Potop", "Dziady", "Chlopi", "Faraon"]
+AUTHORS = ["Adam Mickiewicz", "Boleslaw Prus", "Henryk Sienkiewicz", "Stanislaw Lem", "Wladyslaw Reymont"]
+# Card numbers below this are left to the sample users created by the account migrations.
+FIRST_CARD_NUMBER = 500_000
+
+
+def card_number(index):
+    return f"{FIRST_CARD_NUMBER + index:06d}"
+
+
+class TrafficState:
+    """Tracks which books are available or borrowed so generated requests are meaningful."""
+
+    def __init__(self, books, users, borrowed_share, rng):
+        self.rng = rng
+        self.card_numbers = [card_number(index) for index in range(users)]
+        serial_numbers = [f"{index:06d}" for index in range(books)]
+        borrowed_count = int(books * borrowed_share)
+        self.borrowed = set(serial_numbers[:borrowed_count])
+        self.available = set(serial_numbers[borrowed_count:])
+        self.next_serial_number = 999999
+
+    def take(self, pool):
+        if not pool:
+            return None
+        serial_number = self.rng.choice(tuple(pool)) if len(pool) < 1000 else self._sample(pool)
+        pool.discard(serial_number)
+        return serial_number
+
+    def _sample(self, pool):
+        # Drawing from a large set through tuple() on every call would dominate the run time.
+        while True:
+            candidate = f"{self.rng.randrange(1_000_000):06d}"
+            if candidate in pool:
+                return candidate
+
+    def new_serial_number(self):
+        serial_number = f"{self.next_serial_number:06d}"
+        self.next_serial_number -= 1
+        return serial_number
+
+
+def seed(books, users, borrowed_share, batch_size=5000):
+    User = get_user_model()
+    User.objects.bulk_create(
+        [
+            User(library_card_number=card_number(index), first_name=f"Reader{index}", last_name="Bench", password="!")
+            for index in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    borrowed_count = int(books * borrowed_share)
+    now = datetime.now(timezone.utc)
+    for start in range(0, books, batch_size):
+        Book.objects.bulk_create(
+            [
+                Book(
+                    serial_number=f"{index:06d}",
+                    title=f"{WORDS[index % len(WORDS)]} {WORDS[(index // len(WORDS)) % len(WORDS)]} {index}",
+                    author=AUTHORS[index % len(AUTHORS)],
+                    is_borrowed=index < borrowed_count,
+                    borrowed_by_id=card_number(index % users) if index < borrowed_count else None,
+                    borrowed_at=now if index < borrowed_count else None,
+                )
+                for index in range(start, min(start + batch_size, books))
+            ]
+        )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE catalog_book")
+        cursor.execute("ANALYZE account_libraryuser")
+
+
+def make_request(operation, client, state):
+    """Issue one request of ``operation``; returns the response or ``None`` if nothing fits the state."""
+    rng = state.rng
+    if operation == "list":
+        return client.get("/api/books/", {"page_size": 50})
+    if operation == "filter":
+        return client.get("/api/books/", {"is_borrowed": "true", "author": rng.choice(AUTHORS), "page_size": 50})
+    if operation == "search":
+        return client.get("/api/books/search/", {"q": rng.choice(WORDS), "page_size": 20})
+    if operation == "create":
+        payload = {
+            "serial_number": state.new_serial_number(),
+            "title": rng.choice(WORDS),
+            "author": rng.choice(AUTHORS),
+        }
+        response = client.post("/api/books/", payload, content_type="application/json")
+        state.available.add(payload["serial_number"])
+        return response
+    if operation == "borrow":
+        serial_number = state.take(state.available)
+        if serial_number is None:
+            return None
+        payload = {"is_borrowed": True, "borrowed_by": rng.choice(state.card_numbers)}
+        response = client.patch(f"/api/books/{serial_number}/", payload, content_type="application/json")
+        state.borrowed.add(serial_number)
+        return response
+    if operation == "return":
+        serial_number = state.take(state.borrowed)
+        if serial_number is None:
+            return None
+        response = client.patch(f"/api/books/{serial_number}/", {"is_borrowed": False}, content_type="application/json")
+        state.available.add(serial_number)
+        return response
+    if operation == "delete":
+        serial_number = state.take(state.available)
+        if serial_number is None:
+            return None
+        return client.delete(f"/api/books/{serial_number}/")
+    raise ValueError(f"Unknown operation {operation!r}")
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def replay(mix, requests, state):
+    client = Client()
+    operations, weights = zip(*MIXES[mix].items())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+
+    started = time.perf_counter()
+    for operation in state.rng.choices(operations, weights=weights, k=requests):
+        with CaptureQueriesContext(connection) as queries:
+            request_started = time.perf_counter()
+            response = make_request(operation, client, state)
+            latency = time.perf_counter() - request_started
+        if response is None:
+            continue
+        samples[operation].append((latency * 1000, len(queries)))
+        if response.status_code >= 400:
+            errors[operation] += 1
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for operation, measurements in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in measurements)
+        endpoints[operation] = {
+            "requests": len(measurements),
+            "errors": errors[operation],
+            "throughput_rps": round(len(measurements) / (sum(latencies) / 1000), 1),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "queries_per_request": round(statistics.fmean(count for _, count in measurements), 2),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {"total_requests": total, "throughput_rps": round(total / elapsed, 1), "endpoints": endpoints}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPOSITORY_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50/p99 ratios against a previous run; returns the endpoints slower than ``threshold``."""
+    baseline = json.loads(Path(baseline_path).read_text())["endpoints"]
+    regressions = []
+    print(f"{'endpoint':<10} {'p50 before':>11} {'p50 after':>10} {'p99 before':>11} {'p99 after':>10} {'queries':>9}")
+    for operation, current in results["endpoints"].items():
+        previous = baseline.get(operation)
+        if previous is None:
+            continue
+        print(
+            f"{operation:<10} {previous['p50_ms']:>11.2f} {current['p50_ms']:>10.2f} "
+            f"{previous['p99_ms']:>11.2f} {current['p99_ms']:>10.2f} "
+            f"{previous['queries_per_request']:>4.1f}->{current['queries_per_request']:<4.1f}"
+        )
+        if current["p50_ms"] > previous["p50_ms"] * threshold:
+            regressions.append(operation)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--borrowed-share", type=float, default=0.3, help="Fraction of seeded books on loan.")
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read_heavy")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the traffic sequence.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Results file of a previous run to compare against.")
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=1.25,
+        help="With --compare, exit with status 1 if any endpoint's p50 grew by more than this factor.",
+    )
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs.")
+    args = parser.parse_args()
+    if args.books > 500_000 or args.users > 1_000_000 - FIRST_CARD_NUMBER:
+        parser.error("Serial and card numbers have six digits: use at most 500000 books and 500000 users.")
+
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=args.keepdb)
+    try:
+        Book.objects.all().delete()
+        get_user_model().objects.filter(last_name="Bench").delete()
+        seed_started = time.perf_counter()
+        seed(args.books, args.users, args.borrowed_share)
+        seed_seconds = time.perf_counter() - seed_started
+
+        state = TrafficState(args.books, args.users, args.borrowed_share, random.Random(args.seed))
+        results = {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in {"output", "compare"}},
+            "seed_seconds": round(seed_seconds, 2),
+            **replay(args.mix, args.requests, state),
+        }
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=args.keepdb)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.compare and compare(results, args.compare, args.regression_threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
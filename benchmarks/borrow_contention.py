@@ -0,0 +1,139 @@
+"""Borrow/return throughput under contention, pessimistic row locks versus optimistic versions.
+
+``--clients`` threads, each with its own database connection, keep borrowing and returning books
+drawn from a small set of ``--hot-books`` for ``--duration`` seconds, once with the default
+``select_for_update()`` path and once with ``BOOK_OPTIMISTIC_LOCKING``::
+
+    python benchmarks/borrow_contention.py --clients 16 --hot-books 4 --duration 10
+
+For each mode it reports successful status changes per second, the requests that lost a race
+(400 "already borrowed" / 409 Conflict) and request latency percentiles. Like ``api_suite.py`` it
+runs on a throwaway test database through Django's in-process client.
+
+Both modes take the same row locks when writing (the book and the summary rows updated by its
+triggers, held until commit); what differs is whether the book row is locked while the change
+is decided. The results compare that wait, not locking against lock-free writes.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY_ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+
+from catalog.models import Book  # noqa: E402
+
+FIRST_CARD_NUMBER = 500_000
+FIRST_SERIAL_NUMBER = 900_000
+
+
+def seed(clients, hot_books):
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(library_card_number=f"{FIRST_CARD_NUMBER + index:06d}", first_name="Bench", last_name="Bench")
+        for index in range(clients)
+    )
+    Book.objects.bulk_create(
+        Book(serial_number=f"{FIRST_SERIAL_NUMBER + index:06d}", title="Hot title", author="Bench")
+        for index in range(hot_books)
+    )
+
+
+def run(clients, hot_books, duration, seed_value):
+    barrier = threading.Barrier(clients)
+    deadline = []
+    outcomes = []
+    latencies = []
+
+    def client_loop(index):
+        client = Client()
+        rng = random.Random(seed_value + index)
+        card_number = f"{FIRST_CARD_NUMBER + index:06d}"
+        local_outcomes = Counter()
+        local_latencies = []
+        try:
+            barrier.wait()
+            while time.monotonic() < deadline[0]:
+                url = f"/api/books/{FIRST_SERIAL_NUMBER + rng.randrange(hot_books):06d}/"
+                for payload in ({"is_borrowed": True, "borrowed_by": card_number}, {"is_borrowed": False}):
+                    started = time.perf_counter()
+                    response = client.patch(url, json.dumps(payload), content_type="application/json")
+                    local_latencies.append(time.perf_counter() - started)
+                    local_outcomes[response.status_code] += 1
+                    if response.status_code != 200:
+                        break
+        finally:
+            connection.close()
+            outcomes.append(local_outcomes)
+            latencies.extend(local_latencies)
+
+    Book.objects.update(is_borrowed=False, borrowed_by=None, borrowed_at=None)
+    threads = [threading.Thread(target=client_loop, args=[index]) for index in range(clients)]
+    deadline.append(time.monotonic() + duration)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = sum(outcomes, Counter())
+    latencies.sort()
+    return {
+        "requests": sum(statuses.values()),
+        "status_changes_per_second": round(statuses[200] / elapsed, 1),
+        "already_borrowed": statuses[400],
+        "conflicts": statuses[409],
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads.")
+    parser.add_argument("--hot-books", type=int, default=4, help="Number of books all clients compete for.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per locking mode.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs.")
+    args = parser.parse_args()
+    # Lost races are expected here; don't log every one of them.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=args.keepdb)
+    try:
+        Book.objects.filter(author="Bench").delete()
+        get_user_model().objects.filter(last_name="Bench").delete()
+        seed(args.clients, args.hot_books)
+        results = {"parameters": vars(args)}
+        for mode, optimistic in (("pessimistic", False), ("optimistic", True)):
+            with override_settings(BOOK_OPTIMISTIC_LOCKING=optimistic):
+                results[mode] = run(args.clients, args.hot_books, args.duration, args.seed)
+    finally:
+        connection.close()
+        teardown_databases(old_config, verbosity=0, keepdb=args.keepdb)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare throughput of the WSGI (gthread) and ASGI (uvicorn) serving modes.
+
+Each mode is started with gunicorn on ``--port`` from the repository root, loaded with the same
+request mix and stopped again. The database settings come from the usual ``POSTGRES_*``
+environment variables; seed some books first (e.g. with ``manage.py import_books``)::
+
+    python benchmarks/compare_serving.py --workers 2 --requests 2000 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from list_latency import run_load
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "wsgi": ("gthread", "library_project.wsgi:application", ["/api/books/?page_size=50"]),
+    "asgi": (
+        "uvicorn.workers.UvicornWorker",
+        "library_project.asgi:application",
+        ["/api/books/?page_size=50", "/api/async/books/?page_size=50"],
+    ),
+}
+
+
+def wait_until_ready(server, base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/books/?page_size=1"):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+def benchmark_mode(mode, args):
+    worker_class, application, paths = MODES[mode]
+    environment = {
+        **os.environ,
+        "GUNICORN_BIND": f"127.0.0.1:{args.port}",
+        "GUNICORN_WORKER_CLASS": worker_class,
+        "GUNICORN_ACCESS_LOG": "",
+        "WEB_CONCURRENCY": str(args.workers),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", application],
+        cwd=REPOSITORY_ROOT,
+        env=environment,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(server, base_url)
+        return [{"mode": mode, **run_load(base_url + path, args.requests, args.concurrency)} for path in paths]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES, reverse=True))
+    args = parser.parse_args()
+
+    results = [result for mode in args.modes for result in benchmark_mode(mode, args)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
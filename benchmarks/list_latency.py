@@ -0,0 +1,69 @@
+"""Measure the latency of ``GET /api/books/`` against a running server.
+
+Start the server once per configuration and compare the printed JSON, e.g.::
+
+    POSTGRES_CONN_MAX_AGE=0 python manage.py runserver --noreload      # new connection per request
+    POSTGRES_POOL=true python manage.py runserver --noreload            # pooled connections
+
+    python benchmarks/list_latency.py --url "http://localhost:8000/api/books/?page_size=50" --requests 2000
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def timed_get(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return time.perf_counter() - started, status
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run_load(url, requests, concurrency, warmup=50):
+    """Issue ``requests`` GETs to ``url`` from ``concurrency`` threads and summarise the latencies."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_get, [url] * warmup))
+        started = time.perf_counter()
+        results = list(executor.map(timed_get, [url] * requests))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        "url": url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, status in results if status >= 400),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/books/?page_size=50")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(run_load(args.url, args.requests, args.concurrency, args.warmup), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Rows per second per core of the book list serialization paths.
+
+Seeds ``--books`` books (``--borrowed-share`` of them on loan) in a throwaway test database, then
+renders the whole list ``--repeat`` times through each path and reports the best run:
+
+* ``serializer`` - model instances, ``BookSerializer`` and DRF's ``JSONRenderer`` (the default)
+* ``fast`` - ``values_list()`` rows, ``render_book_row`` and ``BookJSONRenderer``, as enabled by
+  ``BOOK_FAST_SERIALIZATION=true``
+
+Times are CPU time of this process (``time.process_time``), split into fetching the rows and
+turning them into JSON bytes, so the numbers are per core::
+
+    python benchmarks/serialization.py --books 50000 --repeat 5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY_ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from catalog.borrower_cache import borrower_cache  # noqa: E402
+from catalog.models import Book  # noqa: E402
+from catalog.renderers import BookJSONRenderer, orjson  # noqa: E402
+from catalog.serializers import (  # noqa: E402
+    BOOK_ROW_COLUMNS,
+    BookSerializer,
+    render_book_row,
+)
+
+FIRST_CARD_NUMBER = 500_000
+
+
+def seed(books, borrowed_share, users=500, batch_size=5000):
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(library_card_number=f"{FIRST_CARD_NUMBER + index:06d}", first_name="Jan", last_name="Bench")
+        for index in range(users)
+    )
+    borrowed = int(books * borrowed_share)
+    now = timezone.now()
+    Book.objects.bulk_create(
+        (
+            Book(
+                serial_number=f"{index:06d}",
+                title=f"Pan Tadeusz, czyli ostatni zajazd na Litwie {index}",
+                author="Adam Mickiewicz",
+                is_borrowed=index < borrowed,
+                borrowed_by_id=f"{FIRST_CARD_NUMBER + index % users:06d}" if index < borrowed else None,
+                borrowed_at=now if index < borrowed else None,
+            )
+            for index in range(books)
+        ),
+        batch_size=batch_size,
+    )
+
+
+def serializer_path():
+    books = list(Book.objects.select_related("borrowed_by").defer("search_vector"))
+    fetched = time.process_time()
+    return fetched, JSONRenderer().render(BookSerializer(books, many=True).data)
+
+
+def fast_path():
+    rows = list(Book.objects.values_list(*BOOK_ROW_COLUMNS))
+    fetched = time.process_time()
+    return fetched, BookJSONRenderer().render([render_book_row(row) for row in rows])
+
+
+def measure(path, repeat, books):
+    best = None
+    for _ in range(repeat):
+        borrower_cache.clear()
+        started = time.process_time()
+        fetched, content = path()
+        finished = time.process_time()
+        run = {
+            "fetch_seconds": fetched - started,
+            "render_seconds": finished - fetched,
+            "bytes": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+        }
+        if best is None or finished - started < best["fetch_seconds"] + best["render_seconds"]:
+            best = run
+    total = best["fetch_seconds"] + best["render_seconds"]
+    return {
+        "rows_per_second": round(books / total),
+        "render_rows_per_second": round(books / best["render_seconds"]),
+        "fetch_ms": round(best["fetch_seconds"] * 1000, 1),
+        "render_ms": round(best["render_seconds"] * 1000, 1),
+        "bytes": best["bytes"],
+        "sha256": best["sha256"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--borrowed-share", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs.")
+    args = parser.parse_args()
+
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=args.keepdb)
+    try:
+        Book.objects.all().delete()
+        get_user_model().objects.filter(last_name="Bench").delete()
+        seed(args.books, args.borrowed_share)
+        results = {"parameters": vars(args), "orjson": orjson is not None}
+        results["serializer"] = measure(serializer_path, args.repeat, args.books)
+        with override_settings(BOOK_FAST_SERIALIZATION=True):
+            results["fast"] = measure(fast_path, args.repeat, args.books)
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=args.keepdb)
+
+    if results["serializer"]["sha256"] != results["fast"]["sha256"]:
+        sys.exit("The two paths rendered different output.")
+    results["speedup"] = round(results["fast"]["rows_per_second"] / results["serializer"]["rows_per_second"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
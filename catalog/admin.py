@@ -1,10 +1,21 @@
 from django.contrib import admin
 
+from library_project.changelist import EstimatedCountPaginator
+from library_project.replicas import ReplicaChangeListMixin
+
 from .models import Book
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ("serial_number", "title", "author", "is_borrowed", "borrowed_by", "borrowed_at")
-    search_fields = ("serial_number", "title", "author", "borrowed_by")
+    list_select_related = ("borrowed_by",)
     list_filter = ("is_borrowed",)
+    # Exact and prefix lookups only, each served by an index (the unique serial number, the
+    # borrower index and the UPPER() trigram indexes); icontains would scan the whole table.
+    search_fields = ("serial_number__exact", "title__istartswith", "author__istartswith", "borrowed_by__exact")
+    search_help_text = "Exact serial or library card number, or the beginning of a title or author."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # A select with every library user would not render.
+    raw_id_fields = ("borrowed_by",)
@@ -0,0 +1,95 @@
+"""Asynchronous read paths of the book API.
+
+They mirror the ``BookViewSet`` reads with Django's async ORM, so under the ASGI server a
+request waiting on PostgreSQL or on a slow client does not hold a worker thread. DRF views
+are synchronous, hence plain Django views reusing the filter backend and serializers.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+
+from library_project.replicas import replica_reads
+
+from .export import ASYNC_EXPORT_FORMATS
+from .filters import BookFilterBackend
+from .models import Book
+from .serializers import BookSerializer
+
+
+def _json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def _filtered_books(request):
+    queryset = Book.objects.select_related("borrowed_by").defer("search_vector")
+    return BookFilterBackend().filter_queryset(Request(request), queryset, view=None)
+
+
+class AsyncBookListView(View):
+    """Keyset-paginated book list: ``?page_size=`` and ``?after=<serial_number>`` plus the list filters."""
+
+    async def get(self, request):
+        try:
+            queryset = _filtered_books(request)
+        except serializers.ValidationError as exc:
+            return _json_response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = min(max(int(request.GET["page_size"]), 1), settings.BOOK_PAGINATION["MAX_PAGE_SIZE"])
+        except (KeyError, ValueError):
+            page_size = settings.BOOK_PAGINATION["PAGE_SIZE"]
+        if after := request.GET.get("after"):
+            queryset = queryset.filter(serial_number__gt=after)
+
+        with replica_reads():
+            books = [book async for book in queryset.order_by("serial_number")[: page_size + 1]]
+        next_link = None
+        if len(books) > page_size:
+            books = books[:page_size]
+            next_link = replace_query_param(request.build_absolute_uri(), "after", books[-1].serial_number)
+        return _json_response({"next": next_link, "results": BookSerializer(books, many=True).data})
+
+
+class AsyncBookDetailView(View):
+    async def get(self, request, serial_number):
+        try:
+            with replica_reads():
+                book = (
+                    await Book.objects.select_related("borrowed_by")
+                    .defer("search_vector")
+                    .aget(serial_number=serial_number)
+                )
+        except Book.DoesNotExist:
+            return _json_response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        response = _json_response(BookSerializer(book).data)
+        response["ETag"] = book.etag
+        return response
+
+
+class AsyncBookExportView(View):
+    """Streaming NDJSON/CSV export fed by ``QuerySet.aiterator``."""
+
+    async def get(self, request):
+        output = request.GET.get("output", "ndjson")
+        if output not in ASYNC_EXPORT_FORMATS:
+            return _json_response(
+                {"output": [f"Choose one of: {', '.join(ASYNC_EXPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            queryset = _filtered_books(request)
+        except serializers.ValidationError as exc:
+            return _json_response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, stream = ASYNC_EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(
+            stream(queryset.order_by("serial_number"), settings.BOOK_EXPORT_CHUNK_SIZE),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="books.{output}"'
+        return response
@@ -0,0 +1,73 @@
+"""Process-local cache of rendered borrower summaries.
+
+The same active card holders show up as ``borrowed_by`` on many books, and rendering each of
+them through ``BorrowerSerializer`` builds a fresh serializer per book. This cache maps a library
+card number to the rendered summary, kept in LRU order and bounded by ``BORROWER_CACHE["MAX_SIZE"]``
+entries and ``BORROWER_CACHE["TTL"]`` seconds.
+
+Each entry remembers the field values it was rendered from and is only served for a borrower with
+the same values. An edit made in another worker process therefore can't be served stale. Saves and
+deletions in this process drop the entry at once (see ``catalog.signals``).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import BORROWER_CACHE_EVICTIONS, BORROWER_CACHE_LOOKUPS
+
+
+class BorrowerSummaryCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return settings.BORROWER_CACHE["ENABLED"]
+
+    def get(self, card_number, source, render):
+        """The summary of ``card_number`` rendered from ``source`` values, calling ``render()`` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(card_number)
+            fresh = entry is not None and entry[0] > now and entry[1] == source
+            if fresh:
+                self._entries.move_to_end(card_number)
+        if fresh:
+            BORROWER_CACHE_LOOKUPS.inc("hit")
+            return dict(entry[2])
+        if entry is not None:
+            # Replaced below.
+            BORROWER_CACHE_EVICTIONS.inc("expired" if entry[0] <= now else "changed")
+        BORROWER_CACHE_LOOKUPS.inc("miss")
+
+        summary = dict(render())
+        config = settings.BORROWER_CACHE
+        with self._lock:
+            self._entries[card_number] = (now + config["TTL"], source, summary)
+            self._entries.move_to_end(card_number)
+            overflow = max(len(self._entries) - config["MAX_SIZE"], 0)
+            for _ in range(overflow):
+                self._entries.popitem(last=False)
+        if overflow:
+            BORROWER_CACHE_EVICTIONS.inc("size", amount=overflow)
+        return dict(summary)
+
+    def invalidate(self, card_number):
+        with self._lock:
+            removed = self._entries.pop(card_number, None)
+        if removed is not None:
+            BORROWER_CACHE_EVICTIONS.inc("invalidated")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+borrower_cache = BorrowerSummaryCache()
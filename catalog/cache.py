@@ -0,0 +1,86 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import BOOK_CACHE_LOOKUPS
+from .models import Book
+from .serializers import BOOK_ROW_COLUMNS, BookSerializer, render_book_row
+
+
+class BookRepresentationCache:
+    """Read-through cache of serialized books keyed by ``(pk, version)``.
+
+    ``Book.version`` is bumped by a database trigger on every UPDATE, so a write never has to
+    chase down stale entries: readers simply ask for the key of the version they just read.
+    Entries of superseded versions are evicted on save/delete (see ``catalog.signals``) or
+    expire after ``BOOK_CACHE["TIMEOUT"]`` seconds. Hit/miss counters are per process.
+    """
+
+    key_prefix = "book"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return settings.BOOK_CACHE["ENABLED"]
+
+    @property
+    def cache(self):
+        return caches[settings.BOOK_CACHE["ALIAS"]]
+
+    def make_key(self, pk, version):
+        return f"{self.key_prefix}:{pk}:{version}"
+
+    def render(self, rows):
+        """Return serialized books for ``rows`` (dicts with ``pk`` and ``version``), in order."""
+        keys = [self.make_key(row["pk"], row["version"]) for row in rows]
+        cached = self.cache.get_many(keys)
+        missing_pks = [row["pk"] for row, key in zip(rows, keys) if key not in cached]
+        self._count(hits=len(rows) - len(missing_pks), misses=len(missing_pks))
+
+        representations = {row["pk"]: cached[key] for row, key in zip(rows, keys) if key in cached}
+        if missing_pks:
+            fresh, versions = self._serialize(missing_pks)
+            # Key fresh entries by the version that was actually serialized, which may be newer
+            # than the one in ``rows`` if a write landed in between.
+            self.cache.set_many(
+                {self.make_key(pk, versions[pk]): representation for pk, representation in fresh.items()},
+                timeout=settings.BOOK_CACHE["TIMEOUT"],
+            )
+            representations.update(fresh)
+
+        # Books deleted since ``rows`` was read are skipped.
+        return [representations[row["pk"]] for row in rows if row["pk"] in representations]
+
+    def _serialize(self, pks):
+        """Representations and versions of the books with primary keys ``pks``."""
+        books = Book.objects.filter(pk__in=pks).order_by()
+        if settings.BOOK_FAST_SERIALIZATION:
+            rows = list(books.values_list(*BOOK_ROW_COLUMNS, "pk", "version"))
+            return {row[-2]: render_book_row(row) for row in rows}, {row[-2]: row[-1] for row in rows}
+        books = list(books.select_related("borrowed_by").defer("search_vector"))
+        fresh = dict(zip((book.pk for book in books), BookSerializer(books, many=True).data))
+        return fresh, {book.pk: book.version for book in books}
+
+    def evict(self, book):
+        self.cache.delete(self.make_key(book.pk, book.version))
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else None}
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        BOOK_CACHE_LOOKUPS.inc("hit", amount=hits)
+        BOOK_CACHE_LOOKUPS.inc("miss", amount=misses)
+
+
+book_cache = BookRepresentationCache()
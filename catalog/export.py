@@ -0,0 +1,100 @@
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import BookSerializer
+
+CSV_COLUMNS = ["serial_number", "title", "author", "is_borrowed", "borrowed_at", "borrowed_by"]
+
+
+class _Echo:
+    """File-like object handing each CSV line straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yield lists of at most ``chunk_size`` rows read through a server-side cursor."""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(queryset, chunk_size):
+    """Asynchronous counterpart of ``iter_chunks`` built on ``QuerySet.aiterator``."""
+    chunk = []
+    async for row in queryset.aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_ndjson(books):
+    encoder = JSONEncoder()
+    return "".join(f"{encoder.encode(book)}\n" for book in BookSerializer(books, many=True).data)
+
+
+def render_csv_header():
+    return csv.writer(_Echo()).writerow(CSV_COLUMNS)
+
+
+def render_csv(books):
+    writer = csv.writer(_Echo())
+    lines = []
+    for book in BookSerializer(books, many=True).data:
+        borrower = book["borrowed_by"]
+        lines.append(
+            writer.writerow(
+                [
+                    book["serial_number"],
+                    book["title"],
+                    book["author"],
+                    "true" if book["is_borrowed"] else "false",
+                    book["borrowed_at"] or "",
+                    borrower["library_card_number"] if borrower else "",
+                ]
+            )
+        )
+    return "".join(lines)
+
+
+def iter_ndjson(queryset, chunk_size):
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield render_ndjson(chunk)
+
+
+def iter_csv(queryset, chunk_size):
+    yield render_csv_header()
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield render_csv(chunk)
+
+
+async def aiter_ndjson(queryset, chunk_size):
+    async for chunk in aiter_chunks(queryset, chunk_size):
+        yield render_ndjson(chunk)
+
+
+async def aiter_csv(queryset, chunk_size):
+    yield render_csv_header()
+    async for chunk in aiter_chunks(queryset, chunk_size):
+        yield render_csv(chunk)
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", iter_ndjson),
+    "csv": ("text/csv", iter_csv),
+}
+
+ASYNC_EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", aiter_ndjson),
+    "csv": ("text/csv", aiter_csv),
+}
@@ -0,0 +1,185 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .models import Book, serial_validator
+
+_WHITESPACE = " \t\n\r"
+
+
+class BookImportRowSerializer(serializers.Serializer):
+    serial_number = serializers.CharField(validators=[serial_validator])
+    title = serializers.CharField(max_length=255)
+    author = serializers.CharField(max_length=255)
+
+
+def iter_csv_rows(stream):
+    """Yield the rows of a CSV upload (with a header line) one at a time."""
+    yield from csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+
+
+def iter_json_rows(stream, read_size=64 * 1024, max_item_size=None):
+    """Yield the items of a top-level JSON array while reading the stream in ``read_size`` pieces.
+
+    An item longer than ``max_item_size`` characters (``BOOK_IMPORT["MAX_ITEM_SIZE"]`` by default)
+    is rejected with ``ValueError`` instead of being buffered whole.
+    """
+    max_item_size = max_item_size or settings.BOOK_IMPORT["MAX_ITEM_SIZE"]
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, position, exhausted = "", 0, False
+
+    def read_more():
+        nonlocal buffer, position, exhausted
+        if exhausted:
+            raise ValueError("Unexpected end of the JSON document.")
+        if len(buffer) - position > max_item_size:
+            raise ValueError(f"A JSON array item is longer than {max_item_size} characters.")
+        chunk = stream.read(read_size)
+        exhausted = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=exhausted)
+        position = 0
+
+    def peek():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            read_more()
+
+    if peek() != "[":
+        raise ValueError("Expected a JSON array of books.")
+    position += 1
+    if peek() == "]":
+        return
+
+    while True:
+        peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise ValueError("Invalid JSON document.") from None
+                read_more()
+                continue
+            # Only trust the value once the following separator is buffered too; otherwise it may
+            # have been cut short (e.g. "12" out of "125").
+            following = end
+            while following < len(buffer) and buffer[following] in _WHITESPACE:
+                following += 1
+            if (following == len(buffer) or buffer[following] not in ",]") and not exhausted:
+                read_more()
+                continue
+            break
+        position = end
+        yield item
+
+        separator = peek()
+        position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("Expected ',' between array items.")
+
+
+IMPORT_FORMATS = {
+    "csv": iter_csv_rows,
+    "json": iter_json_rows,
+}
+
+
+class BookImporter:
+    """Validate and insert books in batches of ``batch_size`` rows.
+
+    Each batch is checked against ``serial_validator``, probed for already existing serial
+    numbers with a single ``IN`` query and written with ``bulk_create`` in its own transaction,
+    so an error in the input leaves the batches before it imported. A batch that collides with
+    serial numbers a concurrent import has just committed is probed and written again. Only the first
+    ``max_reported_errors`` rejections are kept in memory; every rejection is also passed to
+    ``on_error`` so callers can stream a complete report elsewhere.
+    """
+
+    def __init__(self, batch_size=None, max_reported_errors=None, on_error=None):
+        self.batch_size = batch_size or settings.BOOK_IMPORT["BATCH_SIZE"]
+        self.max_reported_errors = (
+            settings.BOOK_IMPORT["MAX_REPORTED_ERRORS"] if max_reported_errors is None else max_reported_errors
+        )
+        self.on_error = on_error
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+        self._seen_serial_numbers = set()
+
+    def run(self, rows):
+        numbered_rows = enumerate(rows, start=1)
+        while batch := list(islice(numbered_rows, self.batch_size)):
+            self._import_batch(batch)
+        return self.report()
+
+    def report(self):
+        return {"created": self.created, "rejected": self.rejected, "errors": self.errors}
+
+    def _import_batch(self, batch):
+        rejections = []
+        candidates = []
+        for row_number, row in batch:
+            if not isinstance(row, dict):
+                rejections.append((row_number, None, {"non_field_errors": ["Expected an object with book fields."]}))
+                continue
+            serializer = BookImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                rejections.append((row_number, row.get("serial_number"), serializer.errors))
+                continue
+            candidates.append((row_number, serializer.validated_data))
+
+        while True:
+            try:
+                with transaction.atomic():
+                    books, duplicates = self._new_books(candidates)
+                    Book.objects.bulk_create(books, batch_size=self.batch_size)
+                break
+            except IntegrityError:
+                # A concurrent import committed some of these serial numbers after the probe:
+                # probe again. Any other integrity error is not resolved by retrying.
+                if not Book.objects.filter(serial_number__in=[book.serial_number for book in books]).exists():
+                    raise
+        self._seen_serial_numbers.update(book.serial_number for book in books)
+        self.created += len(books)
+        rejections.extend(duplicates)
+
+        for row_number, serial_number, errors in sorted(rejections, key=lambda rejection: rejection[0]):
+            self._reject({"row": row_number, "serial_number": serial_number, "errors": errors})
+
+    def _new_books(self, candidates):
+        """The books to insert for ``candidates``, and the rejections of already used serial numbers."""
+        existing = set(
+            Book.objects.filter(serial_number__in=[data["serial_number"] for _, data in candidates]).values_list(
+                "serial_number", flat=True
+            )
+        )
+        books, duplicates, batch = [], [], set()
+        for row_number, data in candidates:
+            serial_number = data["serial_number"]
+            if serial_number in existing or serial_number in self._seen_serial_numbers or serial_number in batch:
+                duplicates.append(
+                    (row_number, serial_number, {"serial_number": ["Book with this serial number already exists."]})
+                )
+                continue
+            batch.add(serial_number)
+            books.append(Book(**data))
+        return books, duplicates
+
+    def _reject(self, error):
+        self.rejected += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append(error)
+        if self.on_error:
+            self.on_error(error)
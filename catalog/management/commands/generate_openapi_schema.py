@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library_project.schema import (
+    generate_schema,
+    read_artifact,
+    source_fingerprint,
+    write_artifact,
+)
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema served at /api/schema/, unless the stored one matches the current code."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate even if the stored schema is current.")
+
+    def handle(self, *args, force, **options):
+        path = settings.API_DOCUMENTATION["SCHEMA_FILE"]
+        fingerprint = source_fingerprint()
+        if not force and read_artifact(path, fingerprint) is not None:
+            self.stdout.write(f"The OpenAPI schema in {path} is up to date.")
+            return
+        write_artifact(path, fingerprint, generate_schema())
+        self.stdout.write(self.style.SUCCESS(f"OpenAPI schema written to {path}."))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importing import IMPORT_FORMATS, BookImporter
+
+
+class Command(BaseCommand):
+    help = "Bulk-import books from a CSV (serial_number,title,author header) or JSON array file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument(
+            "--format",
+            dest="input_format",
+            choices=sorted(IMPORT_FORMATS),
+            help="Input format; defaults to the file extension.",
+        )
+        parser.add_argument("--batch-size", type=int, help="Rows validated and inserted per batch.")
+        parser.add_argument("--errors-file", help="Write every rejected row to this file as NDJSON.")
+
+    def handle(self, *args, path, input_format, batch_size, errors_file, **options):
+        input_format = input_format or path.rpartition(".")[2].lower()
+        if input_format not in IMPORT_FORMATS:
+            raise CommandError(f"Cannot infer the format of {path}; pass --format.")
+
+        errors_stream = open(errors_file, "w", encoding="utf-8") if errors_file else None
+        importer = BookImporter(
+            batch_size=batch_size,
+            max_reported_errors=0 if errors_stream else None,
+            on_error=(lambda error: errors_stream.write(f"{json.dumps(error)}\n")) if errors_stream else None,
+        )
+        try:
+            with open(path, "rb") as stream:
+                report = importer.run(IMPORT_FORMATS[input_format](stream))
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f"{exc} ({importer.created} books imported before the error.)") from exc
+        finally:
+            if errors_stream:
+                errors_stream.close()
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} books, rejected {report['rejected']}."))
@@ -0,0 +1,134 @@
+import re
+from datetime import date, datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog.models import Loan
+
+PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+FORGET_LOANS = [
+    """
+    UPDATE catalog_authorcirculation SET loans = catalog_authorcirculation.loans - detached.loans
+    FROM (
+        SELECT author, count(*) AS loans FROM "{name}" JOIN catalog_book ON catalog_book.id = "{name}".book_id
+        GROUP BY author
+    ) AS detached
+    WHERE catalog_authorcirculation.author = detached.author
+    """,
+    """
+    UPDATE catalog_borrowercirculation SET loans = catalog_borrowercirculation.loans - detached.loans
+    FROM (SELECT borrower_id, count(*) AS loans FROM "{name}" GROUP BY borrower_id) AS detached
+    WHERE catalog_borrowercirculation.borrower_id = detached.borrower_id
+    """,
+    "DELETE FROM catalog_borrowercirculation WHERE borrowed = 0 AND loans = 0",
+]
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the loan history ahead of time (moving matching rows out of the "
+        "default partition) and optionally detach old months for archiving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead", type=int, default=3, help="Months after the current one to create partitions for."
+        )
+        parser.add_argument(
+            "--detach-before",
+            metavar="YYYY-MM",
+            help="Detach the partitions of months before this one. They stay in the database as plain tables "
+            "until archived (e.g. with pg_dump) and dropped.",
+        )
+
+    def handle(self, *args, months_ahead, detach_before, **options):
+        table = Loan._meta.db_table
+        existing = self.partitions(table)
+
+        months = set(self.months_in_default_partition(table))
+        month = month_start(datetime.now(timezone.utc).date())
+        for _ in range(months_ahead + 1):
+            months.add(month)
+            month = next_month(month)
+
+        for month in sorted(months - set(existing)):
+            moved = self.create_partition(table, month)
+            self.stdout.write(f"Created {table}_p{month:%Y%m} ({moved} loans moved from the default partition).")
+
+        if detach_before:
+            try:
+                cutoff = datetime.strptime(detach_before, "%Y-%m").date()
+            except ValueError:
+                raise CommandError("--detach-before must be given as YYYY-MM.")
+            for month, name in sorted(existing.items()):
+                if month < cutoff:
+                    self.detach_partition(table, name)
+                    self.stdout.write(f"Detached {name}.")
+
+        self.stdout.write(self.style.SUCCESS("Loan partitions are up to date."))
+
+    def partitions(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = %s::regclass",
+                [table],
+            )
+            names = [name for (name,) in cursor.fetchall()]
+        return {date(int(match[1]), int(match[2]), 1): name for name in names if (match := PARTITION_NAME.search(name))}
+
+    def months_in_default_partition(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', borrowed_at AT TIME ZONE 'UTC')::date FROM \"{table}_default\""
+            )
+            return [month for (month,) in cursor.fetchall()]
+
+    @transaction.atomic
+    def create_partition(self, table, month):
+        # Attaching a range the default partition already holds rows for would fail, so the new
+        # partition is filled from the default one before it is attached.
+        name = f"{table}_p{month:%Y%m}"
+        bounds = [
+            datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+            datetime(next_month(month).year, next_month(month).month, 1, tzinfo=timezone.utc),
+        ]
+        with connection.cursor() as cursor:
+            # ALTER TABLE refuses to run while deferred foreign key checks are pending.
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{table}_default" WHERE borrowed_at >= %s AND borrowed_at < %s '
+                f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved',
+                bounds,
+            )
+            moved = cursor.rowcount
+            cursor.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+                bounds,
+            )
+        return moved
+
+    @transaction.atomic
+    def detach_partition(self, table, name):
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            # Detaching fires no triggers: take the month's loans out of the statistics, which
+            # count the loan history (see rebuild_circulation_stats).
+            for statement in FORGET_LOANS:
+                cursor.execute(statement.format(name=name))
+            # Archived loans must not keep their books and borrowers from being deleted.
+            cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name])
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE "{name}" DROP CONSTRAINT "{constraint}"')
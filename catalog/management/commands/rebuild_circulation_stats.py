@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from catalog.models import AuthorCirculation, BorrowerCirculation, CirculationCounter
+
+# Loans are counted from the loan history, as the catalog_loan triggers do (see migration 0012):
+# per author of the referenced book and per borrower.
+REBUILD_STATEMENTS = [
+    "DELETE FROM catalog_circulationcounter",
+    "DELETE FROM catalog_authorcirculation",
+    "DELETE FROM catalog_borrowercirculation",
+    """
+    INSERT INTO catalog_circulationcounter (shard, books, borrowed)
+    SELECT shard, count(catalog_book.id), count(catalog_book.id) FILTER (WHERE is_borrowed)
+    FROM generate_series(0, %s - 1) AS shard LEFT JOIN catalog_book ON catalog_book.id %% %s = shard
+    GROUP BY shard
+    """,
+    """
+    INSERT INTO catalog_authorcirculation (author, books, borrowed, loans)
+    SELECT author, count(*), count(*) FILTER (WHERE is_borrowed), coalesce(sum(loans), 0)
+    FROM catalog_book LEFT JOIN (SELECT book_id, count(*) AS loans FROM catalog_loan GROUP BY book_id) AS book_loans
+        ON book_loans.book_id = catalog_book.id
+    GROUP BY author
+    """,
+    """
+    INSERT INTO catalog_borrowercirculation (borrower_id, borrowed, loans)
+    SELECT borrower_id, sum(borrowed), sum(loans) FROM (
+        SELECT borrowed_by_id AS borrower_id, 1 AS borrowed, 0 AS loans FROM catalog_book
+        WHERE is_borrowed AND borrowed_by_id IS NOT NULL
+        UNION ALL
+        SELECT borrower_id, 0, 1 FROM catalog_loan WHERE borrower_id IS NOT NULL
+    ) AS contributions
+    GROUP BY borrower_id
+    """,
+]
+
+
+class Command(BaseCommand):
+    help = "Recompute the circulation statistics from the books and the loan history."
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Book and loan writes wait for the rebuild, so no trigger delta lands between the
+            # recount and the commit. Reads of both tables carry on.
+            cursor.execute("LOCK TABLE catalog_book, catalog_loan IN SHARE ROW EXCLUSIVE MODE")
+            for statement in REBUILD_STATEMENTS:
+                params = [CirculationCounter.SHARDS] * 2 if "%s" in statement else None
+                cursor.execute(statement, params)
+
+        totals = CirculationCounter.totals()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt circulation statistics: {totals['books']} books, {totals['borrowed']} borrowed, "
+                f"{AuthorCirculation.objects.count()} authors, {BorrowerCirculation.objects.count()} borrowers."
+            )
+        )
@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from catalog.overdue import fetch_chunk, iter_chunk_bounds, write_report
+
+
+def _encode_position(position):
+    return None if position is None else [position[0], position[1].isoformat(), position[2]]
+
+
+def _decode_position(position):
+    return None if position is None else (position[0], datetime.fromisoformat(position[1]), position[2])
+
+
+class Command(BaseCommand):
+    help = (
+        "Report books borrowed longer than the loan period, grouped by borrower. The scan walks borrowed books "
+        "in keyset chunks and checkpoints after each one; rerunning an interrupted scan resumes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Report file; the checkpoint is kept next to it until the scan finishes.")
+        parser.add_argument("--format", dest="output_format", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument("--days", type=int, help="Loan period in days (default: BOOK_LOAN_PERIOD_DAYS).")
+        parser.add_argument("--chunk-size", type=int, help="Books per query (default: OVERDUE_SCAN_CHUNK_SIZE).")
+        parser.add_argument("--workers", type=int, default=1, help="Processes fetching chunks in parallel.")
+        parser.add_argument(
+            "--pause", type=float, default=0, help="Seconds to sleep between chunks, to go easy on the database."
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over.")
+
+    def handle(self, *args, output, output_format, days, chunk_size, workers, pause, restart, **options):
+        config = settings.OVERDUE_LOANS
+        days = config["LOAN_PERIOD_DAYS"] if days is None else days
+        chunk_size = chunk_size or config["CHUNK_SIZE"]
+        if chunk_size < 1 or workers < 1:
+            raise CommandError("--chunk-size and --workers must be positive.")
+
+        output = Path(output)
+        checkpoint_path = output.with_name(f"{output.name}.checkpoint")
+        spool_path = output.with_name(f"{output.name}.partial")
+
+        checkpoint = None if restart else self.load_checkpoint(checkpoint_path, days)
+        if checkpoint:
+            self.stdout.write(f"Resuming the scan after borrower {checkpoint['after'][0] or '(deleted)'}.")
+        else:
+            checkpoint = {"days": days, "cutoff": (timezone.now() - timedelta(days=days)).isoformat(), "after": None}
+            checkpoint["spool_size"] = 0
+        cutoff = datetime.fromisoformat(checkpoint["cutoff"])
+
+        bounds = list(iter_chunk_bounds(cutoff, chunk_size, _decode_position(checkpoint["after"])))
+        fetch = partial(fetch_chunk, cutoff)
+        pool = None
+        if workers > 1:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            pool = multiprocessing.Pool(workers)
+            chunks = pool.imap(fetch, bounds)
+        else:
+            chunks = map(fetch, bounds)
+
+        with open(spool_path, "a+", encoding="utf-8") as spool:
+            # Drop whatever an interrupted run appended after its last checkpoint.
+            spool.truncate(checkpoint["spool_size"])
+            try:
+                for (_, last), loans in zip(bounds, chunks):
+                    spool.writelines(f"{json.dumps(loan)}\n" for loan in loans)
+                    spool.flush()
+                    if last is not None:
+                        checkpoint.update(after=_encode_position(last), spool_size=spool.tell())
+                        self.save_checkpoint(checkpoint_path, checkpoint)
+                    if pause:
+                        time.sleep(pause)
+            finally:
+                if pool is not None:
+                    pool.terminate()
+
+            # The chunks were spooled in borrower order, so the report is written while reading it back.
+            spool.seek(0)
+            temporary_output = output.with_name(f"{output.name}.tmp")
+            with open(temporary_output, "w", encoding="utf-8", newline="") as report:
+                loans, borrowers = write_report(map(json.loads, spool), report, output_format, cutoff)
+        os.replace(temporary_output, output)
+        checkpoint_path.unlink(missing_ok=True)
+        spool_path.unlink()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Found {loans} overdue loans of {borrowers} borrowers; report written to {output}.")
+        )
+
+    def load_checkpoint(self, path, days):
+        try:
+            checkpoint = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        if checkpoint["days"] != days:
+            raise CommandError(f"{path} belongs to a scan with a different loan period; pass --restart to discard it.")
+        return checkpoint
+
+    def save_checkpoint(self, path, checkpoint):
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        temporary_path.write_text(json.dumps(checkpoint))
+        os.replace(temporary_path, path)
@@ -0,0 +1,22 @@
+from library_project.metrics import Counter
+
+BORROWING_OPERATIONS = Counter(
+    "library_borrowing_operations_total",
+    "Borrowing status changes of books, by operation (borrow, return) and outcome (ok, conflict).",
+    ["operation", "outcome"],
+)
+BOOK_CACHE_LOOKUPS = Counter(
+    "library_book_cache_lookups_total",
+    "Lookups in the serialized book cache, by result (hit, miss).",
+    ["result"],
+)
+BORROWER_CACHE_LOOKUPS = Counter(
+    "library_borrower_cache_lookups_total",
+    "Lookups in the rendered borrower summary cache, by result (hit, miss).",
+    ["result"],
+)
+BORROWER_CACHE_EVICTIONS = Counter(
+    "library_borrower_cache_evictions_total",
+    "Entries dropped from the borrower summary cache, by reason (size, expired, changed, invalidated).",
+    ["reason"],
+)
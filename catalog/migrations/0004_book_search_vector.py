@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE FUNCTION catalog_book_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_search_vector
+    BEFORE INSERT OR UPDATE OF title, author, search_vector ON catalog_book
+    FOR EACH ROW EXECUTE FUNCTION catalog_book_search_vector_update();
+
+UPDATE catalog_book SET title = title;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS catalog_book_search_vector ON catalog_book;
+DROP FUNCTION IF EXISTS catalog_book_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0003_book_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:15
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+CREATE_TRIGGERS = """
+INSERT INTO catalog_catalogversion (id, version, changed_at) VALUES (1, 0, now());
+
+CREATE FUNCTION catalog_bump_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_catalogversion SET version = version + 1, changed_at = now() WHERE id = 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_book
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_borrower_bump_version
+    AFTER UPDATE OF library_card_number, first_name, last_name, email ON account_libraryuser
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS catalog_borrower_bump_version ON account_libraryuser;
+DROP TRIGGER IF EXISTS catalog_book_bump_version ON catalog_book;
+DROP FUNCTION IF EXISTS catalog_bump_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("catalog", "0004_book_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+CREATE_TRIGGER = """
+CREATE FUNCTION catalog_book_bump_row_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_row_version
+    BEFORE UPDATE ON catalog_book
+    FOR EACH ROW EXECUTE FUNCTION catalog_book_bump_row_version();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS catalog_book_row_version ON catalog_book;
+DROP FUNCTION IF EXISTS catalog_book_bump_row_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0005_catalog_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="version",
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
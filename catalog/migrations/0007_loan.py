@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# catalog_loan is range-partitioned by month on borrowed_at; the primary key has to include the
+# partition key. Months without a partition (see the loan_partitions command) land in the default
+# partition. Foreign keys match the ones Django creates (deferred, cascades handled by the ORM).
+CREATE_TABLE = """
+CREATE TABLE catalog_loan (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    borrowed_at timestamp with time zone NOT NULL,
+    returned_at timestamp with time zone NULL,
+    book_id bigint NOT NULL
+        CONSTRAINT catalog_loan_book_id_fk_catalog_book_id
+        REFERENCES catalog_book (id) DEFERRABLE INITIALLY DEFERRED,
+    borrower_id varchar(6) NOT NULL
+        CONSTRAINT catalog_loan_borrower_id_fk_account_libraryuser
+        REFERENCES account_libraryuser (library_card_number) DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY (id, borrowed_at)
+) PARTITION BY RANGE (borrowed_at);
+
+CREATE TABLE catalog_loan_default PARTITION OF catalog_loan DEFAULT;
+"""
+
+DROP_TABLE = "DROP TABLE catalog_loan;"
+
+# Books on loan when the history starts get an open loan.
+BACKFILL_OPEN_LOANS = """
+INSERT INTO catalog_loan (book_id, borrower_id, borrowed_at)
+SELECT id, borrowed_by_id, borrowed_at
+FROM catalog_book
+WHERE is_borrowed AND borrowed_by_id IS NOT NULL AND borrowed_at IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("catalog", "0006_book_version"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(CREATE_TABLE, DROP_TABLE)],
+            state_operations=[
+                migrations.CreateModel(
+                    name="Loan",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                            ),
+                        ),
+                        ("borrowed_at", models.DateTimeField()),
+                        ("returned_at", models.DateTimeField(blank=True, null=True)),
+                        (
+                            "book",
+                            models.ForeignKey(
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="loans",
+                                to="catalog.book",
+                            ),
+                        ),
+                        (
+                            "borrower",
+                            models.ForeignKey(
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="loans",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(fields=["borrower", "borrowed_at"], name="loan_borrower_borrowed_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(fields=["book", "borrowed_at"], name="loan_book_borrowed_at_idx"),
+        ),
+        migrations.RunSQL(BACKFILL_OPEN_LOANS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,161 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Rows touched by a statement become deltas: -1 for the old state, +1 for the new one. The three
+# upserts aggregate them per shard, author and borrower, in key order so that concurrent writers
+# lock rows in the same sequence. A "loan" is a transition into the borrowed state.
+APPLY_DELTAS = """
+    , shards AS (
+        INSERT INTO catalog_circulationcounter AS c (shard, books, borrowed)
+        SELECT id % 16, sum(sign), sum(sign * is_borrowed::int) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 ORDER BY 1
+        ON CONFLICT (shard) DO UPDATE SET books = c.books + EXCLUDED.books, borrowed = c.borrowed + EXCLUDED.borrowed
+    ), authors AS (
+        INSERT INTO catalog_authorcirculation AS a (author, books, borrowed, loans)
+        SELECT author, sum(sign), sum(sign * is_borrowed::int), sum(new_loan) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 OR sum(new_loan) <> 0 ORDER BY 1
+        ON CONFLICT (author) DO UPDATE SET
+            books = a.books + EXCLUDED.books, borrowed = a.borrowed + EXCLUDED.borrowed, loans = a.loans + EXCLUDED.loans
+    )
+    INSERT INTO catalog_borrowercirculation AS b (borrower_id, borrowed, loans)
+    SELECT borrower_id, sum(sign * is_borrowed::int), sum(new_loan) FROM deltas WHERE borrower_id IS NOT NULL
+    GROUP BY 1 HAVING sum(sign * is_borrowed::int) <> 0 OR sum(new_loan) <> 0 ORDER BY 1
+    ON CONFLICT (borrower_id) DO UPDATE SET borrowed = b.borrowed + EXCLUDED.borrowed, loans = b.loans + EXCLUDED.loans;
+"""
+
+CHANGED_ROWS = """
+            FROM old_books o JOIN new_books n ON n.id = o.id
+            WHERE (o.author, o.is_borrowed, o.borrowed_by_id) IS DISTINCT FROM (n.author, n.is_borrowed, n.borrowed_by_id)
+"""
+
+CREATE_TRIGGERS = f"""
+CREATE FUNCTION catalog_update_circulation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, 1 AS sign, is_borrowed, is_borrowed::int AS new_loan
+            FROM new_books
+        ) {APPLY_DELTAS}
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, -1 AS sign, is_borrowed, 0 AS new_loan
+            FROM old_books
+        ) {APPLY_DELTAS}
+    ELSE
+        WITH deltas AS (
+            SELECT o.id, o.author, o.borrowed_by_id AS borrower_id, -1 AS sign, o.is_borrowed, 0 AS new_loan
+            {CHANGED_ROWS}
+            UNION ALL
+            SELECT n.id, n.author, n.borrowed_by_id, 1, n.is_borrowed, (n.is_borrowed AND NOT o.is_borrowed)::int
+            {CHANGED_ROWS}
+        ) {APPLY_DELTAS}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_circulation_insert
+    AFTER INSERT ON catalog_book REFERENCING NEW TABLE AS new_books
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_update_circulation();
+
+CREATE TRIGGER catalog_book_circulation_update
+    AFTER UPDATE ON catalog_book REFERENCING OLD TABLE AS old_books NEW TABLE AS new_books
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_update_circulation();
+
+CREATE TRIGGER catalog_book_circulation_delete
+    AFTER DELETE ON catalog_book REFERENCING OLD TABLE AS old_books
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_update_circulation();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS catalog_book_circulation_delete ON catalog_book;
+DROP TRIGGER IF EXISTS catalog_book_circulation_update ON catalog_book;
+DROP TRIGGER IF EXISTS catalog_book_circulation_insert ON catalog_book;
+DROP FUNCTION IF EXISTS catalog_update_circulation();
+"""
+
+# Same as the rebuild_circulation_stats command when this migration was written; loans are
+# counted from the loan history.
+POPULATE = """
+INSERT INTO catalog_circulationcounter (shard, books, borrowed)
+SELECT shard, count(catalog_book.id), count(catalog_book.id) FILTER (WHERE is_borrowed)
+FROM generate_series(0, 15) AS shard LEFT JOIN catalog_book ON catalog_book.id % 16 = shard
+GROUP BY shard;
+
+INSERT INTO catalog_authorcirculation (author, books, borrowed, loans)
+SELECT author, count(*), count(*) FILTER (WHERE is_borrowed), coalesce(sum(loans), 0)
+FROM catalog_book LEFT JOIN (SELECT book_id, count(*) AS loans FROM catalog_loan GROUP BY book_id) AS book_loans
+    ON book_loans.book_id = catalog_book.id
+GROUP BY author;
+
+INSERT INTO catalog_borrowercirculation (borrower_id, borrowed, loans)
+SELECT borrower_id, sum(borrowed), sum(loans) FROM (
+    SELECT borrowed_by_id AS borrower_id, 1 AS borrowed, 0 AS loans FROM catalog_book
+    WHERE is_borrowed AND borrowed_by_id IS NOT NULL
+    UNION ALL
+    SELECT borrower_id, 0, 1 FROM catalog_loan
+) AS contributions
+GROUP BY borrower_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0002_add_sample_users"),
+        ("catalog", "0007_loan"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CirculationCounter",
+            fields=[
+                (
+                    "shard",
+                    models.PositiveSmallIntegerField(primary_key=True, serialize=False),
+                ),
+                ("books", models.BigIntegerField(default=0)),
+                ("borrowed", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BorrowerCirculation",
+            fields=[
+                (
+                    "borrower",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="circulation",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("borrowed", models.BigIntegerField(default=0)),
+                ("loans", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["-loans", "borrower"], name="borrower_circulation_loans_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="AuthorCirculation",
+            fields=[
+                (
+                    "author",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("books", models.BigIntegerField(default=0)),
+                ("borrowed", models.BigIntegerField(default=0)),
+                ("loans", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["-loans", "author"], name="author_circulation_loans_idx")],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunSQL(POPULATE, migrations.RunSQL.noop),
+    ]
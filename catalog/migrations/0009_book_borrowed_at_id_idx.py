@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_circulation_stats"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="book",
+            name="book_borrowed_at_idx",
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                condition=models.Q(("is_borrowed", True)),
+                fields=["borrowed_at", "id"],
+                name="book_borrowed_at_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+# The single catalog_catalogversion row was updated by every writing statement and stayed locked
+# until commit, so all book writes queued on it. It becomes 16 shards (the old count is kept in
+# shard 0); each statement bumps the shard of its backend pid, and only if it changed a row.
+RESHAPE_TABLE = """
+DROP TRIGGER catalog_borrower_bump_version ON account_libraryuser;
+DROP TRIGGER catalog_book_bump_version ON catalog_book;
+DROP FUNCTION catalog_bump_version();
+
+ALTER TABLE catalog_catalogversion DROP COLUMN changed_at;
+ALTER TABLE catalog_catalogversion ALTER COLUMN id DROP IDENTITY IF EXISTS;
+ALTER TABLE catalog_catalogversion RENAME COLUMN id TO shard;
+ALTER TABLE catalog_catalogversion ALTER COLUMN shard TYPE smallint;
+UPDATE catalog_catalogversion SET shard = 0;
+ALTER TABLE catalog_catalogversion ADD CONSTRAINT catalog_catalogversion_shard_check CHECK (shard >= 0);
+"""
+
+CREATE_TRIGGERS = """
+CREATE FUNCTION catalog_record_change() RETURNS void AS $$
+    INSERT INTO catalog_catalogversion AS v (shard, version) VALUES (pg_backend_pid() % 16, 1)
+    ON CONFLICT (shard) DO UPDATE SET version = v.version + 1;
+$$ LANGUAGE sql;
+
+CREATE FUNCTION catalog_bump_version() RETURNS trigger AS $$
+BEGIN
+    -- Statements matching no rows (e.g. a lost optimistic update) change nothing.
+    IF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT FROM changed_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    PERFORM catalog_record_change();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION catalog_borrower_bump_version() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (
+        SELECT FROM (
+            SELECT library_card_number, first_name, last_name, email FROM new_users
+            EXCEPT SELECT library_card_number, first_name, last_name, email FROM old_users
+        ) AS changed
+        JOIN catalog_book ON catalog_book.borrowed_by_id = changed.library_card_number
+    ) THEN
+        PERFORM catalog_record_change();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_bump_version_insert
+    AFTER INSERT ON catalog_book REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_book_bump_version_update
+    AFTER UPDATE ON catalog_book REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_book_bump_version_delete
+    AFTER DELETE ON catalog_book REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_book_bump_version_truncate
+    AFTER TRUNCATE ON catalog_book
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_borrower_bump_version
+    AFTER UPDATE ON account_libraryuser REFERENCING OLD TABLE AS old_users NEW TABLE AS new_users
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_borrower_bump_version();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER catalog_borrower_bump_version ON account_libraryuser;
+DROP TRIGGER catalog_book_bump_version_truncate ON catalog_book;
+DROP TRIGGER catalog_book_bump_version_delete ON catalog_book;
+DROP TRIGGER catalog_book_bump_version_update ON catalog_book;
+DROP TRIGGER catalog_book_bump_version_insert ON catalog_book;
+DROP FUNCTION catalog_borrower_bump_version();
+DROP FUNCTION catalog_bump_version();
+DROP FUNCTION catalog_record_change();
+"""
+
+# Back to one row holding the total, with the triggers of migration 0005.
+RESTORE_TABLE = """
+CREATE TABLE catalog_catalogversion_total AS SELECT coalesce(sum(version), 0) AS version FROM catalog_catalogversion;
+DELETE FROM catalog_catalogversion;
+ALTER TABLE catalog_catalogversion DROP CONSTRAINT catalog_catalogversion_shard_check;
+ALTER TABLE catalog_catalogversion ALTER COLUMN shard TYPE bigint;
+ALTER TABLE catalog_catalogversion RENAME COLUMN shard TO id;
+ALTER TABLE catalog_catalogversion ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;
+ALTER TABLE catalog_catalogversion ADD COLUMN changed_at timestamp with time zone NOT NULL DEFAULT now();
+INSERT INTO catalog_catalogversion (id, version) SELECT 1, version FROM catalog_catalogversion_total;
+DROP TABLE catalog_catalogversion_total;
+
+CREATE FUNCTION catalog_bump_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_catalogversion SET version = version + 1, changed_at = now() WHERE id = 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_book_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_book
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_borrower_bump_version
+    AFTER UPDATE OF library_card_number, first_name, last_name, email ON account_libraryuser
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_book_borrowed_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(RESHAPE_TABLE, RESTORE_TABLE)],
+            state_operations=[
+                migrations.DeleteModel(name="CatalogVersion"),
+                migrations.CreateModel(
+                    name="CatalogVersion",
+                    fields=[
+                        ("shard", models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                        ("version", models.BigIntegerField(default=0)),
+                    ],
+                ),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
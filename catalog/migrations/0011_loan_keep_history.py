@@ -0,0 +1,82 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Loans outlive their book and borrower: the foreign keys become nullable (set to NULL by the
+# ORM on delete) and each loan keeps copies of the serial and library card numbers.
+KEEP_HISTORY = """
+ALTER TABLE catalog_loan
+    ADD COLUMN serial_number varchar(6),
+    ADD COLUMN library_card_number varchar(6);
+UPDATE catalog_loan
+SET serial_number = catalog_book.serial_number, library_card_number = catalog_loan.borrower_id
+FROM catalog_book
+WHERE catalog_book.id = catalog_loan.book_id;
+ALTER TABLE catalog_loan
+    ALTER COLUMN serial_number SET NOT NULL,
+    ALTER COLUMN library_card_number SET NOT NULL,
+    ALTER COLUMN book_id DROP NOT NULL,
+    ALTER COLUMN borrower_id DROP NOT NULL;
+"""
+
+# Loans of deleted books or users cannot be linked again.
+DROP_HISTORY = """
+DELETE FROM catalog_loan WHERE book_id IS NULL OR borrower_id IS NULL;
+ALTER TABLE catalog_loan
+    ALTER COLUMN book_id SET NOT NULL,
+    ALTER COLUMN borrower_id SET NOT NULL,
+    DROP COLUMN serial_number,
+    DROP COLUMN library_card_number;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("catalog", "0010_shard_catalog_version"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(KEEP_HISTORY, DROP_HISTORY)],
+            state_operations=[
+                migrations.AddField(
+                    model_name="loan",
+                    name="serial_number",
+                    field=models.CharField(max_length=6),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name="loan",
+                    name="library_card_number",
+                    field=models.CharField(max_length=6),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name="loan",
+                    name="book",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="loans",
+                        to="catalog.book",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="loan",
+                    name="borrower",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="loans",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,251 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Loan counts used to be bumped by the catalog_book triggers on every transition into the borrowed
+# state, while rebuild_circulation_stats counted catalog_loan rows, so the two disagreed once a
+# book or user was deleted or a book was flagged borrowed without a loan. Now the loan history is
+# the only source: triggers on catalog_loan count its rows per author (of the referenced book) and
+# per borrower, and the book triggers move a book's loans along when its author changes or it is
+# deleted while loans still reference it. Authors left without books are removed, as the rebuild
+# would not recreate them.
+BOOK_LOANS = "(SELECT count(*) FROM catalog_loan WHERE catalog_loan.book_id = {book}.id)"
+
+APPLY_BOOK_DELTAS = """
+    , shards AS (
+        INSERT INTO catalog_circulationcounter AS c (shard, books, borrowed)
+        SELECT id % 16, sum(sign), sum(sign * is_borrowed::int) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 ORDER BY 1
+        ON CONFLICT (shard) DO UPDATE SET books = c.books + EXCLUDED.books, borrowed = c.borrowed + EXCLUDED.borrowed
+    ), authors AS (
+        INSERT INTO catalog_authorcirculation AS a (author, books, borrowed, loans)
+        SELECT author, sum(sign), sum(sign * is_borrowed::int), sum(loans) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 OR sum(loans) <> 0 ORDER BY 1
+        ON CONFLICT (author) DO UPDATE SET
+            books = a.books + EXCLUDED.books, borrowed = a.borrowed + EXCLUDED.borrowed, loans = a.loans + EXCLUDED.loans
+    )
+    INSERT INTO catalog_borrowercirculation AS b (borrower_id, borrowed, loans)
+    SELECT borrower_id, sum(sign * is_borrowed::int), 0 FROM deltas WHERE borrower_id IS NOT NULL
+    GROUP BY 1 HAVING sum(sign * is_borrowed::int) <> 0 ORDER BY 1
+    ON CONFLICT (borrower_id) DO UPDATE SET borrowed = b.borrowed + EXCLUDED.borrowed;
+"""
+
+CHANGED_BOOKS = """
+            FROM old_books o JOIN new_books n ON n.id = o.id
+            WHERE (o.author, o.is_borrowed, o.borrowed_by_id) IS DISTINCT FROM (n.author, n.is_borrowed, n.borrowed_by_id)
+"""
+
+MOVED_LOANS = f"CASE WHEN o.author IS DISTINCT FROM n.author THEN {BOOK_LOANS.format(book='o')} ELSE 0 END"
+
+APPLY_LOAN_DELTAS = """
+    , authors AS (
+        INSERT INTO catalog_authorcirculation AS a (author, books, borrowed, loans)
+        SELECT author, 0, 0, sum(sign) FROM deltas JOIN catalog_book ON catalog_book.id = deltas.book_id
+        GROUP BY 1 HAVING sum(sign) <> 0 ORDER BY 1
+        ON CONFLICT (author) DO UPDATE SET loans = a.loans + EXCLUDED.loans
+    )
+    INSERT INTO catalog_borrowercirculation AS b (borrower_id, borrowed, loans)
+    SELECT borrower_id, 0, sum(sign) FROM deltas WHERE borrower_id IS NOT NULL
+    GROUP BY 1 HAVING sum(sign) <> 0 ORDER BY 1
+    ON CONFLICT (borrower_id) DO UPDATE SET loans = b.loans + EXCLUDED.loans;
+"""
+
+CHANGED_LOANS = """
+            FROM old_loans o JOIN new_loans n ON (n.id, n.borrowed_at) = (o.id, o.borrowed_at)
+            WHERE (o.book_id, o.borrower_id) IS DISTINCT FROM (n.book_id, n.borrower_id)
+"""
+
+CREATE_TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION catalog_update_circulation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, 1 AS sign, is_borrowed, 0 AS loans
+            FROM new_books
+        ) {APPLY_BOOK_DELTAS}
+        -- Inserts leave no author without books.
+        RETURN NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, -1 AS sign, is_borrowed, -{BOOK_LOANS.format(book='old_books')} AS loans
+            FROM old_books
+        ) {APPLY_BOOK_DELTAS}
+    ELSE
+        WITH deltas AS (
+            SELECT o.id, o.author, o.borrowed_by_id AS borrower_id, -1 AS sign, o.is_borrowed, -{MOVED_LOANS} AS loans
+            {CHANGED_BOOKS}
+            UNION ALL
+            SELECT n.id, n.author, n.borrowed_by_id, 1, n.is_borrowed, {MOVED_LOANS}
+            {CHANGED_BOOKS}
+        ) {APPLY_BOOK_DELTAS}
+    END IF;
+    DELETE FROM catalog_authorcirculation WHERE books = 0 AND borrowed = 0 AND loans = 0;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION catalog_loan_update_circulation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH deltas AS (SELECT book_id, borrower_id, 1 AS sign FROM new_loans) {APPLY_LOAN_DELTAS}
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH deltas AS (SELECT book_id, borrower_id, -1 AS sign FROM old_loans) {APPLY_LOAN_DELTAS}
+    ELSE
+        -- Deleting a book or user sets the references of its loans to NULL.
+        WITH deltas AS (
+            SELECT o.book_id, o.borrower_id, -1 AS sign
+            {CHANGED_LOANS}
+            UNION ALL
+            SELECT n.book_id, n.borrower_id, 1
+            {CHANGED_LOANS}
+        ) {APPLY_LOAN_DELTAS}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_loan_circulation_insert
+    AFTER INSERT ON catalog_loan REFERENCING NEW TABLE AS new_loans
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_loan_update_circulation();
+
+CREATE TRIGGER catalog_loan_circulation_update
+    AFTER UPDATE ON catalog_loan REFERENCING OLD TABLE AS old_loans NEW TABLE AS new_loans
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_loan_update_circulation();
+
+CREATE TRIGGER catalog_loan_circulation_delete
+    AFTER DELETE ON catalog_loan REFERENCING OLD TABLE AS old_loans
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_loan_update_circulation();
+"""
+
+# The functions of migration 0008.
+OLD_APPLY_DELTAS = """
+    , shards AS (
+        INSERT INTO catalog_circulationcounter AS c (shard, books, borrowed)
+        SELECT id % 16, sum(sign), sum(sign * is_borrowed::int) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 ORDER BY 1
+        ON CONFLICT (shard) DO UPDATE SET books = c.books + EXCLUDED.books, borrowed = c.borrowed + EXCLUDED.borrowed
+    ), authors AS (
+        INSERT INTO catalog_authorcirculation AS a (author, books, borrowed, loans)
+        SELECT author, sum(sign), sum(sign * is_borrowed::int), sum(new_loan) FROM deltas
+        GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * is_borrowed::int) <> 0 OR sum(new_loan) <> 0 ORDER BY 1
+        ON CONFLICT (author) DO UPDATE SET
+            books = a.books + EXCLUDED.books, borrowed = a.borrowed + EXCLUDED.borrowed, loans = a.loans + EXCLUDED.loans
+    )
+    INSERT INTO catalog_borrowercirculation AS b (borrower_id, borrowed, loans)
+    SELECT borrower_id, sum(sign * is_borrowed::int), sum(new_loan) FROM deltas WHERE borrower_id IS NOT NULL
+    GROUP BY 1 HAVING sum(sign * is_borrowed::int) <> 0 OR sum(new_loan) <> 0 ORDER BY 1
+    ON CONFLICT (borrower_id) DO UPDATE SET borrowed = b.borrowed + EXCLUDED.borrowed, loans = b.loans + EXCLUDED.loans;
+"""
+
+DROP_TRIGGERS = f"""
+DROP TRIGGER catalog_loan_circulation_delete ON catalog_loan;
+DROP TRIGGER catalog_loan_circulation_update ON catalog_loan;
+DROP TRIGGER catalog_loan_circulation_insert ON catalog_loan;
+DROP FUNCTION catalog_loan_update_circulation();
+
+CREATE OR REPLACE FUNCTION catalog_update_circulation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, 1 AS sign, is_borrowed, is_borrowed::int AS new_loan
+            FROM new_books
+        ) {OLD_APPLY_DELTAS}
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH deltas AS (
+            SELECT id, author, borrowed_by_id AS borrower_id, -1 AS sign, is_borrowed, 0 AS new_loan
+            FROM old_books
+        ) {OLD_APPLY_DELTAS}
+    ELSE
+        WITH deltas AS (
+            SELECT o.id, o.author, o.borrowed_by_id AS borrower_id, -1 AS sign, o.is_borrowed, 0 AS new_loan
+            {CHANGED_BOOKS}
+            UNION ALL
+            SELECT n.id, n.author, n.borrowed_by_id, 1, n.is_borrowed, (n.is_borrowed AND NOT o.is_borrowed)::int
+            {CHANGED_BOOKS}
+        ) {OLD_APPLY_DELTAS}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Statistics rows of a deleted user go with it, after the ORM has set its books and loans to NULL
+# (which the triggers count against the row), also when the user is deleted with SQL.
+CASCADE_BORROWER = """
+DO $$
+DECLARE
+    constraint_name text;
+BEGIN
+    SELECT conname INTO constraint_name FROM pg_constraint
+    WHERE conrelid = 'catalog_borrowercirculation'::regclass AND contype = 'f';
+    EXECUTE format('ALTER TABLE catalog_borrowercirculation DROP CONSTRAINT %I', constraint_name);
+END
+$$;
+ALTER TABLE catalog_borrowercirculation ADD CONSTRAINT catalog_borrowercirculation_borrower_id_fk
+    FOREIGN KEY (borrower_id) REFERENCES account_libraryuser (library_card_number)
+    ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED;
+"""
+
+RESTRICT_BORROWER = """
+ALTER TABLE catalog_borrowercirculation DROP CONSTRAINT catalog_borrowercirculation_borrower_id_fk;
+ALTER TABLE catalog_borrowercirculation ADD CONSTRAINT catalog_borrowercirculation_borrower_id_fk
+    FOREIGN KEY (borrower_id) REFERENCES account_libraryuser (library_card_number) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+# Same as the rebuild_circulation_stats command; the book counts are unchanged.
+RECOUNT_LOANS = """
+DELETE FROM catalog_authorcirculation;
+DELETE FROM catalog_borrowercirculation;
+
+INSERT INTO catalog_authorcirculation (author, books, borrowed, loans)
+SELECT author, count(*), count(*) FILTER (WHERE is_borrowed), coalesce(sum(loans), 0)
+FROM catalog_book LEFT JOIN (SELECT book_id, count(*) AS loans FROM catalog_loan GROUP BY book_id) AS book_loans
+    ON book_loans.book_id = catalog_book.id
+GROUP BY author;
+
+INSERT INTO catalog_borrowercirculation (borrower_id, borrowed, loans)
+SELECT borrower_id, sum(borrowed), sum(loans) FROM (
+    SELECT borrowed_by_id AS borrower_id, 1 AS borrowed, 0 AS loans FROM catalog_book
+    WHERE is_borrowed AND borrowed_by_id IS NOT NULL
+    UNION ALL
+    SELECT borrower_id, 0, 1 FROM catalog_loan WHERE borrower_id IS NOT NULL
+) AS contributions
+GROUP BY borrower_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("catalog", "0011_loan_keep_history"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(CASCADE_BORROWER, RESTRICT_BORROWER)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="borrowercirculation",
+                    name="borrower",
+                    field=models.OneToOneField(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="circulation",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="authorcirculation",
+            index=models.Index(
+                condition=models.Q(("books", 0)), fields=["author"], name="author_circulation_empty_idx"
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunSQL(RECOUNT_LOANS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.db import migrations
+
+# Books embed their borrower's card number, name and email, so changing those gives the borrowed
+# books a new version (migration 0006), which invalidates their cached representations and, via
+# the catalog_book triggers, the catalogue version (migration 0010). This used to be a post_save
+# signal, which QuerySet.update() and raw SQL bypassed; the trigger replaces both it and the
+# borrower trigger of migration 0010.
+CREATE_TRIGGER = """
+DROP TRIGGER catalog_borrower_bump_version ON account_libraryuser;
+DROP FUNCTION catalog_borrower_bump_version();
+
+CREATE FUNCTION catalog_borrower_bump_book_versions() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_book SET version = version + 1
+    WHERE borrowed_by_id IN (
+        SELECT library_card_number FROM (
+            SELECT library_card_number, first_name, last_name, email FROM new_users
+            EXCEPT SELECT library_card_number, first_name, last_name, email FROM old_users
+        ) AS changed
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_borrower_bump_book_versions
+    AFTER UPDATE ON account_libraryuser REFERENCING OLD TABLE AS old_users NEW TABLE AS new_users
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_borrower_bump_book_versions();
+"""
+
+# The borrower trigger of migration 0010.
+DROP_TRIGGER = """
+DROP TRIGGER catalog_borrower_bump_book_versions ON account_libraryuser;
+DROP FUNCTION catalog_borrower_bump_book_versions();
+
+CREATE FUNCTION catalog_borrower_bump_version() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (
+        SELECT FROM (
+            SELECT library_card_number, first_name, last_name, email FROM new_users
+            EXCEPT SELECT library_card_number, first_name, last_name, email FROM old_users
+        ) AS changed
+        JOIN catalog_book ON catalog_book.borrowed_by_id = changed.library_card_number
+    ) THEN
+        PERFORM catalog_record_change();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_borrower_bump_version
+    AFTER UPDATE ON account_libraryuser REFERENCING OLD TABLE AS old_users NEW TABLE AS new_users
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_borrower_bump_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0012_loan_circulation_triggers"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
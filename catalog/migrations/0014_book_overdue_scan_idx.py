@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0013_borrower_book_version_trigger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce("borrowed_by", models.Value("")),
+                models.F("borrowed_at"),
+                models.F("id"),
+                condition=models.Q(("is_borrowed", True)),
+                name="book_overdue_scan_idx",
+            ),
+        ),
+    ]
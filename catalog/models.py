@@ -1,10 +1,18 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, Upper
 from django.utils import timezone
 
 serial_validator = RegexValidator(r"^\d{6}$", "The serial number must contain exactly six digits.")
 
+# Text search configuration used by the catalog_book_search_vector trigger (see migration 0004);
+# "simple" avoids English stemming of Polish titles and names.
+SEARCH_CONFIG = "simple"
+
 
 class Book(models.Model):
     serial_number = models.CharField(max_length=6, unique=True, validators=[serial_validator])
@@ -18,10 +26,41 @@ class Book(models.Model):
         blank=True,
         on_delete=models.SET_NULL,
         related_name="borrowed_books",
+        # Covered by the leading column of book_borrower_borrowed_at_idx.
+        db_index=False,
     )
+    # Maintained by a database trigger from title (weight A) and author (weight B).
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Incremented by a database trigger on every UPDATE of the row (see migration 0006).
+    version = models.PositiveBigIntegerField(default=1, editable=False)
 
     class Meta:
         ordering = ["serial_number"]
+        indexes = [
+            # The id makes the order unique for the keyset walk of the overdue loan scanner.
+            models.Index(
+                fields=["borrowed_at", "id"], condition=models.Q(is_borrowed=True), name="book_borrowed_at_idx"
+            ),
+            models.Index(fields=["borrowed_by", "borrowed_at"], name="book_borrower_borrowed_at_idx"),
+            # The overdue loan scanner's keyset: by borrower (books of deleted borrowers first), then due date.
+            models.Index(
+                Coalesce("borrowed_by", models.Value("")),
+                "borrowed_at",
+                "id",
+                condition=models.Q(is_borrowed=True),
+                name="book_overdue_scan_idx",
+            ),
+            models.Index(fields=["author"], name="book_author_idx"),
+            # Trigram indexes on UPPER() match the SQL Django emits for istartswith/icontains,
+            # so both prefix and substring searches are index scans.
+            GinIndex(OpClass(Upper("title"), name="gin_trgm_ops"), name="book_title_trgm_idx"),
+            GinIndex(OpClass(Upper("author"), name="gin_trgm_ops"), name="book_author_trgm_idx"),
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+        ]
+
+    @property
+    def etag(self):
+        return f'"book-{self.version}"'
 
     def mark_borrowed(self, borrower, borrowed_at=None):
         self.is_borrowed = True
@@ -35,3 +74,116 @@ class Book(models.Model):
 
     def __str__(self):
         return f"{self.serial_number} - {self.title}"
+
+
+class CatalogVersion(models.Model):
+    """Change counter for everything rendered in book responses, split over ``SHARDS`` rows.
+
+    Statement-level triggers (see migration 0010) add one to a shard, picked by the backend pid,
+    whenever a statement writes books or changes a borrowed book's borrower, in the same
+    transaction as the write. Concurrent writers therefore rarely wait on each other's shard
+    until commit. The sum only grows, which makes it a cheap validator for conditional requests.
+    """
+
+    SHARDS = 16
+
+    shard = models.PositiveSmallIntegerField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.aggregate(version=Coalesce(Sum("version"), 0))["version"]
+
+
+class Loan(models.Model):
+    """One loan of a book, appended when it is borrowed and closed (``returned_at``) when returned.
+
+    Rows are never deleted or rewritten otherwise. The table is range-partitioned by month on
+    ``borrowed_at`` (see migration 0007 and the ``loan_partitions`` command), so history queries
+    only touch the partitions of the requested period, and old months can be detached and
+    archived without a bulk ``DELETE``.
+
+    Deleting a book or a user keeps its loans: the reference is set to NULL, and the loan still
+    names both by the serial and library card numbers copied when it was opened.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.SET_NULL, null=True, related_name="loans", db_index=False)
+    borrower = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="loans", db_index=False
+    )
+    serial_number = models.CharField(max_length=6)
+    library_card_number = models.CharField(max_length=6)
+    borrowed_at = models.DateTimeField()
+    returned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["borrower", "borrowed_at"], name="loan_borrower_borrowed_at_idx"),
+            models.Index(fields=["book", "borrowed_at"], name="loan_book_borrowed_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.serial_number} - {self.library_card_number} ({self.borrowed_at:%Y-%m-%d})"
+
+    @classmethod
+    def open_for(cls, book):
+        """The (unsaved) loan of ``book`` to its current borrower."""
+        return cls(
+            book=book,
+            borrower=book.borrowed_by,
+            serial_number=book.serial_number,
+            library_card_number=book.borrowed_by_id,
+            borrowed_at=book.borrowed_at,
+        )
+
+
+class CirculationCounter(models.Model):
+    """Catalogue-wide book counts, split over ``SHARDS`` rows (``shard = book id % SHARDS``).
+
+    Kept up to date by the catalog_book circulation triggers (see migration 0008); spreading the
+    counts keeps concurrent borrows from queueing on a single row lock. Read them with ``totals``.
+    """
+
+    SHARDS = 16
+
+    shard = models.PositiveSmallIntegerField(primary_key=True)
+    books = models.BigIntegerField(default=0)
+    borrowed = models.BigIntegerField(default=0)
+
+    @classmethod
+    def totals(cls):
+        return cls.objects.aggregate(books=Coalesce(Sum("books"), 0), borrowed=Coalesce(Sum("borrowed"), 0))
+
+
+class AuthorCirculation(models.Model):
+    """Per-author book counts and number of loans in the history, maintained by triggers.
+
+    Loans are counted from the loan history of the author's current books (see migration 0012),
+    like ``rebuild_circulation_stats`` does; authors left without books are removed.
+    """
+
+    author = models.CharField(max_length=255, primary_key=True)
+    books = models.BigIntegerField(default=0)
+    borrowed = models.BigIntegerField(default=0)
+    loans = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-loans", "author"], name="author_circulation_loans_idx"),
+            models.Index(fields=["author"], condition=Q(books=0), name="author_circulation_empty_idx"),
+        ]
+
+
+class BorrowerCirculation(models.Model):
+    """Per-borrower number of books on loan and of loans in the history, maintained by triggers."""
+
+    # The database deletes the row with its user (ON DELETE CASCADE, see migration 0012), after
+    # the ORM has detached the user's books and loans.
+    borrower = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, on_delete=models.DO_NOTHING, related_name="circulation"
+    )
+    borrowed = models.BigIntegerField(default=0)
+    loans = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-loans", "borrower"], name="borrower_circulation_loans_idx")]
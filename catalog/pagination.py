@@ -0,0 +1,96 @@
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class BookCursorPagination(CursorPagination):
+    """Keyset pagination seeking on the unique ``serial_number`` index.
+
+    Every page is a ``WHERE serial_number > <last seen>`` range scan, so page N
+    costs the same as page 1 and no ``COUNT(*)`` is ever issued. Pagination is
+    opt-in: it only applies when the client sends a ``cursor`` or ``page_size``
+    parameter, so existing clients keep receiving the plain list.
+    """
+
+    ordering = "serial_number"
+    page_size_query_param = "page_size"
+    page_size = settings.BOOK_PAGINATION["PAGE_SIZE"]
+    max_page_size = settings.BOOK_PAGINATION["MAX_PAGE_SIZE"]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class LoanCursorPagination(CursorPagination):
+    """Keyset pagination over loan history, newest first.
+
+    The history endpoints filter on the leading column of ``(book, borrowed_at)`` or
+    ``(borrower, borrowed_at)``, so each page is a backward range scan of that index.
+    """
+
+    ordering = ("-borrowed_at", "-id")
+    page_size_query_param = "page_size"
+    page_size = settings.BOOK_PAGINATION["PAGE_SIZE"]
+    max_page_size = settings.BOOK_PAGINATION["MAX_PAGE_SIZE"]
+
+
+class UserCursorPagination(CursorPagination):
+    """Keyset pagination over library cards, seeking on the primary key."""
+
+    ordering = "library_card_number"
+    page_size_query_param = "page_size"
+    page_size = settings.BOOK_PAGINATION["PAGE_SIZE"]
+    max_page_size = settings.BOOK_PAGINATION["MAX_PAGE_SIZE"]
+
+
+class BookSearchPagination(BasePagination):
+    """Page-number pagination for relevance-ranked search results.
+
+    Ranking has to score every match before the first row can be returned, so a keyset is of
+    no help here; instead the depth is capped at ``max_page`` (deeper pages are a 404) and no
+    ``COUNT(*)`` is issued - one extra row is fetched to tell whether a next page exists.
+    """
+
+    page_query_param = "page"
+    page_size_query_param = "page_size"
+    page_size = settings.BOOK_PAGINATION["PAGE_SIZE"]
+    max_page_size = settings.BOOK_PAGINATION["MAX_PAGE_SIZE"]
+    max_page = 100
+    invalid_page_message = "Invalid page: search results end at page {max_page}."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_number = self._get_int_param(request, self.page_query_param, 1)
+        if self.page_number > self.max_page:
+            raise NotFound(self.invalid_page_message.format(max_page=self.max_page))
+        page_size = self._get_int_param(request, self.page_size_query_param, self.page_size, self.max_page_size)
+
+        offset = (self.page_number - 1) * page_size
+        limit = offset + page_size + 1
+        results = list(queryset[offset:limit])
+        self.has_next = len(results) > page_size and self.page_number < self.max_page
+        return results[:page_size]
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number - 1)
+
+    def _get_int_param(self, request, name, default, cutoff=None):
+        try:
+            value = max(int(request.query_params[name]), 1)
+            return value if cutoff is None else min(value, cutoff)
+        except (KeyError, ValueError):
+            return default
@@ -0,0 +1,36 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it.
+    orjson = None
+
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class BookJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` producing the same bytes, encoded with orjson when it is installed.
+
+    Types orjson does not know natively (and datetimes, which DRF formats its own way) go through
+    the DRF encoder. orjson writes floats with different exponent notation, so the renderer is
+    only meant for float-free payloads such as book lists. Pretty-printed and ASCII-only output
+    is left to ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not settings.BOOK_FAST_SERIALIZATION
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these so the output is also valid JavaScript.
+        return content.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
@@ -1,9 +1,70 @@
+import operator
+from functools import reduce
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Book
+from library_project.profiling import measure
+
+from .borrower_cache import borrower_cache
+from .exceptions import Conflict, PreconditionFailed
+from .metrics import BORROWING_OPERATIONS
+from .models import AuthorCirculation, Book, BorrowerCirculation, Loan, serial_validator
+
+BORROWING_FIELDS = ["is_borrowed", "borrowed_by", "borrowed_at"]
+
+
+class LoanJournal:
+    """Loans opened and closed by the borrowing changes of one transaction, written by ``save``."""
+
+    def __init__(self):
+        self.opened = []
+        self.closed = []
+
+    def open(self, book):
+        self.opened.append(Loan.open_for(book))
+
+    def close(self, book, borrowed_at):
+        self.closed.append(Q(book_id=book.pk, borrowed_at=borrowed_at))
+
+    def save(self):
+        # Inserts go first so a loan opened and closed within the same batch is found by the update.
+        Loan.objects.bulk_create(self.opened)
+        if self.closed:
+            # Matching on borrowed_at as well lets PostgreSQL prune the loan partitions.
+            Loan.objects.filter(reduce(operator.or_, self.closed), returned_at__isnull=True).update(
+                returned_at=timezone.now()
+            )
+
+
+def apply_borrowing_status(book, is_borrowed, borrower, borrowed_at, loans):
+    """Move a locked ``book`` to the requested borrowing state, enforcing the lending rules.
+
+    Loans started or ended by the change are recorded in the ``loans`` journal. Returns the
+    operation performed (``"borrow"``, ``"return"`` or ``None``), for the caller to count in
+    ``BORROWING_OPERATIONS`` once the change is written.
+    """
+    if is_borrowed:
+        if not book.is_borrowed:
+            book.mark_borrowed(borrower, borrowed_at)
+            loans.open(book)
+            return "borrow"
+        elif borrower and borrower != book.borrowed_by:
+            BORROWING_OPERATIONS.inc("borrow", "conflict")
+            raise serializers.ValidationError("This book has already been borrowed.")
+        elif borrowed_at and borrowed_at != book.borrowed_at:
+            book.borrowed_at = borrowed_at
+    else:
+        if book.is_borrowed:
+            loans.close(book, book.borrowed_at)
+            book.mark_returned()
+            return "return"
+    return None
 
 
 class BorrowerSerializer(serializers.ModelSerializer):
@@ -17,11 +78,33 @@ class BorrowerSerializer(serializers.ModelSerializer):
         ]
 
 
+class BorrowedBookSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Book
+        fields = ["serial_number", "title", "author", "borrowed_at"]
+        read_only_fields = fields
+
+
+class LibraryUserSerializer(BorrowerSerializer):
+    # Filled by the Prefetch in LibraryUserViewSet; the attribute only exists on prefetched users.
+    borrowed_books = BorrowedBookSerializer(source="current_books", many=True, read_only=True)
+
+    class Meta(BorrowerSerializer.Meta):
+        fields = BorrowerSerializer.Meta.fields + ["borrowed_books"]
+        read_only_fields = fields
+
+
 class BorrowerRelatedField(serializers.PrimaryKeyRelatedField):
     default_error_messages = {
         "does_not_exist": 'User with pk "{pk_value}" does not exist.',
     }
 
+    def use_pk_only_optimization(self):
+        # The nested representation needs the whole borrower, so let DRF hand over
+        # the related instance (already joined by the view's queryset) instead of
+        # a PK-only placeholder that would force a lookup per row.
+        return False
+
     def to_representation(self, value):
         if value is None:
             return None
@@ -33,14 +116,27 @@ class BorrowerRelatedField(serializers.PrimaryKeyRelatedField):
             borrower_pk = getattr(value, "pk", value)
             borrower = borrower_model.objects.get(pk=borrower_pk)
 
-        return BorrowerSerializer(borrower).data
+        if not borrower_cache.enabled:
+            return BorrowerSerializer(borrower).data
+        source = tuple(getattr(borrower, name) for name in BorrowerSerializer.Meta.fields)
+        return borrower_cache.get(borrower.pk, source, lambda: BorrowerSerializer(borrower).data)
+
+
+class BookListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with measure("serialize"):
+            return super().data
 
 
 class BookSerializer(serializers.ModelSerializer):
+    """Book representation; ``fields`` restricts it to a subset of ``Meta.fields``."""
+
     borrowed_by = BorrowerRelatedField(queryset=get_user_model().objects.all(), allow_null=True, required=False)
 
     class Meta:
         model = Book
+        list_serializer_class = BookListSerializer
         fields = [
             "serial_number",
             "title",
@@ -51,6 +147,17 @@ class BookSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["borrowed_at"]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @property
+    def data(self):
+        with measure("serialize"):
+            return super().data
+
     def validate(self, attrs):
         attrs = super().validate(attrs)
         is_borrowed = attrs.get("is_borrowed", getattr(self.instance, "is_borrowed", False))
@@ -68,15 +175,26 @@ class BookSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        return Book.objects.create(**validated_data)
+        with transaction.atomic():
+            book = Book.objects.create(**validated_data)
+            if book.is_borrowed:
+                Loan.open_for(book).save()
+        return book
 
     def update(self, instance, validated_data):
+        # Set from the request's If-Match header by BookViewSet.perform_update.
+        expected_version = validated_data.pop("expected_version", None)
+        disallowed_fields = set(validated_data) - set(BORROWING_FIELDS)
+        if disallowed_fields:
+            raise serializers.ValidationError("Only the borrowing status of a book can be updated.")
+
+        if settings.BOOK_OPTIMISTIC_LOCKING:
+            return self._update_optimistically(instance, validated_data, expected_version)
+
         with transaction.atomic():
             book = Book.objects.select_for_update().get(pk=instance.pk)
-
-            disallowed_fields = set(validated_data) - {"is_borrowed", "borrowed_by", "borrowed_at"}
-            if disallowed_fields:
-                raise serializers.ValidationError("Only the borrowing status of a book can be updated.")
+            if expected_version is not None and book.version != expected_version:
+                raise PreconditionFailed
 
             target_is_borrowed = validated_data.get("is_borrowed", book.is_borrowed)
             target_borrower = validated_data.get("borrowed_by", book.borrowed_by)
@@ -93,16 +211,251 @@ class BookSerializer(serializers.ModelSerializer):
             #     if field not in {'is_borrowed', 'borrowed_by', 'borrowed_at'}:
             #         setattr(book, field, value)
 
-            if target_is_borrowed:
-                if not book.is_borrowed:
-                    book.mark_borrowed(target_borrower, target_borrowed_at)
-                elif target_borrower and target_borrower != book.borrowed_by:
-                    raise serializers.ValidationError("This book has already been borrowed.")
-                elif target_borrowed_at and target_borrowed_at != book.borrowed_at:
-                    book.borrowed_at = target_borrowed_at
-            else:
-                if book.is_borrowed:
-                    book.mark_returned()
+            loans = LoanJournal()
+            operation = apply_borrowing_status(book, target_is_borrowed, target_borrower, target_borrowed_at, loans)
 
             book.save()
-            return book
+            loans.save()
+        if operation:
+            BORROWING_OPERATIONS.inc(operation, "ok")
+        # Mirror the increment of the catalog_book_row_version trigger (the post_save receivers
+        # have already seen the version being replaced).
+        book.version += 1
+        return book
+
+    def _update_optimistically(self, book, validated_data, expected_version):
+        """Decide the change on the unlocked ``book`` and write it only if nobody changed the row meanwhile.
+
+        The write is ``UPDATE ... WHERE version = <version read> AND is_borrowed = <state read>``; no
+        row lock is held while the change is validated, and a lost race is reported as 409 Conflict
+        (412 Precondition Failed when the client named the version with If-Match).
+
+        The write itself is not lock-free: until commit it holds the book row and the rows its
+        triggers upsert (a catalogue version shard, a circulation counter shard and the statistics
+        rows of the book's author and borrower), so concurrent writes to books sharing those rows
+        still queue briefly on them.
+        """
+        if expected_version is not None and book.version != expected_version:
+            raise PreconditionFailed
+        read_version = book.version
+        read_state = {"is_borrowed": book.is_borrowed, "borrowed_by": book.borrowed_by_id}
+
+        loans = LoanJournal()
+        operation = apply_borrowing_status(
+            book,
+            validated_data.get("is_borrowed", book.is_borrowed),
+            validated_data.get("borrowed_by", book.borrowed_by),
+            validated_data.get("borrowed_at", book.borrowed_at),
+            loans,
+        )
+        with transaction.atomic():
+            updated = Book.objects.filter(pk=book.pk, version=read_version, **read_state).update(
+                **{field: getattr(book, field) for field in BORROWING_FIELDS}
+            )
+            if not updated:
+                if operation:
+                    BORROWING_OPERATIONS.inc(operation, "conflict")
+                raise Conflict if expected_version is None else PreconditionFailed
+            loans.save()
+        if operation:
+            BORROWING_OPERATIONS.inc(operation, "ok")
+
+        # QuerySet.update() skips the model signals, among them the eviction of the cached
+        # representation of the version just replaced.
+        post_save.send(
+            sender=Book,
+            instance=book,
+            created=False,
+            update_fields=frozenset(BORROWING_FIELDS),
+            raw=False,
+            using=Book.objects.db,
+        )
+        book.version = read_version + 1
+        return book
+
+
+def requested_book_fields(query_params):
+    """Fields selected with ``?fields=a,b`` and/or ``?exclude=c``, in ``BookSerializer`` order.
+
+    ``None`` when the request asks for the full representation.
+    """
+    if "fields" not in query_params and "exclude" not in query_params:
+        return None
+    available = BookSerializer.Meta.fields
+    errors = {}
+    selections = {}
+    for param in ("fields", "exclude"):
+        names = {name.strip() for name in query_params.get(param, "").split(",") if name.strip()}
+        if unknown := names - set(available):
+            errors[param] = [f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(available)}."]
+        selections[param] = names
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    selected = selections["fields"] or set(available)
+    fields = [name for name in available if name in selected and name not in selections["exclude"]]
+    if not fields:
+        raise serializers.ValidationError({"fields": ["At least one field has to be selected."]})
+    return fields
+
+
+def render_book_rows(rows, fields):
+    """Representations of ``values()`` rows restricted to scalar ``fields``.
+
+    Produces the same output as ``BookSerializer(fields=fields)`` without instantiating
+    models or running the serializer's per-field machinery; only ``borrowed_at`` needs
+    converting.
+    """
+    if "borrowed_at" in fields:
+        to_representation = serializers.DateTimeField().to_representation
+        for row in rows:
+            if row["borrowed_at"] is not None:
+                row["borrowed_at"] = to_representation(row["borrowed_at"])
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+# Columns of the ``values_list()`` rows ``render_book_row`` turns into the full representation.
+BOOK_ROW_COLUMNS = [
+    "serial_number",
+    "title",
+    "author",
+    "is_borrowed",
+    "borrowed_at",
+    "borrowed_by__library_card_number",
+    "borrowed_by__first_name",
+    "borrowed_by__last_name",
+    "borrowed_by__email",
+]
+
+
+def compile_book_row_renderer():
+    """Build a function rendering a ``BOOK_ROW_COLUMNS`` tuple exactly as ``BookSerializer`` would.
+
+    Fields are picked by position and the dicts built in serializer field order, so rows skip model
+    instantiation and the per-field ``to_representation`` calls. Extra trailing columns are ignored.
+    """
+    format_datetime = serializers.DateTimeField().to_representation
+
+    def render_book_row(row):
+        borrowed_at = row[4]
+        return {
+            "serial_number": row[0],
+            "title": row[1],
+            "author": row[2],
+            "is_borrowed": row[3],
+            "borrowed_at": None if borrowed_at is None else format_datetime(borrowed_at),
+            "borrowed_by": (
+                None
+                if row[5] is None
+                else {"library_card_number": row[5], "first_name": row[6], "last_name": row[7], "email": row[8]}
+            ),
+        }
+
+    return render_book_row
+
+
+render_book_row = compile_book_row_renderer()
+
+
+class BookSearchResultSerializer(BookSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ["rank"]
+
+
+class LoanSerializer(serializers.ModelSerializer):
+    # The title is null once the book has been deleted.
+    title = serializers.CharField(source="book.title", read_only=True, allow_null=True, default=None)
+    borrowed_by = serializers.CharField(source="library_card_number", read_only=True)
+
+    class Meta:
+        model = Loan
+        fields = ["serial_number", "title", "borrowed_by", "borrowed_at", "returned_at"]
+        read_only_fields = fields
+
+
+class AuthorCirculationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuthorCirculation
+        fields = ["author", "loans", "books", "borrowed"]
+
+
+class BorrowerCirculationSerializer(serializers.ModelSerializer):
+    borrower = BorrowerSerializer()
+
+    class Meta:
+        model = BorrowerCirculation
+        fields = ["borrower", "loans", "borrowed"]
+
+
+class BulkBorrowListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        borrower_model = get_user_model()
+        serial_numbers = {operation["serial_number"] for operation in validated_data}
+        card_numbers = {operation["borrowed_by"] for operation in validated_data if operation.get("borrowed_by")}
+
+        with transaction.atomic():
+            borrowers = borrower_model.objects.in_bulk(card_numbers)
+            # Lock every target row in one statement, always in primary key order, so two
+            # overlapping batches acquire their locks in the same sequence and cannot deadlock.
+            books = {
+                book.serial_number: book
+                for book in Book.objects.select_related("borrowed_by")
+                .select_for_update(of=("self",))
+                .filter(serial_number__in=serial_numbers)
+                .order_by("pk")
+            }
+
+            results = []
+            updated_books = {}
+            performed = []
+            loans = LoanJournal()
+            for operation in validated_data:
+                serial_number = operation["serial_number"]
+                try:
+                    book, performed_operation = self._apply_operation(operation, books, borrowers, loans)
+                except serializers.ValidationError as exc:
+                    results.append({"serial_number": serial_number, "status": "error", "errors": exc.detail})
+                    continue
+                updated_books[book.pk] = book
+                results.append({"serial_number": serial_number, "status": "ok"})
+                if performed_operation:
+                    performed.append(performed_operation)
+
+            Book.objects.bulk_update(updated_books.values(), BORROWING_FIELDS)
+            loans.save()
+
+        for operation in performed:
+            BORROWING_OPERATIONS.inc(operation, "ok")
+
+        for result in results:
+            if result["status"] == "ok":
+                result["book"] = BookSerializer(books[result["serial_number"]]).data
+        return results
+
+    def _apply_operation(self, operation, books, borrowers, loans):
+        book = books.get(operation["serial_number"])
+        if book is None:
+            raise serializers.ValidationError("Book not found.")
+
+        card_number = operation.get("borrowed_by")
+        borrower = borrowers.get(card_number) if card_number else None
+        if card_number and borrower is None:
+            raise serializers.ValidationError(
+                BorrowerRelatedField.default_error_messages["does_not_exist"].format(pk_value=card_number)
+            )
+
+        if operation["is_borrowed"] and not (borrower or book.borrowed_by):
+            raise serializers.ValidationError("A borrower is required when the book is borrowed.")
+
+        return book, apply_borrowing_status(book, operation["is_borrowed"], borrower, None, loans)
+
+
+class BorrowOperationSerializer(serializers.Serializer):
+    serial_number = serializers.CharField(validators=[serial_validator])
+    is_borrowed = serializers.BooleanField()
+    borrowed_by = serializers.CharField(allow_null=True, required=False)
+
+    class Meta:
+        list_serializer_class = BulkBorrowListSerializer
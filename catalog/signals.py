@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .borrower_cache import borrower_cache
+from .cache import book_cache
+from .models import Book
+
+# Changes to borrower details embedded in book representations give the borrowed books a new
+# version through a database trigger (see migration 0013).
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def evict_book_representation(sender, instance, **kwargs):
+    # ``instance.version`` still holds the version read before the write, i.e. the stale entry.
+    if book_cache.enabled:
+        book_cache.evict(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_borrower_summary(sender, instance, **kwargs):
+    borrower_cache.invalidate(instance.pk)
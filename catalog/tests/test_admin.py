@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library_project.changelist import EstimatedCountPaginator
+
+from ..models import Book
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(library_card_number="280000", password="testpass123")
+        self.client.force_login(self.admin)
+        for index in range(6):
+            user = User.objects.create_user(
+                library_card_number=f"28100{index}", first_name="Jan", last_name=f"Kowalski {index}"
+            )
+            book = Book(serial_number=f"28000{index}", title=f"Lalka {index}", author="Boleslaw Prus")
+            book.mark_borrowed(user)
+            book.save()
+        Book.objects.create(serial_number="280010", title="Pan Tadeusz", author="Adam Mickiewicz")
+
+    def changelist(self, name, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f"admin:{name}_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def results(self, response):
+        return [str(obj.pk) for obj in response.context["cl"].result_list]
+
+    def test_borrowers_are_joined(self):
+        _, few = self.changelist("catalog_book")
+        for index in range(6, 9):
+            book = Book(serial_number=f"28000{index}", title="Lalka", author="Boleslaw Prus")
+            book.mark_borrowed(self.admin)
+            book.save()
+        _, many = self.changelist("catalog_book")
+        self.assertEqual(many, few)
+
+    def test_book_search_matches_exact_numbers_and_prefixes(self):
+        response, _ = self.changelist("catalog_book", q='"adam mick"')
+        self.assertEqual([book.serial_number for book in response.context["cl"].result_list], ["280010"])
+
+        response, _ = self.changelist("catalog_book", q="281002")
+        self.assertEqual([book.serial_number for book in response.context["cl"].result_list], ["280002"])
+
+        for substring in ["ickiewicz", "28100"]:
+            response, _ = self.changelist("catalog_book", q=substring)
+            self.assertEqual(response.context["cl"].result_count, 0)
+
+    def test_user_search_matches_exact_numbers_and_prefixes(self):
+        response, _ = self.changelist("account_libraryuser", q="kowalski")
+        self.assertLessEqual({f"28100{index}" for index in range(6)}, set(self.results(response)))
+
+        response, _ = self.changelist("account_libraryuser", q="owalski")
+        self.assertEqual(self.results(response), [])
+
+        response, _ = self.changelist("account_libraryuser", q="281003")
+        self.assertEqual(self.results(response), ["281003"])
+
+    def test_full_result_count_is_not_queried(self):
+        response, _ = self.changelist("catalog_book", q="Lalka")
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        Book.objects.bulk_create(
+            Book(serial_number=f"29{index:04}", title="Lalka", author="Boleslaw Prus") for index in range(12)
+        )
+        self.books = Book.objects.order_by("serial_number")
+
+    def count(self, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            count = EstimatedCountPaginator(queryset, 5).count
+        return count, [query["sql"] for query in queries]
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=100)
+    def test_counts_below_the_limit_are_exact(self):
+        self.assertEqual(self.count(self.books)[0], 12)
+        self.assertEqual(self.count(self.books.filter(serial_number__lt="290005"))[0], 5)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=10)
+    def test_large_tables_use_the_statistics(self):
+        with mock.patch("library_project.changelist.estimated_table_rows", return_value=2_000_000):
+            count, queries = self.count(self.books)
+        self.assertEqual(count, 2_000_000)
+        self.assertEqual(queries, [])
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=10)
+    def test_large_filtered_results_use_the_planner_estimate(self):
+        count, queries = self.count(self.books.filter(author="Boleslaw Prus"))
+        self.assertGreaterEqual(count, 10)
+        self.assertTrue(queries[-1].startswith("EXPLAIN"))
+        self.assertNotIn("COUNT", queries[-1])
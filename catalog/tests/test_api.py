@@ -1,13 +1,31 @@
+import csv
+import json
+import re
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 
-from ..models import Book
+from ..filters import BookFilterBackend
+from ..models import SEARCH_CONFIG, Book, Loan
+from ..pagination import BookCursorPagination, BookSearchPagination
+from ..serializers import LoanSerializer
 
 
 class BookAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         self.list_url = reverse("book-list")
         User = get_user_model()
         self.user = User.objects.create_user(
@@ -116,3 +134,583 @@ class BookAPITestCase(APITestCase):
             response.data["borrowed_by"],
             ['User with pk "987654" does not exist.'],
         )
+
+    def test_list_query_count_does_not_grow_with_borrowed_books(self):
+        User = get_user_model()
+        for index in range(5):
+            borrower = User.objects.create_user(
+                library_card_number=f"40000{index}",
+                first_name="Reader",
+                last_name=str(index),
+            )
+            book = Book.objects.create(serial_number=f"30000{index}", title=f"Title {index}", author="Author")
+            book.mark_borrowed(borrower)
+            book.save()
+        Book.objects.create(serial_number="300010", title="Available", author="Author")
+
+        # The catalogue version lookup (for the ETag), the page keys and one joined SELECT for cache misses.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]["borrowed_by"]["library_card_number"], "400000")
+
+    def test_cursor_pagination_walks_catalogue_in_serial_order(self):
+        for index in range(5):
+            Book.objects.create(serial_number=f"50000{index}", title=f"Title {index}", author="Author")
+
+        with self.assertNumQueries(3):
+            first_page = self.client.get(self.list_url, {"page_size": 2})
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual([book["serial_number"] for book in first_page.data["results"]], ["500000", "500001"])
+        self.assertIsNone(first_page.data["previous"])
+
+        second_page = self.client.get(first_page.data["next"])
+        self.assertEqual([book["serial_number"] for book in second_page.data["results"]], ["500002", "500003"])
+
+        previous_page = self.client.get(second_page.data["previous"])
+        self.assertEqual([book["serial_number"] for book in previous_page.data["results"]], ["500000", "500001"])
+
+        last_page = self.client.get(second_page.data["next"])
+        self.assertEqual([book["serial_number"] for book in last_page.data["results"]], ["500004"])
+        self.assertIsNone(last_page.data["next"])
+
+    def test_cursor_pagination_caps_page_size(self):
+        for index in range(3):
+            Book.objects.create(serial_number=f"60000{index}", title=f"Title {index}", author="Author")
+
+        with mock.patch.object(BookCursorPagination, "max_page_size", 2):
+            response = self.client.get(self.list_url, {"page_size": 50})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_export_streams_ndjson(self):
+        borrowed = Book.objects.create(serial_number="700001", title="Lalka", author="Boleslaw Prus")
+        borrowed.mark_borrowed(self.user)
+        borrowed.save()
+        Book.objects.create(serial_number="700002", title="Faraon", author="Boleslaw Prus")
+
+        with self.settings(BOOK_EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(reverse("book-export"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["serial_number"] for row in rows], ["700001", "700002"])
+        self.assertEqual(rows[0]["borrowed_by"]["library_card_number"], self.user.library_card_number)
+        self.assertIsNone(rows[1]["borrowed_by"])
+
+    def test_export_streams_csv(self):
+        Book.objects.create(serial_number="700003", title="Chlopi, tom 1", author="Wladyslaw Reymont")
+
+        response = self.client.get(reverse("book-export"), {"output": "csv"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ["serial_number", "title", "author", "is_borrowed", "borrowed_at", "borrowed_by"])
+        self.assertEqual(rows[1], ["700003", "Chlopi, tom 1", "Wladyslaw Reymont", "false", "", ""])
+
+    def test_export_rejects_unknown_output(self):
+        response = self.client.get(reverse("book-export"), {"output": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_borrow_applies_operations_and_reports_per_item(self):
+        available = Book.objects.create(serial_number="800001", title="Lalka", author="Boleslaw Prus")
+        to_return = Book.objects.create(serial_number="800002", title="Faraon", author="Boleslaw Prus")
+        to_return.mark_borrowed(self.user)
+        to_return.save()
+        User = get_user_model()
+        other_user = User.objects.create_user(library_card_number="222333", first_name="Anna", last_name="Nowak")
+        taken = Book.objects.create(serial_number="800003", title="Emancypantki", author="Boleslaw Prus")
+        taken.mark_borrowed(other_user)
+        taken.save()
+
+        payload = [
+            {"serial_number": "800001", "is_borrowed": True, "borrowed_by": self.user.pk},
+            {"serial_number": "800002", "is_borrowed": False},
+            {"serial_number": "800003", "is_borrowed": True, "borrowed_by": self.user.pk},
+            {"serial_number": "800004", "is_borrowed": False},
+            {"serial_number": "800001", "is_borrowed": True, "borrowed_by": "987654"},
+        ]
+        response = self.client.post(reverse("book-bulk-borrow"), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["ok", "ok", "error", "error", "error"])
+        self.assertEqual(results[0]["book"]["borrowed_by"]["library_card_number"], self.user.pk)
+        self.assertIsNone(results[1]["book"]["borrowed_by"])
+        self.assertEqual(results[2]["errors"], ["This book has already been borrowed."])
+        self.assertEqual(results[3]["errors"], ["Book not found."])
+        self.assertEqual(results[4]["errors"], ['User with pk "987654" does not exist.'])
+
+        available.refresh_from_db()
+        to_return.refresh_from_db()
+        taken.refresh_from_db()
+        self.assertTrue(available.is_borrowed)
+        self.assertEqual(available.borrowed_by, self.user)
+        self.assertIsNotNone(available.borrowed_at)
+        self.assertFalse(to_return.is_borrowed)
+        self.assertIsNone(to_return.borrowed_at)
+        self.assertEqual(taken.borrowed_by, other_user)
+
+    def test_bulk_borrow_requires_borrower_and_non_empty_list(self):
+        Book.objects.create(serial_number="800005", title="Lalka", author="Boleslaw Prus")
+
+        missing_borrower = self.client.post(
+            reverse("book-bulk-borrow"), [{"serial_number": "800005", "is_borrowed": True}], format="json"
+        )
+        empty = self.client.post(reverse("book-bulk-borrow"), [], format="json")
+
+        self.assertEqual(
+            missing_borrower.data["results"][0]["errors"], ["A borrower is required when the book is borrowed."]
+        )
+        self.assertEqual(empty.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_books_from_json_array(self):
+        Book.objects.create(serial_number="900001", title="Lalka", author="Boleslaw Prus")
+        payload = [
+            {"serial_number": "900001", "title": "Lalka", "author": "Boleslaw Prus"},
+            {"serial_number": "900002", "title": "Faraon", "author": "Boleslaw Prus"},
+            {"serial_number": "90000X", "title": "Broken", "author": "Nobody"},
+        ]
+
+        response = self.client.post(reverse("book-import-books"), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["rejected"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 3])
+        self.assertTrue(Book.objects.filter(serial_number="900002").exists())
+
+    def test_import_books_from_csv_upload_in_batches(self):
+        upload = SimpleUploadedFile(
+            "books.csv",
+            "serial_number,title,author\n"
+            "910001,Quo Vadis,Henryk Sienkiewicz\n"
+            '910002,"Potop, tom 1",Henryk Sienkiewicz\n'
+            "910001,Quo Vadis,Henryk Sienkiewicz\n"
+            "910003,,Henryk Sienkiewicz\n".encode(),
+            content_type="text/csv",
+        )
+
+        with self.settings(BOOK_IMPORT={"BATCH_SIZE": 2, "MAX_REPORTED_ERRORS": 10}):
+            response = self.client.post(reverse("book-import-books"), {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [3, 4])
+        self.assertEqual(Book.objects.get(serial_number="910002").title, "Potop, tom 1")
+
+    def test_import_books_rejects_malformed_json_upload(self):
+        upload = SimpleUploadedFile("books.json", b'{"serial_number": "920001"}', content_type="application/json")
+
+        response = self.client.post(reverse("book-import-books"), {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_books_rejects_oversized_json_item(self):
+        books = [{"serial_number": "930001", "title": "Lalka", "author": "Boleslaw Prus"}] * 2
+        books.append({"serial_number": "930002", "title": "x" * 100_000, "author": "Boleslaw Prus"})
+        upload = SimpleUploadedFile("books.json", json.dumps(books).encode(), content_type="application/json")
+
+        with self.settings(BOOK_IMPORT={"BATCH_SIZE": 1, "MAX_REPORTED_ERRORS": 10, "MAX_ITEM_SIZE": 1000}):
+            response = self.client.post(reverse("book-import-books"), {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["file"], ["A JSON array item is longer than 1000 characters."])
+        self.assertEqual((response.data["created"], response.data["rejected"]), (1, 1))
+        self.assertFalse(Book.objects.filter(serial_number="930002").exists())
+
+    def _create_catalogue_for_filters(self):
+        borrowed = Book.objects.create(serial_number="110001", title="Solaris", author="Stanislaw Lem")
+        borrowed.mark_borrowed(self.user, borrowed_at=timezone.now() - timedelta(days=30))
+        borrowed.save()
+        recent = Book.objects.create(serial_number="110002", title="Lalka", author="Boleslaw Prus")
+        recent.mark_borrowed(self.user)
+        recent.save()
+        Book.objects.create(serial_number="110003", title="Eden", author="Stanislaw Lem")
+        Book.objects.create(serial_number="110004", title="Pan Tadeusz", author="Adam Mickiewicz")
+
+    def _listed_serial_numbers(self, params):
+        response = self.client.get(self.list_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["serial_number"] for book in response.data]
+
+    def test_list_filters(self):
+        self._create_catalogue_for_filters()
+        week_ago = (timezone.now() - timedelta(days=7)).isoformat()
+
+        self.assertEqual(self._listed_serial_numbers({"is_borrowed": "true"}), ["110001", "110002"])
+        self.assertEqual(self._listed_serial_numbers({"is_borrowed": "false"}), ["110003", "110004"])
+        self.assertEqual(self._listed_serial_numbers({"borrowed_by": self.user.pk}), ["110001", "110002"])
+        self.assertEqual(self._listed_serial_numbers({"author": "Stanislaw Lem"}), ["110001", "110003"])
+        self.assertEqual(self._listed_serial_numbers({"title_prefix": "pan"}), ["110004"])
+        self.assertEqual(self._listed_serial_numbers({"author_prefix": "stan"}), ["110001", "110003"])
+        self.assertEqual(self._listed_serial_numbers({"search": "ADE"}), ["110004"])
+        self.assertEqual(self._listed_serial_numbers({"search": "prus"}), ["110002"])
+        self.assertEqual(self._listed_serial_numbers({"borrowed_before": week_ago}), ["110001"])
+        self.assertEqual(self._listed_serial_numbers({"borrowed_after": week_ago}), ["110002"])
+
+    def test_list_filters_reject_invalid_values(self):
+        self.assertEqual(self.client.get(self.list_url, {"search": "ab"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(self.list_url, {"borrowed_after": "yesterday"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_list_filters_are_index_scans(self):
+        queryset = Book.objects.all()
+        # Both partial indexes on borrowed books cost the same on a table this small.
+        borrowed_indexes = re.compile("book_borrowed_at_idx|book_overdue_scan_idx")
+        expected_indexes = [
+            (borrowed_indexes, {"is_borrowed": "true"}),
+            ("book_borrower_borrowed_at_idx", {"borrowed_by": self.user.pk}),
+            ("book_author_idx", {"author": "Stanislaw Lem"}),
+            ("book_title_trgm_idx", {"title_prefix": "Pan"}),
+            ("book_author_trgm_idx", {"search": "Lem"}),
+        ]
+        request_factory = APIRequestFactory()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for index_name, params in expected_indexes:
+            request = Request(request_factory.get(self.list_url, params))
+            # Drop the serial_number ordering so the unique index cannot stand in for the filter index.
+            plan = BookFilterBackend().filter_queryset(request, queryset, view=None).order_by().explain()
+            self.assertRegex(plan, index_name)
+
+    def test_search_ranks_title_matches_above_author_matches(self):
+        Book.objects.create(serial_number="120001", title="Pan Tadeusz", author="Adam Mickiewicz")
+        Book.objects.create(serial_number="120002", title="Dziady", author="Adam Mickiewicz")
+        Book.objects.create(serial_number="120003", title="Mickiewicz. Biografia", author="Jaroslaw Marek Rymkiewicz")
+        Book.objects.create(serial_number="120004", title="Lalka", author="Boleslaw Prus")
+
+        response = self.client.get(reverse("book-search"), {"q": "mickiewicz", "page_size": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        serial_numbers = [book["serial_number"] for book in response.data["results"]]
+        self.assertEqual(serial_numbers, ["120003", "120001"])
+        self.assertGreater(response.data["results"][0]["rank"], response.data["results"][1]["rank"])
+        self.assertIsNone(response.data["previous"])
+
+        second_page = self.client.get(response.data["next"])
+        self.assertEqual([book["serial_number"] for book in second_page.data["results"]], ["120002"])
+        self.assertIsNone(second_page.data["next"])
+
+        last_page = self.client.get(reverse("book-search"), {"q": "mickiewicz", "page": BookSearchPagination.max_page})
+        self.assertEqual(last_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(last_page.data["results"], [])
+        too_deep = self.client.get(
+            reverse("book-search"), {"q": "mickiewicz", "page": BookSearchPagination.max_page + 1}
+        )
+        self.assertEqual(too_deep.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_vector_follows_title_changes(self):
+        book = Book.objects.create(serial_number="120005", title="Solaris", author="Stanislaw Lem")
+        book.title = "Cyberiada"
+        book.save()
+
+        response = self.client.get(reverse("book-search"), {"q": "cyberiada"})
+
+        self.assertEqual([result["serial_number"] for result in response.data["results"]], ["120005"])
+        self.assertEqual(self.client.get(reverse("book-search"), {"q": "solaris"}).data["results"], [])
+        self.assertEqual(self.client.get(reverse("book-search")).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_uses_search_vector_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        query = SearchQuery("lem", config=SEARCH_CONFIG, search_type="websearch")
+
+        plan = Book.objects.filter(search_vector=query).order_by().explain()
+
+        self.assertIn("book_search_vector_idx", plan)
+
+    def test_list_answers_conditional_requests_with_not_modified(self):
+        Book.objects.create(serial_number="130001", title="Lalka", author="Boleslaw Prus")
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b"")
+
+        # Dates are too coarse to validate against; only the ETag is used.
+        self.assertNotIn("Last-Modified", response)
+        since = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(since.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_ignores_writes_that_change_nothing(self):
+        book = Book.objects.create(serial_number="130003", title="Lalka", author="Boleslaw Prus")
+        etag = self.client.get(self.list_url)["ETag"]
+
+        Book.objects.filter(serial_number="999999").update(title="Faraon")
+        Book.objects.filter(serial_number="999999").delete()
+        self.user.first_name = "Janusz"
+        self.user.save()
+        self.assertEqual(
+            self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+        book.mark_borrowed(self.user)
+        book.save()
+        etag = self.client.get(self.list_url)["ETag"]
+        self.user.last_login = timezone.now()
+        self.user.save()
+        self.assertEqual(
+            self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_list_etag_changes_after_catalogue_and_borrower_writes(self):
+        book = Book.objects.create(serial_number="130002", title="Lalka", author="Boleslaw Prus")
+        initial_etag = self.client.get(self.list_url)["ETag"]
+
+        detail_url = reverse("book-detail", args=[book.serial_number])
+        self.client.patch(detail_url, {"is_borrowed": True, "borrowed_by": self.user.pk}, format="json")
+        borrowed = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=initial_etag)
+        self.assertEqual(borrowed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(borrowed["ETag"], initial_etag)
+
+        self.user.first_name = "Janusz"
+        self.user.save()
+        renamed = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=borrowed["ETag"])
+        self.assertEqual(renamed.status_code, status.HTTP_200_OK)
+        self.assertEqual(renamed.data[0]["borrowed_by"]["first_name"], "Janusz")
+
+        Book.objects.filter(pk=book.pk).delete()
+        deleted = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=renamed["ETag"])
+        self.assertEqual(deleted.status_code, status.HTTP_200_OK)
+        self.assertEqual(deleted.data, [])
+
+    def test_cached_list_never_serves_stale_borrower_after_return(self):
+        book = Book.objects.create(serial_number="140001", title="Lalka", author="Boleslaw Prus")
+        detail_url = reverse("book-detail", args=[book.serial_number])
+        self.client.patch(detail_url, {"is_borrowed": True, "borrowed_by": self.user.pk}, format="json")
+        self.assertEqual(self.client.get(self.list_url).data[0]["borrowed_by"]["first_name"], "Jan")
+        self.assertEqual(self.client.get(self.list_url).data[0]["borrowed_by"]["first_name"], "Jan")
+
+        self.user.first_name = "Janusz"
+        self.user.save()
+        self.assertEqual(self.client.get(self.list_url).data[0]["borrowed_by"]["first_name"], "Janusz")
+
+        # Bypassing the model, as bulk updates and SQL do, refreshes the cached books all the same.
+        get_user_model().objects.filter(pk=self.user.pk).update(last_name="Nowak")
+        self.assertEqual(self.client.get(self.list_url).data[0]["borrowed_by"]["last_name"], "Nowak")
+        version = Book.objects.get(pk=book.pk).version
+        get_user_model().objects.filter(pk=self.user.pk).update(last_name="Nowak", last_login=timezone.now())
+        self.assertEqual(Book.objects.get(pk=book.pk).version, version)
+
+        self.client.patch(detail_url, {"is_borrowed": False}, format="json")
+        self.assertIsNone(self.client.get(self.list_url).data[0]["borrowed_by"])
+
+        self.client.post(
+            reverse("book-bulk-borrow"),
+            [{"serial_number": book.serial_number, "is_borrowed": True, "borrowed_by": self.user.pk}],
+            format="json",
+        )
+        self.assertEqual(self.client.get(self.list_url).data[0]["borrowed_by"]["library_card_number"], self.user.pk)
+
+    def test_cache_stats_count_hits_and_misses(self):
+        Book.objects.create(serial_number="140002", title="Lalka", author="Boleslaw Prus")
+        before = self.client.get(reverse("book-cache-stats")).data
+
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+
+        after = self.client.get(reverse("book-cache-stats")).data
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_loan_history_records_borrow_and_return(self):
+        book = Book.objects.create(serial_number="180001", title="Lalka", author="Boleslaw Prus")
+        detail_url = reverse("book-detail", args=[book.serial_number])
+        other_user = get_user_model().objects.create_user(
+            library_card_number="333444", first_name="Anna", last_name="Nowak", password="testpass123"
+        )
+
+        self.client.patch(detail_url, {"is_borrowed": True, "borrowed_by": "111222"}, format="json")
+        self.client.patch(detail_url, {"is_borrowed": False}, format="json")
+        self.client.post(
+            reverse("book-bulk-borrow"),
+            [{"serial_number": "180001", "is_borrowed": True, "borrowed_by": "333444"}],
+            format="json",
+        )
+        # A rejected borrow leaves no trace in the history.
+        self.client.patch(detail_url, {"is_borrowed": True, "borrowed_by": "111222"}, format="json")
+
+        history = self.client.get(reverse("book-loans", args=[book.serial_number]), {"page_size": 1})
+        self.assertEqual(history.status_code, status.HTTP_200_OK)
+        latest = history.data["results"]
+        self.assertEqual([(loan["borrowed_by"], loan["returned_at"]) for loan in latest], [("333444", None)])
+
+        older = self.client.get(history.data["next"]).data["results"]
+        self.assertEqual(older[0]["borrowed_by"], "111222")
+        self.assertIsNotNone(older[0]["returned_at"])
+
+        card_history = self.client.get(reverse("user-loans", args=[other_user.pk])).data["results"]
+        self.assertEqual([(loan["serial_number"], loan["title"]) for loan in card_history], [("180001", "Lalka")])
+
+    def test_loan_history_survives_deleting_the_book_and_the_borrower(self):
+        book = Book.objects.create(serial_number="180002", title="Faraon", author="Boleslaw Prus")
+        detail_url = reverse("book-detail", args=[book.serial_number])
+        borrower = get_user_model().objects.create_user(
+            library_card_number="333445", first_name="Anna", last_name="Nowak", password="testpass123"
+        )
+        self.client.patch(detail_url, {"is_borrowed": True, "borrowed_by": borrower.pk}, format="json")
+        self.client.patch(detail_url, {"is_borrowed": False}, format="json")
+
+        borrower.delete()
+        book.delete()
+
+        loan = Loan.objects.get(serial_number="180002")
+        self.assertEqual((loan.book_id, loan.borrower_id), (None, None))
+        data = LoanSerializer(loan).data
+        self.assertEqual((data["serial_number"], data["title"], data["borrowed_by"]), ("180002", None, "333445"))
+        self.assertIsNotNone(data["returned_at"])
+
+    def test_loan_history_of_unknown_card_is_not_found(self):
+        response = self.client.get(reverse("user-loans", args=["999999"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sparse_fieldset_matches_full_representation(self):
+        book = Book.objects.create(serial_number="240001", title="Lalka", author="Boleslaw Prus")
+        Book.objects.create(serial_number="240002", title="Faraon", author="Boleslaw Prus")
+        self.client.patch(
+            reverse("book-detail", args=[book.serial_number]), {"is_borrowed": True, "borrowed_by": "111222"}
+        )
+        full = self.client.get(self.list_url).data
+
+        for fields in ("serial_number,is_borrowed,borrowed_at", "title,borrowed_by"):
+            with self.subTest(fields=fields):
+                names = fields.split(",")
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(self.list_url, {"fields": fields})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data, [{name: item[name] for name in names} for item in full])
+                # The catalogue version for the ETag, then the books.
+                self.assertEqual(len(queries), 2)
+                book_query = queries[-1]["sql"]
+                self.assertNotIn('"catalog_book"."author"', book_query)
+                self.assertEqual("account_libraryuser" in book_query, "borrowed_by" in names)
+
+    def test_sparse_fieldset_with_exclude_and_pagination(self):
+        for index in range(3):
+            Book.objects.create(serial_number=f"25000{index}", title=f"Title {index}", author="Author")
+
+        first_page = self.client.get(
+            self.list_url, {"exclude": "serial_number,borrowed_by,borrowed_at", "page_size": 2}
+        )
+        self.assertEqual(
+            first_page.data["results"],
+            [
+                {"title": "Title 0", "author": "Author", "is_borrowed": False},
+                {"title": "Title 1", "author": "Author", "is_borrowed": False},
+            ],
+        )
+        second_page = self.client.get(first_page.data["next"])
+        self.assertEqual([book["title"] for book in second_page.data["results"]], ["Title 2"])
+
+        full_etag = self.client.get(self.list_url)["ETag"]
+        self.assertNotEqual(self.client.get(self.list_url, {"fields": "title"})["ETag"], full_etag)
+
+    def test_sparse_fieldset_rejects_unknown_fields(self):
+        response = self.client.get(self.list_url, {"fields": "title,isbn"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("isbn", str(response.data["fields"]))
+
+        response = self.client.get(self.list_url, {"fields": "title", "exclude": "title"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fast_serialization_is_byte_compatible(self):
+        Book.objects.create(serial_number="270001", title='Zażółć gęślą jaźń \u2028 "cytat"', author="Ąę </script>")
+        borrowed = Book.objects.create(serial_number="270002", title="Lalka", author="Boleslaw Prus")
+        Book.objects.create(serial_number="270003", title="Faraon", author="Boleslaw Prus")
+        self.client.patch(
+            reverse("book-detail", args=[borrowed.serial_number]), {"is_borrowed": True, "borrowed_by": "111222"}
+        )
+        # Microseconds and a non-UTC offset in the current time zone.
+        Book.objects.filter(pk=borrowed.pk).update(borrowed_at=timezone.now().replace(month=7, microsecond=123456))
+
+        for params in ({"is_borrowed": "true"}, {"page_size": 2}, {}):
+            for cache_enabled in (False, True):
+                with self.subTest(params=params, cache_enabled=cache_enabled):
+                    with self.settings(BOOK_CACHE={**settings.BOOK_CACHE, "ENABLED": cache_enabled}):
+                        cache.clear()
+                        expected = self.client.get(self.list_url, params).content
+                        cache.clear()
+                        with self.settings(BOOK_FAST_SERIALIZATION=True):
+                            self.assertEqual(self.client.get(self.list_url, params).content, expected)
+
+        self.assertIn(b"\\u2028", expected)
+
+    def test_user_list_embeds_borrowed_books_with_constant_queries(self):
+        User = get_user_model()
+        for index in range(5):
+            user = User.objects.create_user(
+                library_card_number=f"20000{index}", first_name="Anna", last_name=f"Nowak {index}"
+            )
+            for number in range(3):
+                book = Book(serial_number=f"2{index}000{number}", title=f"Title {number}", author="Author")
+                book.mark_borrowed(user, timezone.now() - timedelta(days=number))
+                book.save()
+        Book.objects.create(serial_number="209999", title="On the shelf", author="Author")
+
+        # One query for the page of users and one prefetch of all their borrowed books.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("user-list"), {"page_size": 8})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        users = {user["library_card_number"]: user for user in response.data["results"]}
+        self.assertEqual(len(users), 8)
+        self.assertEqual(
+            [book["serial_number"] for book in users["200000"]["borrowed_books"]], ["200002", "200001", "200000"]
+        )
+        self.assertEqual(users["111222"]["borrowed_books"], [])
+
+        next_page = self.client.get(response.data["next"]).data["results"]
+        self.assertEqual(len(next_page[0]["borrowed_books"]), 3)
+
+    def test_user_detail_by_card_number(self):
+        book = Book.objects.create(serial_number="210001", title="Lalka", author="Boleslaw Prus")
+        self.client.patch(
+            reverse("book-detail", args=[book.serial_number]), {"is_borrowed": True, "borrowed_by": "111222"}
+        )
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("user-detail", args=["111222"]))
+
+        self.assertEqual(response.data["last_name"], "Kowalski")
+        self.assertEqual([book["title"] for book in response.data["borrowed_books"]], ["Lalka"])
+        self.assertEqual(self.client.get(reverse("user-detail", args=["999999"])).status_code, 404)
+
+    def test_circulation_stats_follow_writes(self):
+        Book.objects.create(serial_number="190001", title="Lalka", author="Boleslaw Prus")
+        Book.objects.create(serial_number="190002", title="Faraon", author="Boleslaw Prus")
+        Book.objects.create(serial_number="190003", title="Solaris", author="Stanislaw Lem")
+        for serial_number in ["190001", "190003", "190001"]:
+            self.client.patch(
+                reverse("book-detail", args=[serial_number]), {"is_borrowed": True, "borrowed_by": "111222"}
+            )
+            self.client.patch(reverse("book-detail", args=[serial_number]), {"is_borrowed": False})
+        self.client.post(
+            reverse("book-bulk-borrow"),
+            [{"serial_number": "190002", "is_borrowed": True, "borrowed_by": "111222"}],
+            format="json",
+        )
+        self.client.delete(reverse("book-detail", args=["190003"]))
+
+        with self.assertNumQueries(3):
+            stats = self.client.get(reverse("circulation-stats"), {"limit": 1}).data
+
+        self.assertEqual((stats["books"], stats["borrowed"], stats["available"]), (2, 1, 1))
+        self.assertEqual(stats["top_authors"], [{"author": "Boleslaw Prus", "loans": 3, "books": 2, "borrowed": 1}])
+        [top_borrower] = stats["top_borrowers"]
+        self.assertEqual(top_borrower["borrower"]["library_card_number"], "111222")
+        self.assertEqual((top_borrower["loans"], top_borrower["borrowed"]), (4, 1))
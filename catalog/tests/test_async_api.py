@@ -0,0 +1,68 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Book
+
+
+class AsyncBookAPITestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            library_card_number="111222",
+            first_name="Jan",
+            last_name="Kowalski",
+            password="testpass123",
+        )
+        borrowed = Book.objects.create(serial_number="150001", title="Lalka", author="Boleslaw Prus")
+        borrowed.mark_borrowed(self.user)
+        borrowed.save()
+        Book.objects.create(serial_number="150002", title="Faraon", author="Boleslaw Prus")
+        Book.objects.create(serial_number="150003", title="Solaris", author="Stanislaw Lem")
+
+    async def test_list_pages_with_keyset(self):
+        first_page = await self.async_client.get(reverse("async-book-list"), {"page_size": 2})
+        self.assertEqual(first_page.status_code, 200)
+        data = first_page.json()
+        self.assertEqual([book["serial_number"] for book in data["results"]], ["150001", "150002"])
+        self.assertEqual(data["results"][0]["borrowed_by"]["library_card_number"], "111222")
+
+        second_page = (await self.async_client.get(data["next"])).json()
+        self.assertEqual([book["serial_number"] for book in second_page["results"]], ["150003"])
+        self.assertIsNone(second_page["next"])
+
+    async def test_list_applies_filters(self):
+        response = await self.async_client.get(reverse("async-book-list"), {"author": "Stanislaw Lem"})
+        self.assertEqual([book["serial_number"] for book in response.json()["results"]], ["150003"])
+
+        invalid = await self.async_client.get(reverse("async-book-list"), {"search": "ab"})
+        self.assertEqual(invalid.status_code, 400)
+
+    async def test_detail(self):
+        response = await self.async_client.get(reverse("async-book-detail", args=["150002"]))
+        self.assertEqual(response.json()["title"], "Faraon")
+
+        missing = await self.async_client.get(reverse("async-book-detail", args=["999999"]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_export_streams_asynchronously(self):
+        with self.settings(BOOK_EXPORT_CHUNK_SIZE=2):
+            response = await self.async_client.get(reverse("async-book-export"))
+
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([row["serial_number"] for row in rows], ["150001", "150002", "150003"])
+
+    async def test_book_export_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get(reverse("book-export"), {"output": "csv"})
+
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 4)
+
+    async def test_read_only(self):
+        response = await self.async_client.post(reverse("async-book-list"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,88 @@
+from time import monotonic as real_monotonic
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..borrower_cache import borrower_cache
+from ..metrics import BORROWER_CACHE_EVICTIONS, BORROWER_CACHE_LOOKUPS
+from ..models import Book
+from ..serializers import BookSerializer
+
+
+def borrower_cache_settings(**overrides):
+    return override_settings(BORROWER_CACHE={**settings.BORROWER_CACHE, **overrides})
+
+
+class BorrowerSummaryCacheTests(TestCase):
+    def setUp(self):
+        borrower_cache.clear()
+        self.addCleanup(borrower_cache.clear)
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(
+                library_card_number=f"26000{index}", first_name="Jan", last_name=f"Kowalski {index}"
+            )
+            for index in range(3)
+        ]
+        for index, user in enumerate(self.users):
+            book = Book(serial_number=f"26000{index}", title="Lalka", author="Boleslaw Prus")
+            book.mark_borrowed(user)
+            book.save()
+
+    def render(self):
+        books = Book.objects.select_related("borrowed_by").order_by("serial_number")
+        return [book["borrowed_by"] for book in BookSerializer(books, many=True).data]
+
+    def counts(self, metric, *labels):
+        snapshot = metric.snapshot()
+        return [snapshot.get((label,), 0) for label in labels]
+
+    def test_repeated_borrowers_are_served_from_cache(self):
+        hits, misses = self.counts(BORROWER_CACHE_LOOKUPS, "hit", "miss")
+
+        first = self.render()
+        self.assertEqual(self.render(), first)
+
+        self.assertEqual(self.counts(BORROWER_CACHE_LOOKUPS, "hit", "miss"), [hits + 3, misses + 3])
+        self.assertEqual(
+            first[0], {"library_card_number": "260000", "first_name": "Jan", "last_name": "Kowalski 0", "email": ""}
+        )
+
+    def test_edited_borrower_is_rendered_fresh(self):
+        self.render()
+        invalidated = self.counts(BORROWER_CACHE_EVICTIONS, "invalidated")[0]
+
+        user = self.users[0]
+        user.last_name = "Nowak"
+        user.save()
+        self.assertEqual(self.counts(BORROWER_CACHE_EVICTIONS, "invalidated")[0], invalidated + 1)
+        self.assertEqual(self.render()[0]["last_name"], "Nowak")
+
+        # An edit this process received no signal for, as if made by another worker.
+        get_user_model().objects.filter(pk=user.pk).update(email="anna@example.com")
+        self.assertEqual(self.render()[0]["email"], "anna@example.com")
+
+    @borrower_cache_settings(MAX_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        size_evictions = self.counts(BORROWER_CACHE_EVICTIONS, "size")[0]
+
+        self.render()
+
+        self.assertEqual(len(borrower_cache), 2)
+        self.assertEqual(self.counts(BORROWER_CACHE_EVICTIONS, "size")[0], size_evictions + 1)
+
+    @borrower_cache_settings(TTL=60)
+    def test_entries_expire(self):
+        self.render()
+        hits, expired = (
+            self.counts(BORROWER_CACHE_LOOKUPS, "hit")[0],
+            self.counts(BORROWER_CACHE_EVICTIONS, "expired")[0],
+        )
+
+        with mock.patch("catalog.borrower_cache.time.monotonic", side_effect=lambda: real_monotonic() + 61):
+            self.render()
+
+        self.assertEqual(self.counts(BORROWER_CACHE_LOOKUPS, "hit")[0], hits)
+        self.assertEqual(self.counts(BORROWER_CACHE_EVICTIONS, "expired")[0], expired + 3)
@@ -0,0 +1,259 @@
+import csv
+import json
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .. import overdue
+from ..models import (
+    AuthorCirculation,
+    Book,
+    BorrowerCirculation,
+    CirculationCounter,
+    Loan,
+)
+
+
+class ImportBooksCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_imports_json_file_and_writes_error_report(self):
+        Book.objects.create(serial_number="100001", title="Lalka", author="Boleslaw Prus")
+        source = Path(self.directory.name) / "books.json"
+        source.write_text(
+            json.dumps(
+                [
+                    {"serial_number": "100001", "title": "Lalka", "author": "Boleslaw Prus"},
+                    {"serial_number": "100002", "title": "Solaris", "author": "Stanislaw Lem"},
+                    {"serial_number": "100003", "title": "Eden", "author": "Stanislaw Lem"},
+                ]
+            )
+        )
+        errors_file = Path(self.directory.name) / "errors.ndjson"
+        stdout = StringIO()
+
+        call_command("import_books", str(source), batch_size=2, errors_file=str(errors_file), stdout=stdout)
+
+        self.assertIn("Imported 2 books, rejected 1.", stdout.getvalue())
+        self.assertEqual(Book.objects.filter(author="Stanislaw Lem").count(), 2)
+        errors = [json.loads(line) for line in errors_file.read_text().splitlines()]
+        self.assertEqual([error["serial_number"] for error in errors], ["100001"])
+
+
+class LoanPartitionsCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            library_card_number="111222", first_name="Jan", last_name="Kowalski", password="testpass123"
+        )
+        self.book = Book.objects.create(serial_number="100001", title="Lalka", author="Boleslaw Prus")
+
+    def loan(self, borrowed_at):
+        return Loan.objects.create(
+            book=self.book,
+            borrower=self.user,
+            serial_number=self.book.serial_number,
+            library_card_number=self.user.pk,
+            borrowed_at=borrowed_at,
+        )
+
+    def partition_of(self, loan):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM catalog_loan WHERE id = %s", [loan.pk])
+            return cursor.fetchone()[0]
+
+    def test_creates_partitions_and_moves_loans_out_of_default(self):
+        old_loan = self.loan(datetime(2020, 5, 17, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.partition_of(old_loan), "catalog_loan_default")
+
+        call_command("loan_partitions", months_ahead=1, stdout=StringIO())
+
+        self.assertEqual(self.partition_of(old_loan), "catalog_loan_p202005")
+        current_loan = self.loan(timezone.now())
+        self.assertEqual(self.partition_of(current_loan), f"catalog_loan_p{timezone.now():%Y%m}")
+
+        stdout = StringIO()
+        call_command("loan_partitions", detach_before="2021-01", stdout=stdout)
+        self.assertIn("Detached catalog_loan_p202005.", stdout.getvalue())
+        self.assertFalse(Loan.objects.filter(pk=old_loan.pk).exists())
+        # Archived loans do not block deleting their book.
+        self.book.delete()
+
+
+class RebuildCirculationStatsCommandTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            library_card_number="111222", first_name="Jan", last_name="Kowalski", password="testpass123"
+        )
+        self.other_user = User.objects.create_user(
+            library_card_number="333444", first_name="Anna", last_name="Nowak", password="testpass123"
+        )
+        self.book = Book.objects.create(serial_number="100001", title="Lalka", author="Boleslaw Prus")
+        Book.objects.create(serial_number="100002", title="Solaris", author="Stanislaw Lem")
+        self.borrow(self.book, self.user)
+
+    def borrow(self, book, user):
+        book.mark_borrowed(user)
+        book.save()
+        Loan.open_for(book).save()
+
+    def snapshot(self):
+        return (
+            CirculationCounter.totals(),
+            list(AuthorCirculation.objects.order_by("author").values_list("author", "books", "borrowed", "loans")),
+            list(BorrowerCirculation.objects.order_by("borrower").values_list("borrower", "borrowed", "loans")),
+        )
+
+    def rebuilt(self):
+        AuthorCirculation.objects.update(loans=100)
+        CirculationCounter.objects.all().delete()
+        call_command("rebuild_circulation_stats", stdout=StringIO())
+        return self.snapshot()
+
+    def test_rebuild_matches_incremental_counts(self):
+        incremental = self.snapshot()
+
+        self.assertEqual(self.rebuilt(), incremental)
+        self.assertEqual(incremental[0], {"books": 2, "borrowed": 1})
+
+    def test_rebuild_matches_incremental_counts_after_deletes(self):
+        faraon = Book.objects.create(serial_number="100003", title="Faraon", author="Boleslaw Prus")
+        self.borrow(faraon, self.other_user)
+        faraon.mark_returned()
+        faraon.save()
+        self.borrow(faraon, self.user)
+        # Flagged as borrowed without a loan, as the admin or an import may do.
+        Book.objects.filter(serial_number="100002").update(is_borrowed=True, borrowed_by=self.other_user)
+        Book.objects.filter(serial_number="100002").update(author="Stanislaw Lem Jr.")
+        self.other_user.delete()
+        Book.objects.filter(author="Boleslaw Prus").delete()
+
+        incremental = self.snapshot()
+
+        self.assertEqual(self.rebuilt(), incremental)
+        self.assertEqual(
+            incremental,
+            (
+                {"books": 1, "borrowed": 1},
+                [("Stanislaw Lem Jr.", 1, 1, 0)],
+                [("111222", 0, 2)],
+            ),
+        )
+        self.assertEqual(Loan.objects.count(), 3)
+
+    def test_detached_loans_leave_the_statistics(self):
+        old_loan = Loan.open_for(self.book)
+        old_loan.borrowed_at = datetime(2020, 5, 17, tzinfo=dt_timezone.utc)
+        old_loan.save()
+        call_command("loan_partitions", months_ahead=0, stdout=StringIO())
+        self.assertEqual(self.snapshot()[2], [("111222", 1, 2)])
+
+        call_command("loan_partitions", months_ahead=0, detach_before="2021-01", stdout=StringIO())
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[2], [("111222", 1, 1)])
+        self.assertEqual(self.rebuilt(), incremental)
+
+
+class ScanOverdueLoansCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output = Path(self.directory.name) / "overdue.ndjson"
+        User = get_user_model()
+        jan = User.objects.create_user(
+            library_card_number="111222", first_name="Jan", last_name="Kowalski", password="testpass123"
+        )
+        anna = User.objects.create_user(
+            library_card_number="333444", first_name="Anna", last_name="Nowak", password="testpass123"
+        )
+        now = timezone.now()
+        for index, (borrower, days) in enumerate([(jan, 40), (anna, 35), (jan, 31), (anna, 45), (jan, 5)]):
+            book = Book(serial_number=f"{100001 + index}", title=f"Book {index}", author="Stanislaw Lem")
+            book.mark_borrowed(borrower, now - timedelta(days=days))
+            book.save()
+        Book.objects.create(serial_number="100009", title="On the shelf", author="Stanislaw Lem")
+
+    def read_report(self):
+        return [json.loads(line) for line in self.output.read_text().splitlines()]
+
+    def test_reports_overdue_books_grouped_by_borrower(self):
+        stdout = StringIO()
+        call_command("scan_overdue_loans", str(self.output), days=30, chunk_size=2, stdout=stdout)
+
+        report = self.read_report()
+        self.assertEqual([entry["library_card_number"] for entry in report], ["111222", "333444"])
+        self.assertEqual(report[0]["last_name"], "Kowalski")
+        self.assertEqual([book["serial_number"] for book in report[0]["overdue"]], ["100001", "100003"])
+        self.assertEqual([book["days_overdue"] for book in report[1]["overdue"]], [15, 5])
+        self.assertIn("Found 4 overdue loans of 2 borrowers", stdout.getvalue())
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [self.output])
+
+    def test_books_of_deleted_borrowers_come_first(self):
+        get_user_model().objects.filter(library_card_number="333444").delete()
+        call_command("scan_overdue_loans", str(self.output), days=30, chunk_size=1, stdout=StringIO())
+
+        report = self.read_report()
+        self.assertEqual([entry["library_card_number"] for entry in report], [None, "111222"])
+        self.assertEqual([book["serial_number"] for book in report[0]["overdue"]], ["100004", "100002"])
+
+    def test_writes_csv_rows_per_book(self):
+        output = Path(self.directory.name) / "overdue.csv"
+        call_command("scan_overdue_loans", str(output), output_format="csv", days=30, stdout=StringIO())
+
+        rows = list(csv.DictReader(output.read_text().splitlines()))
+        self.assertEqual(
+            [(row["library_card_number"], row["serial_number"]) for row in rows],
+            [("111222", "100001"), ("111222", "100003"), ("333444", "100004"), ("333444", "100002")],
+        )
+
+    def test_resumes_an_interrupted_scan(self):
+        fetched = []
+
+        def fail_on_second_chunk(cutoff, bounds):
+            if len(fetched) == 1:
+                raise RuntimeError("connection lost")
+            fetched.append(bounds)
+            return overdue.fetch_chunk(cutoff, bounds)
+
+        target = "catalog.management.commands.scan_overdue_loans.fetch_chunk"
+        with mock.patch(target, side_effect=fail_on_second_chunk), self.assertRaises(RuntimeError):
+            call_command("scan_overdue_loans", str(self.output), days=30, chunk_size=2, stdout=StringIO())
+        self.assertTrue(Path(f"{self.output}.checkpoint").exists())
+
+        stdout = StringIO()
+        with mock.patch(target, side_effect=fail_on_second_chunk):
+            fetched.append(None)
+            call_command("scan_overdue_loans", str(self.output), days=30, chunk_size=2, stdout=stdout)
+
+        self.assertIn("Resuming the scan", stdout.getvalue())
+        self.assertEqual(sum(len(entry["overdue"]) for entry in self.read_report()), 4)
+
+
+class ParallelScanOverdueLoansCommandTests(TransactionTestCase):
+    def test_worker_processes_fetch_chunks(self):
+        user = get_user_model().objects.create_user(
+            library_card_number="111222", first_name="Jan", last_name="Kowalski", password="testpass123"
+        )
+        for index in range(5):
+            book = Book(serial_number=f"{100001 + index}", title=f"Book {index}", author="Stanislaw Lem")
+            book.mark_borrowed(user, timezone.now() - timedelta(days=40 + index))
+            book.save()
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "overdue.ndjson"
+            call_command("scan_overdue_loans", str(output), days=30, chunk_size=2, workers=2, stdout=StringIO())
+            (report,) = [json.loads(line) for line in output.read_text().splitlines()]
+
+        self.assertEqual([book["serial_number"] for book in report["overdue"]], [f"{100005 - i}" for i in range(5)])
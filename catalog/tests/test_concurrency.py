@@ -0,0 +1,174 @@
+import threading
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from ..exceptions import Conflict
+from ..importing import BookImporter
+from ..models import Book, Loan
+from ..serializers import BookSerializer
+
+
+class ConditionalUpdateTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            library_card_number="111222",
+            first_name="Jan",
+            last_name="Kowalski",
+            password="testpass123",
+        )
+        User.objects.create_user(
+            library_card_number="333444",
+            first_name="Anna",
+            last_name="Nowak",
+            password="testpass123",
+        )
+        self.book = Book.objects.create(serial_number="220001", title="Lalka", author="Boleslaw Prus")
+        self.detail_url = reverse("book-detail", args=[self.book.serial_number])
+
+    def test_if_match_guards_both_locking_modes(self):
+        for optimistic in (False, True):
+            with self.subTest(optimistic=optimistic), override_settings(BOOK_OPTIMISTIC_LOCKING=optimistic):
+                read_etag = self.client.get(reverse("async-book-detail", args=[self.book.serial_number]))["ETag"]
+                borrowed = self.client.patch(
+                    self.detail_url, {"is_borrowed": True, "borrowed_by": "111222"}, HTTP_IF_MATCH=read_etag
+                )
+                self.assertEqual(borrowed.status_code, status.HTTP_200_OK)
+                self.book.refresh_from_db()
+                self.assertEqual(borrowed["ETag"], self.book.etag)
+
+                stale = self.client.patch(self.detail_url, {"is_borrowed": False}, HTTP_IF_MATCH=read_etag)
+                self.assertEqual(stale.status_code, status.HTTP_412_PRECONDITION_FAILED)
+                self.assertTrue(Book.objects.get(pk=self.book.pk).is_borrowed)
+
+                returned = self.client.patch(self.detail_url, {"is_borrowed": False}, HTTP_IF_MATCH=borrowed["ETag"])
+                self.assertEqual(returned.status_code, status.HTTP_200_OK)
+
+    def test_malformed_if_match_is_rejected(self):
+        response = self.client.patch(self.detail_url, {"is_borrowed": False}, HTTP_IF_MATCH='"something-else"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    @override_settings(BOOK_OPTIMISTIC_LOCKING=True)
+    def test_optimistic_update_of_stale_book_conflicts(self):
+        stale = Book.objects.select_related("borrowed_by").get(pk=self.book.pk)
+        self.client.patch(self.detail_url, {"is_borrowed": True, "borrowed_by": "111222"})
+
+        serializer = BookSerializer(stale, data={"is_borrowed": True, "borrowed_by": "333444"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(Conflict):
+            serializer.save()
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.borrowed_by, self.user)
+        self.assertEqual(Loan.objects.filter(book=self.book).count(), 1)
+
+    @override_settings(BOOK_OPTIMISTIC_LOCKING=True)
+    def test_optimistic_update_skips_select_for_update_and_refreshes_cached_list(self):
+        self.client.get(reverse("book-list"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.detail_url, {"is_borrowed": True, "borrowed_by": "111222"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if "FOR UPDATE" in query["sql"]])
+
+        listed = self.client.get(reverse("book-list")).data
+        self.assertEqual(listed[0]["borrowed_by"]["library_card_number"], "111222")
+
+
+class BorrowContentionTestCase(TransactionTestCase):
+    """Many clients borrowing the same book at once: exactly one of them gets it, in either mode."""
+
+    clients = 8
+
+    def setUp(self):
+        User = get_user_model()
+        self.card_numbers = [f"{230000 + index}" for index in range(self.clients)]
+        for card_number in self.card_numbers:
+            User.objects.create_user(library_card_number=card_number, first_name="Jan", last_name="Kowalski")
+
+    def borrow_concurrently(self):
+        book = Book.objects.create(serial_number="230001", title="Lalka", author="Boleslaw Prus")
+        url = reverse("book-detail", args=[book.serial_number])
+        barrier = threading.Barrier(self.clients)
+        statuses = []
+
+        def borrow(card_number):
+            client = APIClient()
+            try:
+                barrier.wait()
+                response = client.patch(url, {"is_borrowed": True, "borrowed_by": card_number})
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=borrow, args=[card_number]) for card_number in self.card_numbers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return book, Counter(statuses)
+
+    def assert_single_winner(self, book, statuses):
+        self.assertEqual(statuses[status.HTTP_200_OK], 1)
+        self.assertEqual(sum(statuses.values()), self.clients)
+        self.assertEqual(Loan.objects.filter(book=book).count(), 1)
+
+    def test_pessimistic_borrowers_queue_on_the_row_lock(self):
+        book, statuses = self.borrow_concurrently()
+        self.assert_single_winner(book, statuses)
+        self.assertEqual(statuses[status.HTTP_400_BAD_REQUEST], self.clients - 1)
+
+    @override_settings(BOOK_OPTIMISTIC_LOCKING=True)
+    def test_optimistic_losers_get_conflict_or_already_borrowed(self):
+        book, statuses = self.borrow_concurrently()
+        self.assert_single_winner(book, statuses)
+        self.assertEqual(statuses[status.HTTP_409_CONFLICT] + statuses[status.HTTP_400_BAD_REQUEST], self.clients - 1)
+
+
+class ConcurrentImportTestCase(TransactionTestCase):
+    """Two imports of the same serial numbers whose existence probes both come up empty."""
+
+    def test_colliding_batch_is_probed_again(self):
+        probed = threading.Barrier(2)
+        new_books = BookImporter._new_books
+        first_probe = threading.local()
+
+        def probe_together(importer, candidates):
+            result = new_books(importer, candidates)
+            if not getattr(first_probe, "done", False):
+                first_probe.done = True
+                probed.wait(timeout=10)
+            return result
+
+        payload = [
+            {"serial_number": f"{240001 + index}", "title": "Lalka", "author": "Boleslaw Prus"} for index in range(3)
+        ]
+        responses = []
+
+        def import_books():
+            try:
+                responses.append(APIClient().post(reverse("book-import-books"), payload, format="json"))
+            finally:
+                connection.close()
+
+        with mock.patch.object(BookImporter, "_new_books", probe_together):
+            threads = [threading.Thread(target=import_books) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 2)
+        self.assertEqual(sorted(response.data["created"] for response in responses), [0, 3])
+        self.assertEqual(sorted(response.data["rejected"] for response in responses), [0, 3])
+        self.assertEqual(Book.objects.count(), 3)
@@ -0,0 +1,155 @@
+import json
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from library_project.metrics import DB_QUERY_DURATION, REGISTRY, fold_process_snapshot
+
+from ..exceptions import Conflict
+from ..models import Book
+from ..serializers import BookSerializer
+
+
+@override_settings(METRICS={**settings.METRICS, "TOKEN": "scrape-token"})
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            library_card_number="111222",
+            first_name="Jan",
+            last_name="Kowalski",
+            password="testpass123",
+        )
+        self.other_user = User.objects.create_user(
+            library_card_number="333444",
+            first_name="Anna",
+            last_name="Nowak",
+            password="testpass123",
+        )
+        Book.objects.create(serial_number="170001", title="Lalka", author="Boleslaw Prus")
+
+    def sample(self, name, **labels):
+        exposition = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token").content.decode()
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        pattern = rf"^{re.escape(name)}{re.escape('{' + label_text + '}') if labels else ''} (\S+)$"
+        match = re.search(pattern, exposition, re.MULTILINE)
+        return float(match.group(1)) if match else 0.0
+
+    def test_request_latency_is_recorded_per_action(self):
+        labels = {"view": "book-detail", "action": "partial_update", "method": "PATCH", "status": "200"}
+        before = self.sample("library_http_request_duration_seconds_count", **labels)
+
+        self.client.patch(reverse("book-detail", args=["170001"]), {"is_borrowed": True, "borrowed_by": "111222"})
+
+        self.assertEqual(self.sample("library_http_request_duration_seconds_count", **labels), before + 1)
+        self.assertGreater(self.sample("library_db_query_duration_seconds_count", alias="default"), 0)
+
+    def test_borrowing_outcomes_are_counted(self):
+        borrowed = self.sample("library_borrowing_operations_total", operation="borrow", outcome="ok")
+        conflicts = self.sample("library_borrowing_operations_total", operation="borrow", outcome="conflict")
+        returned = self.sample("library_borrowing_operations_total", operation="return", outcome="ok")
+        url = reverse("book-detail", args=["170001"])
+
+        self.client.patch(url, {"is_borrowed": True, "borrowed_by": "111222"})
+        response = self.client.patch(url, {"is_borrowed": True, "borrowed_by": "333444"})
+        self.assertEqual(response.status_code, 400)
+        self.client.patch(url, {"is_borrowed": False})
+
+        self.assertEqual(
+            self.sample("library_borrowing_operations_total", operation="borrow", outcome="ok"), borrowed + 1
+        )
+        self.assertEqual(
+            self.sample("library_borrowing_operations_total", operation="borrow", outcome="conflict"), conflicts + 1
+        )
+        self.assertEqual(
+            self.sample("library_borrowing_operations_total", operation="return", outcome="ok"), returned + 1
+        )
+
+    @override_settings(BOOK_OPTIMISTIC_LOCKING=True)
+    def test_lost_optimistic_race_is_counted_as_conflict(self):
+        borrowed = self.sample("library_borrowing_operations_total", operation="borrow", outcome="ok")
+        conflicts = self.sample("library_borrowing_operations_total", operation="borrow", outcome="conflict")
+        stale = Book.objects.get(serial_number="170001")
+        self.client.patch(reverse("book-detail", args=["170001"]), {"is_borrowed": True, "borrowed_by": "111222"})
+
+        serializer = BookSerializer(stale, data={"is_borrowed": True, "borrowed_by": "333444"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(Conflict):
+            serializer.save()
+
+        self.assertEqual(
+            self.sample("library_borrowing_operations_total", operation="borrow", outcome="ok"), borrowed + 1
+        )
+        self.assertEqual(
+            self.sample("library_borrowing_operations_total", operation="borrow", outcome="conflict"), conflicts + 1
+        )
+
+    def test_book_cache_lookups_are_counted(self):
+        hits = self.sample("library_book_cache_lookups_total", result="hit")
+        misses = self.sample("library_book_cache_lookups_total", result="miss")
+
+        self.client.get(reverse("book-list"))
+        self.client.get(reverse("book-list"))
+
+        self.assertEqual(self.sample("library_book_cache_lookups_total", result="miss"), misses + 1)
+        self.assertEqual(self.sample("library_book_cache_lookups_total", result="hit"), hits + 1)
+
+    def test_values_of_other_worker_processes_are_added(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS={**settings.METRICS, "MULTIPROCESS_DIR": directory}):
+                own = self.sample("library_book_cache_lookups_total", result="hit")
+                Path(directory, "1.json").write_text(
+                    json.dumps({"library_book_cache_lookups_total": [[["hit"], 5]], "retired_metric": [[[], 1]]})
+                )
+                self.assertEqual(self.sample("library_book_cache_lookups_total", result="hit"), own + 5)
+
+                REGISTRY.flush()
+                self.assertEqual(len(list(Path(directory).glob("*.json"))), 2)
+
+    def test_snapshots_of_exited_processes_are_folded_into_the_aggregate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS={**settings.METRICS, "MULTIPROCESS_DIR": directory}):
+                own = self.sample("library_book_cache_lookups_total", result="hit")
+                histogram = [1] + [0] * (len(DB_QUERY_DURATION.buckets) - 1) + [0, 0.002, 1]
+                for pid, hits in [(1, 5), (2, 7)]:
+                    Path(directory, f"{pid}.json").write_text(
+                        json.dumps(
+                            {
+                                "library_book_cache_lookups_total": [[["hit"], hits]],
+                                "library_db_query_duration_seconds": [[["replica9"], histogram]],
+                            }
+                        )
+                    )
+                fold_process_snapshot(directory, 1)
+                fold_process_snapshot(directory, 2)
+                fold_process_snapshot(directory, 3)
+
+                self.assertTrue(Path(directory, "aggregate.json").exists())
+                self.assertFalse(Path(directory, "1.json").exists() or Path(directory, "2.json").exists())
+                self.assertEqual(self.sample("library_book_cache_lookups_total", result="hit"), own + 12)
+                self.assertEqual(
+                    self.sample("library_db_query_duration_seconds_count", alias="replica9"),
+                    2,
+                )
+
+    def test_endpoint_requires_the_token_or_a_staff_user(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer guess").status_code, 401)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+        with override_settings(METRICS={**settings.METRICS, "TOKEN": ""}):
+            self.client.logout()
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 401)
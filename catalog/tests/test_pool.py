@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase
+
+from library_project.postgresql_pool import base as pool_base
+from library_project.postgresql_pool.base import DatabaseWrapper, PoolTimeout
+from library_project.postgresql_pool.middleware import PoolTimeoutMiddleware
+
+
+class ConnectionPoolTests(TestCase):
+    def wrapper(self, max_size=2, timeout=0.1):
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": "library_project.postgresql_pool",
+            # Its own pool, even when the test database connection is pooled as well.
+            "OPTIONS": {**connection.settings_dict["OPTIONS"], "application_name": f"pool_test_{max_size}"},
+            "POOL": {"MIN_SIZE": 1, "MAX_SIZE": max_size, "TIMEOUT": timeout},
+        }
+        # Under the default alias, which the connection_created receivers look up.
+        wrapper = DatabaseWrapper(settings_dict)
+        self.addCleanup(self.close_pool, wrapper)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def close_pool(self, wrapper):
+        connection_pool = wrapper.get_connection_pool(wrapper.get_connection_params())
+        for key in [key for key, value in pool_base._pools.items() if value is connection_pool]:
+            pool_base._pools.pop(key).closeall()
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def test_closed_connections_are_reused(self):
+        wrapper = self.wrapper()
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+
+        self.assertEqual(self.backend_pid(wrapper), pid)
+
+    def test_connections_dropped_by_the_server_are_discarded(self):
+        wrapper = self.wrapper()
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+
+        new_pid = self.backend_pid(wrapper)
+
+        self.assertNotEqual(new_pid, pid)
+        wrapper.close()
+        self.assertEqual(self.backend_pid(wrapper), new_pid)
+
+    def test_exhausted_pool_times_out(self):
+        holder, waiter = self.wrapper(max_size=1), self.wrapper(max_size=1)
+        self.backend_pid(holder)
+
+        with self.assertRaises(OperationalError) as raised:
+            self.backend_pid(waiter)
+        self.assertIsInstance(raised.exception.__cause__, PoolTimeout)
+
+        holder.close()
+        self.backend_pid(waiter)
+
+    def test_pool_timeouts_are_answered_with_503(self):
+        with mock.patch.dict(settings.DATABASES["default"], ENGINE="library_project.postgresql_pool"):
+            middleware = PoolTimeoutMiddleware(lambda request: None)
+        request = RequestFactory().get("/api/books/")
+        try:
+            raise OperationalError("exhausted") from PoolTimeout("exhausted")
+        except OperationalError as exc:
+            response = middleware.process_exception(request, exc)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIsNone(middleware.process_exception(request, OperationalError("other")))
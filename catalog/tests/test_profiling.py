@@ -0,0 +1,74 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from ..models import Book
+
+
+def profiling(**overrides):
+    return override_settings(REQUEST_PROFILING={**settings.REQUEST_PROFILING, "ENABLED": True, **overrides})
+
+
+class RequestProfilingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            library_card_number="111222",
+            first_name="Jan",
+            last_name="Kowalski",
+            password="testpass123",
+        )
+        Book.objects.create(serial_number="160001", title="Lalka", author="Boleslaw Prus")
+
+    def server_timing(self, response):
+        return dict((entry.split(";")[0], entry.split(";")[1:]) for entry in response["Server-Timing"].split(", "))
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse("book-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    @profiling(SLOW_REQUEST_MS=60_000)
+    def test_reports_phases_in_server_timing_header(self):
+        with self.assertLogs("library_project.profiling", "INFO") as logs:
+            response = self.client.get(reverse("book-list"))
+
+        timings = self.server_timing(response)
+        self.assertEqual(set(timings), {"db", "serialize", "render", "total"})
+        self.assertEqual(timings["db"][1], 'desc="3 queries"')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, "INFO")
+        self.assertEqual((record["path"], record["status"], record["queries"]), ("/api/books/", 200, 3))
+        self.assertNotIn("sql", record)
+
+    @profiling(SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_its_sql(self):
+        with self.assertLogs("library_project.profiling", "WARNING") as logs:
+            self.client.patch(
+                reverse("book-detail", args=["160001"]),
+                {"is_borrowed": True, "borrowed_by": "111222"},
+                format="json",
+            )
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record["sql"]), record["queries"])
+        self.assertTrue(any("FOR UPDATE" in query["sql"] for query in record["sql"]))
+
+    @profiling(SAMPLE_RATE=0.0, SLOW_REQUEST_MS=0)
+    def test_unsampled_requests_are_not_timed(self):
+        response = self.client.get(reverse("book-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    @profiling(SLOW_REQUEST_MS=60_000)
+    async def test_async_views_are_timed(self):
+        with self.assertLogs("library_project.profiling", "INFO"):
+            response = await self.async_client.get(reverse("async-book-list"))
+        timings = self.server_timing(response)
+        self.assertEqual(timings["db"][1], 'desc="1 queries"')
+        self.assertIn("serialize", timings)
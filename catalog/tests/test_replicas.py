@@ -0,0 +1,181 @@
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library_project.replicas import (
+    LSN_COOKIE,
+    LSN_HEADER,
+    ReplicaRouter,
+    ReplicaTokenMiddleware,
+    format_lsn,
+    parse_lsn,
+    replica_reads,
+    replica_set,
+)
+
+from ..models import Book
+
+
+def replica_settings(**overrides):
+    return override_settings(READ_REPLICAS={**settings.READ_REPLICAS, "ALIASES": ["replica1", "replica2"], **overrides})
+
+
+@replica_settings()
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        replica_set.reset()
+        self.addCleanup(replica_set.reset)
+        self.healthy = {"replica1": True, "replica2": True}
+        self.replayed = {"replica1": None, "replica2": None}
+        self.positions = {"default": 0x700, "replica1": 0, "replica2": 0}
+        patcher = mock.patch.object(
+            replica_set, "check", side_effect=lambda alias: (self.healthy[alias], self.replayed[alias])
+        )
+        self.check = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("library_project.replicas.wal_position", side_effect=lambda alias: self.positions[alias])
+        self.wal_position = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+
+    def read(self):
+        return self.router.db_for_read(Book)
+
+    def test_reads_outside_a_replica_block_use_the_primary(self):
+        self.assertEqual(self.read(), "default")
+        self.check.assert_not_called()
+
+    def test_blocks_take_turns_and_keep_their_replica(self):
+        aliases = []
+        for _ in range(4):
+            with replica_reads():
+                alias = self.read()
+                self.assertEqual(self.read(), alias)
+                aliases.append(alias)
+        self.assertEqual(sorted(aliases), ["replica1", "replica1", "replica2", "replica2"])
+
+    def test_unhealthy_replicas_are_skipped_until_checked_again(self):
+        self.healthy["replica1"] = False
+        for _ in range(3):
+            with replica_reads():
+                self.assertEqual(self.read(), "replica2")
+        self.assertEqual(self.check.call_count, 2)
+
+        self.healthy["replica2"] = False
+        with replica_reads():
+            self.assertEqual(self.read(), "replica2")
+
+        later = time.monotonic() + settings.READ_REPLICAS["HEALTH_CHECK_INTERVAL"]
+        with mock.patch("library_project.replicas.time.monotonic", return_value=later), replica_reads():
+            self.assertEqual(self.read(), "default")
+
+    def test_writes_go_to_the_primary_and_replicas_are_not_migrated(self):
+        self.assertEqual(self.router.db_for_write(Book), "default")
+        self.assertIs(self.router.allow_migrate("replica1", "catalog"), False)
+        self.assertIsNone(self.router.allow_migrate("default", "catalog"))
+
+    def test_only_replicas_that_replayed_the_token_serve_it(self):
+        self.replayed = {"replica1": 0x500, "replica2": 0x300}
+        self.positions.update(replica1=0x500, replica2=0x300)
+        for _ in range(2):
+            self.assertEqual(replica_set.choose(min_lsn=0x400), "replica1")
+        # Only the replica whose cached position is behind was asked again.
+        self.assertEqual(self.wal_position.call_count, 1)
+
+        self.assertIsNone(replica_set.choose(min_lsn=0x600))
+        self.positions["replica2"] = 0x600
+        self.assertEqual(replica_set.choose(min_lsn=0x600), "replica2")
+
+    def test_responses_carry_the_position_the_client_has_seen(self):
+        self.replayed = {"replica1": 0x500, "replica2": 0x300}
+        self.positions.update(replica1=0x500, replica2=0x300)
+
+        def view(request):
+            with replica_reads():
+                before = self.read()
+                if request.method == "POST":
+                    self.router.db_for_write(Book)
+                return HttpResponse(f"{before} {self.read()}")
+
+        middleware = ReplicaTokenMiddleware(view)
+        response = middleware(RequestFactory().post("/"))
+        self.assertEqual(response.content.decode(), "replica1 default")
+        self.assertEqual(response[LSN_HEADER], "0/700")
+        self.assertEqual(response.cookies[LSN_COOKIE].value, "0/700")
+
+        # The primary's position until a replica has replayed it.
+        response = middleware(RequestFactory().get("/", headers={LSN_HEADER: "0/700"}))
+        self.assertEqual(response.content.decode(), "default default")
+        self.assertEqual(response[LSN_HEADER], "0/700")
+
+        self.positions["replica2"] = 0x800
+        request = RequestFactory().get("/")
+        request.COOKIES[LSN_COOKIE] = "0/700"
+        response = middleware(request)
+        self.assertEqual(response.content.decode(), "replica2 replica2")
+        self.assertEqual(response[LSN_HEADER], "0/800")
+
+        response = middleware(RequestFactory().get("/", headers={LSN_HEADER: "garbage"}))
+        self.assertEqual(response.content.decode(), "replica2 replica2")
+        self.assertEqual(response[LSN_HEADER], "0/800")
+
+    def test_lsn_text_round_trips(self):
+        self.assertEqual(parse_lsn("16/B374D848"), (0x16 << 32) + 0xB374D848)
+        self.assertEqual(format_lsn(parse_lsn("16/B374D848")), "16/B374D848")
+        self.assertIsNone(parse_lsn("16-B374D848"))
+        self.assertIsNone(parse_lsn(None))
+
+
+@skipUnless("replica1" in settings.DATABASES, "Set POSTGRES_REPLICA_HOSTS to test against a replica.")
+class ReplicaReadsTests(TransactionTestCase):
+    # replica1 mirrors the test database, so only committed rows are visible through it. The
+    # runner sets up the databases of skipped tests too, hence the intersection.
+    databases = {"default", "replica1"} & set(settings.DATABASES)
+
+    def setUp(self):
+        replica_set.reset()
+        self.addCleanup(replica_set.reset)
+        User = get_user_model()
+        self.user = User.objects.create_user(library_card_number="270000", first_name="Jan", last_name="Kowalski")
+        self.admin = User.objects.create_superuser(library_card_number="270001", password="testpass123")
+        Book.objects.create(serial_number="270000", title="Lalka", author="Boleslaw Prus")
+
+    def queries(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica1"]) as replica:
+                response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_book_list_is_read_from_the_replica_and_reflects_the_clients_writes(self):
+        response, primary, replica = self.queries("get", reverse("book-list"), {"page_size": 10})
+        self.assertEqual(response.json()["results"][0]["serial_number"], "270000")
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        url = reverse("book-detail", args=["270000"])
+        response = self.client.patch(url, {"is_borrowed": True, "borrowed_by": "270000"}, "application/json")
+        token = response[LSN_HEADER]
+
+        # Without the cookie, as API clients usually send just the header.
+        self.client.cookies.clear()
+        response = self.client.get(reverse("book-list"), {"page_size": 10}, headers={LSN_HEADER: token})
+        self.assertTrue(response.json()["results"][0]["is_borrowed"])
+        self.assertGreaterEqual(parse_lsn(response[LSN_HEADER]), parse_lsn(token))
+
+    def test_admin_changelist_is_read_from_the_replica(self):
+        self.client.force_login(self.admin)
+        response, _, replica = self.queries("get", reverse("admin:catalog_book_changelist"))
+        self.assertContains(response, "Lalka")
+        self.assertGreater(replica, 0)
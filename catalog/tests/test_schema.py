@@ -0,0 +1,91 @@
+import json
+import tempfile
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from library_project.schema import generate_schema, schema_cache, write_artifact
+
+
+class CachedSchemaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.schema_file = Path(directory.name) / "schema.json"
+        settings_override = override_settings(
+            API_DOCUMENTATION={**settings.API_DOCUMENTATION, "SCHEMA_FILE": self.schema_file}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def test_stored_schema_is_served_without_introspection(self):
+        call_command("generate_openapi_schema", stdout=StringIO())
+        stdout = StringIO()
+        call_command("generate_openapi_schema", stdout=stdout)
+        self.assertIn("up to date", stdout.getvalue())
+
+        with mock.patch("library_project.schema.generate_schema") as generate:
+            response = self.client.get(reverse("api-schema"), {"format": "openapi-json"})
+            self.client.get(reverse("api-schema"))
+        generate.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(generate_schema())))
+        self.assertIn("/api/books/", json.loads(response.content)["paths"])
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.API_DOCUMENTATION['SCHEMA_MAX_AGE']}")
+
+        not_modified = self.client.get(
+            reverse("api-schema"), HTTP_ACCEPT="application/vnd.oai.openapi+json", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        yaml_response = self.client.get(reverse("api-schema"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(yaml_response.status_code, 200)
+        self.assertTrue(yaml_response["Content-Type"].startswith("application/vnd.oai.openapi"))
+
+    def test_formats_are_negotiated_like_drf_schema_views(self):
+        browser = self.client.get(reverse("api-schema"), HTTP_ACCEPT="text/html,application/xhtml+xml,*/*;q=0.8")
+        self.assertEqual(browser.status_code, 200)
+        self.assertTrue(browser["Content-Type"].startswith("text/html"))
+        self.assertIn("Accept", browser["Vary"])
+
+        self.assertEqual(self.client.get(reverse("api-schema"), {"format": "xml"}).status_code, 404)
+        yaml_response = self.client.get(reverse("api-schema"), {"format": "openapi"})
+        self.assertTrue(yaml_response["Content-Type"].startswith("application/vnd.oai.openapi"))
+        self.assertIn("Accept", yaml_response["Vary"])
+
+    def test_schema_of_other_code_is_regenerated(self):
+        self.schema_file.write_text(json.dumps({"fingerprint": "old", "schema": {"openapi": "3.0.2", "paths": {}}}))
+
+        response = self.client.get(reverse("api-schema"), {"format": "openapi-json"})
+
+        self.assertIn("/api/books/", json.loads(response.content)["paths"])
+        self.assertNotEqual(json.loads(self.schema_file.read_text())["fingerprint"], "old")
+
+    def test_concurrent_writers_do_not_share_a_temporary_file(self):
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def write(fingerprint):
+            barrier.wait()
+            try:
+                write_artifact(self.schema_file, fingerprint, {"paths": {}})
+            except OSError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=write, args=[f"code-{index}"]) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(list(self.schema_file.parent.iterdir()), [self.schema_file])
+        self.assertTrue(json.loads(self.schema_file.read_text())["fingerprint"].startswith("code-"))
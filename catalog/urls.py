@@ -1,8 +1,22 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import BookViewSet
+from .async_views import AsyncBookDetailView, AsyncBookExportView, AsyncBookListView
+from .views import (
+    BookViewSet,
+    BorrowerLoanListView,
+    CirculationStatsView,
+    LibraryUserViewSet,
+)
 
 router = DefaultRouter()
 router.register("books", BookViewSet, basename="book")
+router.register("users", LibraryUserViewSet, basename="user")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("stats/circulation/", CirculationStatsView.as_view(), name="circulation-stats"),
+    path("users/<str:library_card_number>/loans/", BorrowerLoanListView.as_view(), name="user-loans"),
+    path("async/books/", AsyncBookListView.as_view(), name="async-book-list"),
+    path("async/books/export/", AsyncBookExportView.as_view(), name="async-book-export"),
+    path("async/books/<str:serial_number>/", AsyncBookDetailView.as_view(), name="async-book-detail"),
+]
@@ -1,7 +1,70 @@
-from rest_framework import mixins, viewsets
+import re
 
-from .models import Book
-from .serializers import BookSerializer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from rest_framework import generics, mixins, serializers, status, views, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from library_project.profiling import measure
+from library_project.replicas import replica_reads
+
+from .cache import book_cache
+from .exceptions import PreconditionFailed
+from .export import ASYNC_EXPORT_FORMATS, EXPORT_FORMATS
+from .filters import BookFilterBackend
+from .importing import IMPORT_FORMATS, BookImporter
+from .models import (
+    SEARCH_CONFIG,
+    AuthorCirculation,
+    Book,
+    BorrowerCirculation,
+    CatalogVersion,
+    CirculationCounter,
+    Loan,
+)
+from .pagination import (
+    BookCursorPagination,
+    BookSearchPagination,
+    LoanCursorPagination,
+    UserCursorPagination,
+)
+from .renderers import BookJSONRenderer
+from .serializers import (
+    BOOK_ROW_COLUMNS,
+    AuthorCirculationSerializer,
+    BookSearchResultSerializer,
+    BookSerializer,
+    BorrowerCirculationSerializer,
+    BorrowerSerializer,
+    BorrowOperationSerializer,
+    LibraryUserSerializer,
+    LoanSerializer,
+    render_book_row,
+    render_book_rows,
+    requested_book_fields,
+)
+
+IF_MATCH_BOOK = re.compile(r'(?:W/)?"book-(\d+)"')
+
+
+def if_match_version(request):
+    """The book version named by the request's ``If-Match`` header, ``None`` without one (or ``*``)."""
+    header = request.headers.get("If-Match", "").strip()
+    if header in ("", "*"):
+        return None
+    match = IF_MATCH_BOOK.fullmatch(header)
+    if match is None:
+        raise PreconditionFailed
+    return int(match[1])
 
 
 class BookViewSet(
@@ -14,7 +77,264 @@ class BookViewSet(
     # Normally, ModelViewSet could be used here since it combines all these mixins,
     # but it also includes the Retrieve action (GET for a single object),
     # which was not mentioned in the task description.
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related("borrowed_by").defer("search_vector")
     http_method_names = ["get", "post", "delete", "patch"]
     serializer_class = BookSerializer
+    pagination_class = BookCursorPagination
+    filter_backends = [BookFilterBackend]
     lookup_field = "serial_number"
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action != "list":
+            return renderers
+        # Book lists carry no floats, which BookJSONRenderer could format differently.
+        return [BookJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
+
+    def list(self, request, *args, **kwargs):
+        # The version and the books come from the same replica, so the ETag matches the body.
+        with replica_reads():
+            return self._list(request, *args, **kwargs)
+
+    def _list(self, request, *args, **kwargs):
+        fields = requested_book_fields(request.query_params)
+        # The validator is read before the books, so a write committed in between can only
+        # produce a spurious refetch, never a stale body stored under a newer ETag. There is no
+        # Last-Modified: one-second dates cannot tell apart writes within the same second.
+        version = CatalogVersion.current()
+        fieldset = "" if fields is None else f"-{'.'.join(fields)}"
+        etag = f'"books-{version}-{request.accepted_renderer.format}{fieldset}"'
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        if fields is not None:
+            response = self._list_sparse(request, fields)
+        elif book_cache.enabled:
+            response = self._list_cached(request)
+        elif settings.BOOK_FAST_SERIALIZATION:
+            response = self._list_rows(request)
+        else:
+            response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+    def _list_cached(self, request):
+        # Only the keys are read from the books table; representations come from the cache and
+        # just the misses are loaded and serialized.
+        queryset = self.filter_queryset(self.get_queryset()).values("pk", "version", "serial_number")
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with measure("serialize"):
+                data = book_cache.render(page)
+            return self.get_paginated_response(data)
+        with measure("serialize"):
+            data = book_cache.render(list(queryset))
+        return Response(data)
+
+    def _list_rows(self, request):
+        # Named rows, because the cursor pagination reads serial_number off the last one.
+        queryset = self.filter_queryset(Book.objects.all()).values_list(*BOOK_ROW_COLUMNS, named=True)
+        page = self.paginate_queryset(queryset)
+        with measure("serialize"):
+            data = [render_book_row(row) for row in (page if page is not None else queryset)]
+        return self.get_paginated_response(data) if page is not None else Response(data)
+
+    def _list_sparse(self, request, fields):
+        # Only the selected columns are read. Without the borrower the rows are plain values()
+        # dicts rendered directly; the cursor pagination needs serial_number either way.
+        if "borrowed_by" in fields:
+            borrower_fields = [f"borrowed_by__{name}" for name in BorrowerSerializer.Meta.fields]
+            queryset = self.filter_queryset(self.get_queryset()).only("serial_number", *fields, *borrower_fields)
+
+            def render(books):
+                return BookSerializer(books, many=True, fields=fields).data
+
+        else:
+            columns = dict.fromkeys(["serial_number", *fields])
+            queryset = self.filter_queryset(Book.objects.all()).values(*columns)
+
+            def render(rows):
+                return render_book_rows(rows, fields)
+
+        page = self.paginate_queryset(queryset)
+        with measure("serialize"):
+            data = render(page if page is not None else list(queryset))
+        return self.get_paginated_response(data) if page is not None else Response(data)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        # The new version, for the If-Match of the client's next change.
+        response["ETag"] = self.updated_book.etag
+        return response
+
+    def perform_update(self, serializer):
+        self.updated_book = serializer.save(expected_version=if_match_version(self.request))
+
+    @action(detail=False, methods=["get"], url_path="cache-stats", pagination_class=None)
+    def cache_stats(self, request):
+        """Hit/miss counters of the book representation cache in this worker process."""
+        return Response(book_cache.stats())
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def export(self, request):
+        """Stream the whole catalogue as NDJSON (default) or CSV (``?output=csv``)."""
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORT_FORMATS:
+            raise serializers.ValidationError({"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+
+        # Django's ASGI handler would read a synchronous iterator into a list before sending it.
+        formats = ASYNC_EXPORT_FORMATS if isinstance(request._request, ASGIRequest) else EXPORT_FORMATS
+        content_type, stream = formats[output]
+        response = StreamingHttpResponse(
+            stream(self.filter_queryset(self.get_queryset()), settings.BOOK_EXPORT_CHUNK_SIZE),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="books.{output}"'
+        return response
+
+    @action(
+        detail=False,
+        methods=["get"],
+        serializer_class=BookSearchResultSerializer,
+        pagination_class=BookSearchPagination,
+    )
+    def search(self, request):
+        """Full-text search over titles and authors (``?q=``), ranked by relevance.
+
+        ``q`` uses web search syntax (quoted phrases, ``or``, ``-excluded``); the list filters
+        can be combined with it.
+        """
+        terms = request.query_params.get("q", "").strip()
+        if not terms:
+            raise serializers.ValidationError({"q": "This query parameter is required."})
+
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type="websearch")
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "serial_number")
+        )
+        with replica_reads():
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=True, methods=["get"], serializer_class=LoanSerializer, pagination_class=LoanCursorPagination)
+    def loans(self, request, serial_number=None):
+        """Loan history of the book, newest first."""
+        book = self.get_object()
+        queryset = Loan.objects.filter(book=book)
+        page = self.paginate_queryset(queryset)
+        for loan in page:
+            loan.book = book
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=["post"], url_path="bulk-borrow", serializer_class=BorrowOperationSerializer)
+    def bulk_borrow(self, request):
+        """Borrow or return a batch of books in one transaction, reporting the outcome per item."""
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.BOOK_BULK_BORROW_MAX_OPERATIONS,
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response({"results": serializer.save()})
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=[JSONParser, MultiPartParser],
+        pagination_class=None,
+    )
+    def import_books(self, request):
+        """Bulk-create books from an uploaded CSV/JSON ``file`` or a JSON array body.
+
+        Uploads are parsed as a stream and inserted in batches; rejected rows are listed in the
+        response. The upload format follows the file extension unless ``?input=csv|json`` is given.
+        """
+        upload = request.FILES.get("file")
+        if upload is not None:
+            input_format = request.query_params.get("input") or upload.name.rpartition(".")[2].lower()
+            if input_format not in IMPORT_FORMATS:
+                raise serializers.ValidationError({"input": f"Choose one of: {', '.join(IMPORT_FORMATS)}."})
+            rows = IMPORT_FORMATS[input_format](upload)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            raise serializers.ValidationError({"file": "Upload a CSV or JSON file, or send a JSON array of books."})
+
+        importer = BookImporter()
+        try:
+            report = importer.run(rows)
+        except (ValueError, UnicodeDecodeError) as exc:
+            # The batches before the error are imported; the report says how far it got.
+            return Response({"file": [str(exc)], **importer.report()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+class LibraryUserViewSet(viewsets.ReadOnlyModelViewSet):
+    """Card holders with the books they currently have out.
+
+    The borrowed books of a whole page come from a single prefetch query (an index scan of
+    ``book_borrower_borrowed_at_idx``), so a page costs two queries whatever its size.
+    """
+
+    queryset = get_user_model().objects.prefetch_related(
+        Prefetch(
+            "borrowed_books",
+            queryset=Book.objects.filter(is_borrowed=True)
+            .only("serial_number", "title", "author", "borrowed_at", "borrowed_by")
+            .order_by("borrowed_at", "pk"),
+            to_attr="current_books",
+        )
+    )
+    serializer_class = LibraryUserSerializer
+    pagination_class = UserCursorPagination
+    lookup_field = "library_card_number"
+
+
+class BorrowerLoanListView(generics.ListAPIView):
+    """Loan history of a library card, newest first."""
+
+    serializer_class = LoanSerializer
+    pagination_class = LoanCursorPagination
+
+    def get_queryset(self):
+        borrower = get_object_or_404(get_user_model(), pk=self.kwargs["library_card_number"])
+        return Loan.objects.filter(borrower=borrower).select_related("book")
+
+
+class CirculationStatsView(views.APIView):
+    """Borrowed and available book counts, most borrowed authors and most active borrowers.
+
+    Everything is read from the summary tables kept current by database triggers, so the cost
+    does not depend on the size of the catalogue. ``?limit=`` (1-100, default 10) sizes the
+    rankings.
+    """
+
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params["limit"]), 1), self.max_limit)
+        except (KeyError, ValueError):
+            limit = 10
+
+        totals = CirculationCounter.totals()
+        authors = AuthorCirculation.objects.filter(loans__gt=0).order_by("-loans", "author")[:limit]
+        borrowers = (
+            BorrowerCirculation.objects.filter(loans__gt=0).select_related("borrower").order_by("-loans", "borrower")
+        )[:limit]
+        return Response(
+            {
+                "books": totals["books"],
+                "borrowed": totals["borrowed"],
+                "available": totals["books"] - totals["borrowed"],
+                "top_authors": AuthorCirculationSerializer(authors, many=True).data,
+                "top_borrowers": BorrowerCirculationSerializer(borrowers, many=True).data,
+            }
+        )
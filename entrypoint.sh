@@ -32,4 +32,6 @@ print(f"PostgreSQL at {host}:{port} is available")
 PY
 
 python manage.py migrate --noinput
+python manage.py loan_partitions
+python manage.py generate_openapi_schema
 exec "$@"
@@ -0,0 +1,49 @@
+"""Gunicorn settings for production serving.
+
+WSGI with threaded workers (default)::
+
+    gunicorn -c gunicorn.conf.py library_project.wsgi:application
+
+ASGI with uvicorn workers (opt-in). The synchronous DRF views then run one at a time per worker
+through ``sync_to_async``, so this only pays off for clients of the ``/api/async/`` views::
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py library_project.asgi:application
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Only used by the gthread worker class.
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically to cap the effect of slow memory growth.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+# An empty value disables the access log.
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+
+# Workers write their metrics here so /metrics can report the whole server; set in the master so
+# every worker inherits it, and emptied on start so counters of a previous run are not added in.
+metrics_dir = os.environ.setdefault("METRICS_MULTIPROCESS_DIR", os.path.join(tempfile.gettempdir(), "library-metrics"))
+
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Exited workers' snapshots go into one aggregate file, so recycled workers leave none behind.
+    from library_project.metrics import fold_process_snapshot
+
+    fold_process_snapshot(metrics_dir, worker.pid)
@@ -0,0 +1,49 @@
+"""Admin changelist pagination for tables too large to ``COUNT(*)`` on every page.
+
+``EstimatedCountPaginator`` counts exactly up to ``ADMIN_EXACT_COUNT_LIMIT`` rows. Past that the
+count comes from PostgreSQL statistics: ``pg_class.reltuples`` for the whole table, the planner's
+row estimate (``EXPLAIN``) for a filtered or searched list. Large totals are approximate, which
+is what the page links need; the rows on a page are always exact.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_table_rows(queryset):
+    """``reltuples`` of the queryset's table, ``None`` while the table has never been analysed."""
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+        (rows,) = cursor.fetchone()
+    return int(rows) if rows >= 0 else None
+
+
+def planned_rows(queryset):
+    """The planner's estimate of the rows ``queryset`` returns."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        (plan,) = cursor.fetchone()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_table_rows(queryset)
+            if estimate is not None and estimate >= limit:
+                return estimate
+        # Reads at most ``limit`` rows, so small results (most searches) stay exact.
+        counted = queryset.order_by()[:limit].count()
+        if counted < limit:
+            return counted
+        return max(planned_rows(queryset), limit)
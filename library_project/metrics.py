@@ -0,0 +1,321 @@
+"""In-process metrics with a Prometheus text exposition endpoint.
+
+Counters and histograms live in plain dictionaries of the worker process, so recording a sample
+is a dictionary update under a lock. With several worker processes each one also writes a
+snapshot of its values to ``METRICS["MULTIPROCESS_DIR"]`` (at most every ``FLUSH_INTERVAL``
+seconds, after a request, and on exit); ``/metrics`` adds up the snapshots of all workers, the
+serving one read live. When a worker exits, gunicorn's ``child_exit`` hook folds its snapshot
+into ``aggregate.json`` with ``fold_process_snapshot`` and removes it, so counters never go
+backwards and recycled workers leave no files behind.
+
+``/metrics`` answers bearers of ``METRICS["TOKEN"]`` and logged-in staff users only.
+"""
+
+import atexit
+import bisect
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+
+class Histogram(Metric):
+    """Samples per bucket, plus their sum and count, in ``[bucket..., +Inf, sum, count]`` form."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _copy(self, value):
+        return list(value)
+
+    @staticmethod
+    def merge(value, other):
+        return [left + right for left, right in zip(value, other)]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._flushed_at = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered.")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    @property
+    def directory(self):
+        directory = settings.METRICS["MULTIPROCESS_DIR"]
+        return Path(directory) if directory else None
+
+    def flush(self):
+        """Write this process's values for the other workers to read."""
+        if self.directory is None:
+            return
+        data = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.snapshot().items()
+        }
+        if not any(data.values()):
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_snapshot(self.directory / f"{os.getpid()}.json", data)
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if now - self._flushed_at < settings.METRICS["FLUSH_INTERVAL"] or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._flushed_at = now
+            self.flush()
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Values of every worker process, added up per metric and label set."""
+        merged = self.snapshot()
+        if self.directory is None:
+            return merged
+        own_file = f"{os.getpid()}.json"
+        # Shared with other readers; keeps fold_process_snapshot from moving a snapshot meanwhile.
+        with _directory_lock(self.directory, fcntl.LOCK_SH):
+            snapshots = [_read_snapshot(path) for path in self.directory.glob("*.json") if path.name != own_file]
+        for data in snapshots:
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged[name]
+                for labels, value in samples:
+                    labels = tuple(labels)
+                    values[labels] = metric.merge(values[labels], value) if labels in values else value
+        return merged
+
+    def render(self):
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(values.items()):
+                label_pairs = list(zip(metric.labelnames, labels))
+                if metric.type == "counter":
+                    lines.append(f"{name}{_format_labels(label_pairs)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value):
+                    cumulative += count
+                    bucket_labels = _format_labels(label_pairs + [("le", _format_value(bound))])
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(label_pairs)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(label_pairs)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_snapshot(path, data):
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(json.dumps(data))
+    os.replace(temporary_path, path)
+
+
+@contextmanager
+def _directory_lock(directory, operation):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, operation)
+        yield
+
+
+def fold_process_snapshot(directory, pid):
+    """Add the snapshot of the exited process ``pid`` to ``aggregate.json`` and remove its file.
+
+    Counter values are added and histogram values added per bucket, like ``Registry.collect``
+    does, but without the metric definitions: the gunicorn master calls this.
+    """
+    directory = Path(directory)
+    path = directory / f"{pid}.json"
+    if not path.exists():
+        return
+    aggregate_path = directory / "aggregate.json"
+    with _directory_lock(directory, fcntl.LOCK_EX):
+        aggregate = _read_snapshot(aggregate_path)
+        for name, samples in _read_snapshot(path).items():
+            values = {tuple(labels): value for labels, value in aggregate.get(name, [])}
+            for labels, value in samples:
+                labels = tuple(labels)
+                if labels not in values:
+                    values[labels] = value
+                elif isinstance(value, list):
+                    values[labels] = Histogram.merge(values[labels], value)
+                else:
+                    values[labels] = Counter.merge(values[labels], value)
+            aggregate[name] = [[list(labels), value] for labels, value in values.items()]
+        _write_snapshot(aggregate_path, aggregate)
+        path.unlink()
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = Histogram(
+    "library_http_request_duration_seconds",
+    "Time spent handling a request, by view, action, method and status code.",
+    ["view", "action", "method", "status"],
+)
+DB_QUERY_DURATION = Histogram(
+    "library_db_query_duration_seconds",
+    "Time spent executing SQL statements, by database alias.",
+    ["alias"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def _observe_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, context["connection"].alias)
+
+
+def _install_query_hook(connection, **kwargs):
+    # Wrappers survive reconnects, hence the membership check.
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe_query)
+
+
+if settings.METRICS["ENABLED"]:
+    connection_created.connect(_install_query_hook, dispatch_uid="metrics_query_hook")
+    atexit.register(REGISTRY.flush)
+
+
+def _endpoint(request):
+    match = request.resolver_match
+    if match is None:
+        return "unmatched", ""
+    # DRF viewsets map HTTP methods to actions on the view function.
+    actions = getattr(match.func, "actions", None) or {}
+    return match.url_name or match.view_name, actions.get(request.method.lower(), "")
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    async def _acall(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, duration):
+        view, action = _endpoint(request)
+        REQUEST_DURATION.observe(duration, view, action, request.method, str(response.status_code))
+        REGISTRY.maybe_flush()
+
+
+def metrics_view(request):
+    token = settings.METRICS["TOKEN"]
+    presented = request.headers.get("Authorization", "").encode()
+    if not (token and hmac.compare_digest(presented, f"Bearer {token}".encode())) and not request.user.is_staff:
+        response = HttpResponse("Authentication required.\n", status=401, content_type="text/plain")
+        response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,125 @@
+"""PostgreSQL backend that borrows connections from a per-process psycopg2 pool.
+
+Closing the Django connection (at the end of every request with ``CONN_MAX_AGE = 0``) returns the
+psycopg2 connection to the pool instead of disconnecting, so requests skip the TCP handshake,
+authentication and backend start-up. Enabled with ``POSTGRES_POOL=true``; sized by the ``POOL``
+entry of the database settings.
+
+Connections are validated with ``SELECT 1`` when checked out, and discarded if the server has
+dropped them (restart, idle timeout, ``pg_terminate_backend``). When all ``MAX_SIZE`` connections
+are in use, a checkout waits up to ``TIMEOUT`` seconds and then raises ``PoolTimeout``, which
+``PoolTimeoutMiddleware`` answers with 503 Service Unavailable.
+"""
+
+import os
+import threading
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions, pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(pool.PoolError, psycopg2.OperationalError):
+    """No pooled connection became free in time (Django raises it as ``OperationalError``)."""
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """``ThreadedConnectionPool`` whose ``getconn`` waits up to ``timeout`` seconds for a free connection."""
+
+    def __init__(self, minconn, maxconn, *args, timeout, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection became free within {self.timeout} seconds.")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+def is_usable(connection):
+    if connection.closed or connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        # Without autocommit the probe opened a transaction; Django expects an idle connection.
+        connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseCreation(base.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database "in use".
+        self.connection.close_connection_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_pool(self, conn_params):
+        # Keyed by process (pools must not be shared across fork()) and by connection parameters
+        # (the test runner switches NAME to the test database).
+        key = (os.getpid(), self.alias, tuple(sorted(conn_params.items())))
+        with _pools_lock:
+            if key not in _pools:
+                pool_settings = self.settings_dict.get("POOL", {})
+                _pools[key] = BlockingConnectionPool(
+                    pool_settings.get("MIN_SIZE", 1),
+                    pool_settings.get("MAX_SIZE", 10),
+                    timeout=pool_settings.get("TIMEOUT", 5),
+                    **conn_params,
+                )
+            return _pools[key]
+
+    def close_connection_pools(self):
+        with _pools_lock:
+            for key in [key for key in _pools if key[:2] == (os.getpid(), self.alias)]:
+                _pools.pop(key).closeall()
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.get_connection_pool(conn_params)
+        connection = connection_pool.getconn()
+        # Each discarded connection leaves the pool, which eventually opens a new one.
+        for _ in range(connection_pool.maxconn):
+            if is_usable(connection):
+                break
+            connection_pool.putconn(connection, close=True)
+            connection = connection_pool.getconn()
+        self._pool = connection_pool
+
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # A connection closed inside an atomic block stays referenced by Django until the
+        # rollback, so it is discarded rather than handed to another thread.
+        broken = self.in_atomic_block or bool(self.connection.closed)
+        if not broken and self.connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                self.connection.rollback()
+            except psycopg2.Error:
+                broken = True
+        with self.wrap_database_errors:
+            self._pool.putconn(self.connection, close=broken)
@@ -0,0 +1,23 @@
+"""Answer requests that found the connection pool exhausted with 503 instead of 500."""
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .base import PoolTimeout
+
+
+class PoolTimeoutMiddleware(MiddlewareMixin):
+    def __init__(self, get_response):
+        if not any(database["ENGINE"] == __package__ for database in settings.DATABASES.values()):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_exception(self, request, exception):
+        # Django raises the driver's error as its own OperationalError, chained to it.
+        if not isinstance(exception, PoolTimeout) and not isinstance(exception.__cause__, PoolTimeout):
+            return None
+        response = JsonResponse({"detail": "The service is busy; try again shortly."}, status=503)
+        response["Retry-After"] = "1"
+        return response
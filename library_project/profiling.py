@@ -0,0 +1,168 @@
+"""Per-request timing of database, serialization and rendering work.
+
+``RequestProfilingMiddleware`` is configured by the ``REQUEST_PROFILING`` setting. When it is
+disabled the middleware removes itself from the chain at start-up; what remains is one context
+variable lookup per ``measure`` block and per query.
+For sampled requests it adds a ``Server-Timing`` header and logs one JSON record to the
+``library_project.profiling`` logger. Requests slower than ``SLOW_REQUEST_MS`` are logged at
+warning level together with the SQL they ran.
+
+Code that should show up as its own phase wraps the work in ``measure(<name>)``.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, max_captured_queries):
+        self.max_captured_queries = max_captured_queries
+        self.query_count = 0
+        self.db_time = 0.0
+        self.queries = []
+        self.phases = {}
+        self.active_phases = set()
+
+    def add_query(self, sql, duration):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.queries) < self.max_captured_queries:
+            self.queries.append((sql, duration))
+
+    def add_phase(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+
+@contextmanager
+def measure(name):
+    """Add the time spent in the block to phase ``name`` of the current request's profile."""
+    profile = _current_profile.get()
+    if profile is None or name in profile.active_phases:
+        # Nested blocks of the same phase are already covered by the outer one.
+        yield
+        return
+    profile.active_phases.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.active_phases.discard(name)
+        profile.add_phase(name, time.perf_counter() - started)
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+def _install_query_hook(connection, **kwargs):
+    # Connections are per thread, so the hook is attached as each one opens rather than around a
+    # request; that also covers the sync_to_async threads behind async views, which run with the
+    # request's context. Wrappers survive reconnects, hence the membership check.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_hook, dispatch_uid="request_profiling_query_hook")
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = settings.REQUEST_PROFILING
+        if not config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config["SAMPLE_RATE"]
+        self.slow_request_time = config["SLOW_REQUEST_MS"] / 1000
+        self.max_captured_queries = config["MAX_CAPTURED_QUERIES"]
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile(self.max_captured_queries)
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        self._report(request, response, profile, time.perf_counter() - started)
+        return response
+
+    async def _acall(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        profile = RequestProfile(self.max_captured_queries)
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        self._report(request, response, profile, time.perf_counter() - started)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler after the view returns; time that from here
+        # to the post-render callback.
+        profile = _current_profile.get()
+        if profile is not None:
+            started = time.perf_counter()
+
+            def record_render(rendered_response):
+                profile.add_phase("render", time.perf_counter() - started)
+
+            response.add_post_render_callback(record_render)
+        return response
+
+    def _report(self, request, response, profile, total_time):
+        timings = [f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries"']
+        timings += [f"{name};dur={duration * 1000:.1f}" for name, duration in profile.phases.items()]
+        timings.append(f"total;dur={total_time * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(timings)
+
+        slow = total_time >= self.slow_request_time
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total_time * 1000, 1),
+            "db_ms": round(profile.db_time * 1000, 1),
+            "queries": profile.query_count,
+            **{f"{name}_ms": round(duration * 1000, 1) for name, duration in profile.phases.items()},
+        }
+        if slow:
+            record["sql"] = [{"sql": sql, "ms": round(duration * 1000, 1)} for sql, duration in profile.queries]
+        logger.log(level, json.dumps(record))
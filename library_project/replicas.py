@@ -0,0 +1,264 @@
+"""Routing of catalogue reads to PostgreSQL streaming replicas.
+
+Replicas are configured with ``POSTGRES_REPLICA_HOSTS`` (aliases ``replica1``, ``replica2``...).
+Reads only go to a replica inside ``replica_reads()``, which the catalogue list/search views
+and the admin changelists opt into; everything else, writes included, uses ``default``.
+
+* A ``replica_reads()`` block picks one replica, round-robin, skipping replicas whose last
+  health check (at most every ``HEALTH_CHECK_INTERVAL`` seconds per process) failed or showed
+  more than ``MAX_LAG_SECONDS`` of replication lag. Without a suitable replica it reads from
+  ``default``.
+* Read-your-writes and monotonic reads: responses carry the WAL position (LSN) the client has
+  seen, in the ``X-Read-After-LSN`` header and the ``read_after_lsn`` cookie: the primary's
+  after a write, the position of the server read from otherwise. A request sending it back
+  (header or cookie) is only served by a replica that has replayed that far, else by
+  ``default``. Within a request, reads after a write use ``default``.
+"""
+
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+LSN_HEADER = "X-Read-After-LSN"
+LSN_COOKIE = "read_after_lsn"
+LSN_TEXT = re.compile(r"([0-9A-Fa-f]{1,8})/([0-9A-Fa-f]{1,8})")
+
+# The WAL position a server's reads reflect: replayed on a standby, inserted on the primary.
+WAL_POSITION = """
+SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_insert_lsn() END
+"""
+
+# Lag is zero when everything received has been replayed: an idle primary sends no new
+# transactions, so the replay timestamp alone would make an up-to-date replica look stale.
+REPLICATION_STATUS = f"""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END, ({WAL_POSITION.strip()})
+"""
+
+
+def parse_lsn(text):
+    """The ``X/Y`` text form of a PostgreSQL LSN as an integer, ``None`` if it is not one."""
+    match = LSN_TEXT.fullmatch(text or "")
+    return (int(match[1], 16) << 32) + int(match[2], 16) if match else None
+
+
+def format_lsn(lsn):
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def wal_position(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(WAL_POSITION)
+        return parse_lsn(cursor.fetchone()[0])
+
+
+class RoutingState:
+    """Per request: the LSN its reads must reflect, whether it wrote and where it read from."""
+
+    def __init__(self, min_lsn=None):
+        self.min_lsn = min_lsn
+        self.wrote = False
+        self.read_from = set()
+
+
+class ReplicaScope:
+    def __init__(self):
+        self.alias = None
+
+
+_request_state = ContextVar("replica_routing_state", default=None)
+_replica_scope = ContextVar("replica_scope", default=None)
+
+
+class ReplicaSet:
+    """Round-robin choice among the healthy replicas, with their status cached per process."""
+
+    def __init__(self):
+        self._turns = itertools.count()
+        # alias -> (healthy, replayed LSN, monotonic time of the check)
+        self._status = {}
+        self._lock = threading.Lock()
+
+    @property
+    def aliases(self):
+        return settings.READ_REPLICAS["ALIASES"]
+
+    def choose(self, min_lsn=None):
+        aliases = self.aliases
+        if not aliases:
+            return None
+        start = next(self._turns)
+        for offset in range(len(aliases)):
+            alias = aliases[(start + offset) % len(aliases)]
+            if self.is_healthy(alias) and self.has_replayed(alias, min_lsn):
+                return alias
+        return None
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            healthy, replayed, checked_at = self._status.get(alias, (None, None, None))
+        if checked_at is not None and now - checked_at < settings.READ_REPLICAS["HEALTH_CHECK_INTERVAL"]:
+            return healthy
+        healthy, replayed = self.check(alias)
+        with self._lock:
+            self._status[alias] = (healthy, replayed, now)
+        return healthy
+
+    def has_replayed(self, alias, min_lsn):
+        if min_lsn is None:
+            return True
+        with self._lock:
+            healthy, replayed, checked_at = self._status[alias]
+        # Replay only moves forward, so a cached position at or past the token is still good.
+        if replayed is not None and replayed >= min_lsn:
+            return True
+        try:
+            replayed = wal_position(alias)
+        except DatabaseError:
+            connections[alias].close()
+            return False
+        with self._lock:
+            self._status[alias] = (healthy, replayed, checked_at)
+        return replayed is not None and replayed >= min_lsn
+
+    def check(self, alias):
+        """``(healthy, replayed LSN)`` of the replica ``alias``."""
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(REPLICATION_STATUS)
+                lag, replayed = cursor.fetchone()
+        except DatabaseError:
+            connections[alias].close()
+            return False, None
+        return lag <= settings.READ_REPLICAS["MAX_LAG_SECONDS"], parse_lsn(replayed)
+
+    def reset(self):
+        with self._lock:
+            self._status.clear()
+            self._turns = itertools.count()
+
+
+replica_set = ReplicaSet()
+
+
+@contextmanager
+def replica_reads():
+    """Let the reads of this block go to one suitable replica (see the module docstring)."""
+    token = _replica_scope.set(ReplicaScope())
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _replica_scope.get()
+        state = _request_state.get()
+        if scope is None or (state is not None and state.wrote):
+            return DEFAULT_DB_ALIAS
+        if scope.alias is None:
+            # One server per block, so its reads see a single point in time.
+            min_lsn = state.min_lsn if state is not None else None
+            scope.alias = replica_set.choose(min_lsn) or DEFAULT_DB_ALIAS
+            if state is not None:
+                state.read_from.add(scope.alias)
+        return scope.alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicit, or Django would write objects read from a replica back to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_set.aliases}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return False if db in replica_set.aliases else None
+
+
+class ReplicaTokenMiddleware:
+    """Read the client's LSN token from the request and hand back the one its response reflects."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        state = self._state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._set_token(request, response, self._seen_lsn(state))
+
+    async def _acall(self, request):
+        state = self._state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._set_token(request, response, await sync_to_async(self._seen_lsn)(state))
+
+    def _state(self, request):
+        return RoutingState(min_lsn=parse_lsn(request.headers.get(LSN_HEADER) or request.COOKIES.get(LSN_COOKIE)))
+
+    def _seen_lsn(self, state):
+        if not settings.READ_REPLICAS["ALIASES"]:
+            return None
+        # Read after the view, so the position covers everything it committed or read.
+        aliases = state.read_from | ({DEFAULT_DB_ALIAS} if state.wrote else set())
+        positions = [state.min_lsn]
+        for alias in aliases:
+            try:
+                positions.append(wal_position(alias))
+            except DatabaseError:
+                connections[alias].close()
+        positions = [lsn for lsn in positions if lsn is not None]
+        return max(positions, default=None)
+
+    def _set_token(self, request, response, lsn):
+        if lsn is None:
+            return response
+        response[LSN_HEADER] = format_lsn(lsn)
+        if parse_lsn(request.COOKIES.get(LSN_COOKIE)) != lsn:
+            response.set_cookie(LSN_COOKIE, format_lsn(lsn), httponly=True, samesite="Lax")
+        return response
+
+
+class ReplicaChangeListMixin:
+    """``ModelAdmin`` mixin reading the changelist (GET) from a replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # The result list is only read when the template is rendered.
+            if hasattr(response, "render"):
+                response.render()
+        return response
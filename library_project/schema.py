@@ -0,0 +1,153 @@
+"""Pre-generated OpenAPI schema.
+
+DRF's schema view inspects every view and serializer on each request. Instead, the schema is
+generated once and stored in ``API_DOCUMENTATION["SCHEMA_FILE"]``. That happens in
+``manage.py generate_openapi_schema``, run by the entrypoint, or else on the first request of a
+process. The file carries a fingerprint of the source code it was generated from; processes reuse
+it while the fingerprint matches, so the schema is only regenerated after a code change. Both
+renditions (YAML and JSON) are rendered up front and served with an ETag and ``Cache-Control``;
+content negotiation is DRF's, so browsers still get the browsable API page and unknown
+``?format=`` values a 404.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.renderers import JSONOpenAPIRenderer, OpenAPIRenderer
+from rest_framework.response import Response
+from rest_framework.schemas.openapi import SchemaGenerator
+from rest_framework.schemas.views import SchemaView
+
+logger = logging.getLogger(__name__)
+
+# Packages whose code shapes the schema.
+SOURCE_PACKAGES = ["account", "catalog", "library_project"]
+
+
+def source_fingerprint():
+    """Hash of everything the schema is generated from: project code, DRF version and API metadata."""
+    config = settings.API_DOCUMENTATION
+    digest = hashlib.sha256()
+    digest.update(
+        f"{rest_framework.VERSION}\n{config['TITLE']}\n{config['DESCRIPTION']}\n{config['VERSION']}\n".encode()
+    )
+    base_dir = Path(settings.BASE_DIR)
+    for package in SOURCE_PACKAGES:
+        for path in sorted((base_dir / package).rglob("*.py")):
+            relative_path = path.relative_to(base_dir)
+            if "tests" in relative_path.parts:
+                continue
+            digest.update(f"{relative_path}\n".encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    config = settings.API_DOCUMENTATION
+    generator = SchemaGenerator(title=config["TITLE"], description=config["DESCRIPTION"], version=config["VERSION"])
+    return generator.get_schema(request=None, public=True)
+
+
+def write_artifact(path, fingerprint, schema):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temporary name, as processes starting together may all write the artifact.
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f"{path.name}.", delete=False) as temporary:
+        try:
+            temporary.write(json.dumps({"fingerprint": fingerprint, "schema": schema}))
+            temporary.close()
+            # NamedTemporaryFile creates the file private to its owner.
+            os.chmod(temporary.name, 0o644)
+            os.replace(temporary.name, path)
+        except BaseException:
+            os.unlink(temporary.name)
+            raise
+
+
+def read_artifact(path, fingerprint):
+    """The schema stored in ``path`` if it was generated from the current code, else ``None``."""
+    try:
+        artifact = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    return artifact["schema"] if artifact.get("fingerprint") == fingerprint else None
+
+
+class Rendition:
+    def __init__(self, content, content_type):
+        self.content = content
+        self.content_type = content_type
+        self.etag = f'"schema-{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class SchemaCache:
+    """The schema of the running code, loaded or generated once per process."""
+
+    def __init__(self):
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def schema(self):
+        return self._get()[0]
+
+    def renditions(self):
+        """Rendered schema by renderer format (``openapi``, ``openapi-json``)."""
+        return self._get()[1]
+
+    def clear(self):
+        self._loaded = None
+
+    def _get(self):
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self._loaded = self._load()
+        return self._loaded
+
+    def _load(self):
+        path = settings.API_DOCUMENTATION["SCHEMA_FILE"]
+        fingerprint = source_fingerprint()
+        schema = read_artifact(path, fingerprint)
+        if schema is None:
+            schema = generate_schema()
+            try:
+                write_artifact(path, fingerprint, schema)
+            except OSError:
+                logger.warning("Could not store the OpenAPI schema in %s.", path, exc_info=True)
+        return schema, {
+            renderer.format: Rendition(renderer().render(schema), renderer.media_type)
+            for renderer in (OpenAPIRenderer, JSONOpenAPIRenderer)
+        }
+
+
+schema_cache = SchemaCache()
+
+
+class CachedSchemaView(SchemaView):
+    """DRF's schema view, with its renderers and content negotiation, serving the stored schema."""
+
+    public = True
+
+    def get(self, request, *args, **kwargs):
+        rendition = schema_cache.renditions().get(request.accepted_renderer.format)
+        if rendition is None:
+            # The browsable API renders the schema into its HTML page.
+            return Response(schema_cache.schema())
+        response = get_conditional_response(request, etag=rendition.etag)
+        if response is None:
+            response = HttpResponse(rendition.content, content_type=rendition.content_type)
+        response["ETag"] = rendition.etag
+        patch_cache_control(response, public=True, max_age=settings.API_DOCUMENTATION["SCHEMA_MAX_AGE"])
+        return response
+
+
+schema_view = CachedSchemaView.as_view()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Any
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -14,6 +15,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "account",
     "catalog",
@@ -22,6 +24,10 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "account.LibraryUser"
 
 MIDDLEWARE = [
+    "library_project.metrics.MetricsMiddleware",
+    "library_project.profiling.RequestProfilingMiddleware",
+    "library_project.replicas.ReplicaTokenMiddleware",
+    "library_project.postgresql_pool.middleware.PoolTimeoutMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -60,18 +66,140 @@ API_DOCUMENTATION = {
     "TITLE": "Library API",
     "DESCRIPTION": "Dokumentacja API biblioteki.",
     "VERSION": "1.0.0",
+    # Generated by `manage.py generate_openapi_schema` (see library_project.schema).
+    "SCHEMA_FILE": Path(os.environ.get("OPENAPI_SCHEMA_FILE", BASE_DIR / "openapi-schema.json")),
+    "SCHEMA_MAX_AGE": int(os.environ.get("OPENAPI_SCHEMA_MAX_AGE", "3600")),
 }
 
+BOOK_PAGINATION = {
+    "PAGE_SIZE": int(os.environ.get("BOOK_PAGE_SIZE", "100")),
+    "MAX_PAGE_SIZE": int(os.environ.get("BOOK_MAX_PAGE_SIZE", "1000")),
+}
+
+BOOK_EXPORT_CHUNK_SIZE = int(os.environ.get("BOOK_EXPORT_CHUNK_SIZE", "2000"))
+
+# Admin changelists count exactly up to this many rows and use PostgreSQL's estimates above it.
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get("ADMIN_EXACT_COUNT_LIMIT", "10000"))
+
+BOOK_BULK_BORROW_MAX_OPERATIONS = int(os.environ.get("BOOK_BULK_BORROW_MAX_OPERATIONS", "500"))
+
+# Borrow and return with a conditional UPDATE on the book's version instead of a row lock held
+# while the change is decided; concurrent changes to the same book are answered with 409 Conflict.
+BOOK_OPTIMISTIC_LOCKING = os.environ.get("BOOK_OPTIMISTIC_LOCKING", "false").lower() == "true"
+
+OVERDUE_LOANS = {
+    "LOAN_PERIOD_DAYS": int(os.environ.get("BOOK_LOAN_PERIOD_DAYS", "30")),
+    "CHUNK_SIZE": int(os.environ.get("OVERDUE_SCAN_CHUNK_SIZE", "1000")),
+}
+
+BOOK_IMPORT = {
+    "BATCH_SIZE": int(os.environ.get("BOOK_IMPORT_BATCH_SIZE", "1000")),
+    "MAX_REPORTED_ERRORS": int(os.environ.get("BOOK_IMPORT_MAX_REPORTED_ERRORS", "1000")),
+    # Longest JSON array item (in characters) buffered while parsing an upload.
+    "MAX_ITEM_SIZE": int(os.environ.get("BOOK_IMPORT_MAX_ITEM_SIZE", "65536")),
+}
+
+POSTGRES_POOL = os.environ.get("POSTGRES_POOL", "false").lower() == "true"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "library_project.postgresql_pool" if POSTGRES_POOL else "django.db.backends.postgresql",
         "NAME": os.environ.get("POSTGRES_DB", "library"),
         "USER": os.environ.get("POSTGRES_USER", "library"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "library"),
         "HOST": os.environ.get("POSTGRES_HOST", "db"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Seconds a thread keeps its connection between requests. Only useful with a fixed set of
+        # worker threads: runserver starts a thread per request and would leak connections.
+        # The pool (POSTGRES_POOL=true) reuses connections across threads with this left at 0.
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": os.environ.get("POSTGRES_CONN_HEALTH_CHECKS", "true").lower() == "true",
+        "POOL": {
+            "MIN_SIZE": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", "1")),
+            "MAX_SIZE": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", "20")),
+            # Seconds a request waits for a free connection before getting 503.
+            "TIMEOUT": float(os.environ.get("POSTGRES_POOL_TIMEOUT", "5")),
+        },
+    }
+}
+
+# Streaming replicas for catalogue reads, as comma-separated host[:port] (see library_project/replicas.py).
+# They share the primary's credentials; tests treat them as mirrors of the test database.
+for number, address in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        # Health checks connect inside requests; an unreachable replica must fail fast (libpq minimum: 2 s).
+        "OPTIONS": {"connect_timeout": int(os.environ.get("REPLICA_CONNECT_TIMEOUT", "2"))},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["library_project.replicas.ReplicaRouter"]
+
+READ_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "HEALTH_CHECK_INTERVAL": int(os.environ.get("REPLICA_HEALTH_CHECK_INTERVAL", "5")),
+    "MAX_LAG_SECONDS": float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "10")),
+}
+
+CACHES: dict[str, dict[str, Any]] = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "library-api"),
     }
 }
+if CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "100000"))}
+
+REQUEST_PROFILING = {
+    "ENABLED": os.environ.get("REQUEST_PROFILING_ENABLED", "false").lower() == "true",
+    # Fraction of requests that are timed; the others skip the middleware's bookkeeping.
+    "SAMPLE_RATE": float(os.environ.get("REQUEST_PROFILING_SAMPLE_RATE", "1.0")),
+    "SLOW_REQUEST_MS": float(os.environ.get("REQUEST_PROFILING_SLOW_REQUEST_MS", "500")),
+    "MAX_CAPTURED_QUERIES": int(os.environ.get("REQUEST_PROFILING_MAX_CAPTURED_QUERIES", "50")),
+}
+
+METRICS = {
+    "ENABLED": os.environ.get("METRICS_ENABLED", "true").lower() == "true",
+    # Shared by the worker processes of one server so /metrics can add up all of them; leave
+    # empty when a single process serves requests.
+    "MULTIPROCESS_DIR": os.environ.get("METRICS_MULTIPROCESS_DIR", ""),
+    "FLUSH_INTERVAL": float(os.environ.get("METRICS_FLUSH_INTERVAL", "5")),
+    # Bearer token that scrapers send to read /metrics (staff users may read it too); without one
+    # only staff users can.
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "library_project.profiling": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_PROFILING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Render book lists from values_list() rows (and with orjson, when installed) instead of
+# BookSerializer and DRF's JSONRenderer; the output is byte for byte the same.
+BOOK_FAST_SERIALIZATION = os.environ.get("BOOK_FAST_SERIALIZATION", "false").lower() == "true"
+
+BOOK_CACHE = {
+    "ENABLED": os.environ.get("BOOK_CACHE_ENABLED", "true").lower() == "true",
+    "ALIAS": "default",
+    "TIMEOUT": int(os.environ.get("BOOK_CACHE_TIMEOUT", "3600")),
+}
+
+BORROWER_CACHE = {
+    "ENABLED": os.environ.get("BORROWER_CACHE_ENABLED", "true").lower() == "true",
+    "MAX_SIZE": int(os.environ.get("BORROWER_CACHE_MAX_SIZE", "10000")),
+    "TTL": int(os.environ.get("BORROWER_CACHE_TTL", "3600")),
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,16 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
-from rest_framework.schemas import get_schema_view
 
 from library_project import settings as project_settings
-
-schema_view = get_schema_view(
-    title=project_settings.API_DOCUMENTATION["TITLE"],
-    description=project_settings.API_DOCUMENTATION["DESCRIPTION"],
-    version=project_settings.API_DOCUMENTATION["VERSION"],
-    public=True,
-)
+from library_project.metrics import metrics_view
+from library_project.schema import schema_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -25,3 +19,6 @@ urlpatterns = [
         name="swagger-ui",
     ),
 ]
+
+if project_settings.METRICS["ENABLED"]:
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))